@@ -0,0 +1,273 @@
+import array
+import json
+import logging
+import math
+import operator
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+from weather_snapshot import _to_float, format_number
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时逐列用纯 Python 计算，结果相同
+    np = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 预报表中的字段：逐日预报字段对每一天都有值；实时字段（*_now）只有第 0 天（今天）有值，其余为 NaN
+FIELDS = ("temp_min", "temp_max", "temp_range", "precip", "uv_index", "humidity", "temp_now", "precip_now")
+
+_OPERATORS: Dict[str, Callable[[Any, float], Any]] = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq,
+}
+
+_DAY_LABELS = ("今天", "明天", "后天")
+
+Condition = Tuple[str, str, float]
+
+
+class AlertRule:
+    """
+    一条预警规则：所有条件同时满足时命中
+
+    条件形如 ("precip", ">", 0)，字段缺失（NaN）时条件不成立。
+    days 为规则适用的预报日（0 为今天），None 表示全部；message 中可以使用
+    {字段名}、{day_label}（今天/明天/后天/日期）与 {date} 占位符。
+    """
+
+    __slots__ = ("name", "conditions", "message", "days")
+
+    def __init__(self, name: str, conditions: Sequence[Condition], message: str,
+                 days: Optional[Sequence[int]] = None):
+        for field, op, _ in conditions:
+            if field not in FIELDS:
+                raise ValueError(f"预警规则 {name} 使用了未知字段: {field}")
+            if op not in _OPERATORS:
+                raise ValueError(f"预警规则 {name} 使用了未知比较符: {op}")
+        self.name = name
+        self.conditions = [(field, op, float(threshold)) for field, op, threshold in conditions]
+        self.message = message
+        self.days = frozenset(days) if days is not None else None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
+        """由 JSON 规则定义构建，conditions 为 [[字段, 比较符, 阈值], ...]"""
+        return cls(data["name"], [tuple(condition) for condition in data["conditions"]],
+                   data["message"], data.get("days"))
+
+
+# 默认规则：前三条对应原来页面上的降水、紫外线、温差提醒（只看今天），其余用于筛查未来几天
+DEFAULT_RULES: Tuple[AlertRule, ...] = (
+    AlertRule("rain_now", [("precip_now", ">", 0)], "当前有降水(约{precip_now}mm)，出门请记得带好雨具哦~", days=[0]),
+    AlertRule("uv_high", [("uv_index", ">=", 6)], "{day_label}紫外线强({uv_index}级)，请注意防晒"),
+    AlertRule("wide_range", [("temp_range", ">=", 8), ("temp_max", "<", 30), ("temp_max", ">", 10)],
+              "{day_label}昼夜温差较大，注意及时增减衣物"),
+    AlertRule("heat", [("temp_max", ">=", 35)], "{day_label}最高气温{temp_max}℃，注意防暑降温"),
+    AlertRule("cold", [("temp_min", "<=", -5)], "{day_label}最低气温{temp_min}℃，注意保暖"),
+    AlertRule("rain", [("precip", ">", 0)], "{day_label}预计有降水(约{precip}mm)，记得准备雨具", days=range(1, 16)),
+)
+
+
+class ForecastTable:
+    """
+    多个地点、多个预报日的数值预报表
+
+    每个字段一列，按 (地点, 预报日) 行优先展开为长度 地点数 × 天数 的一维数组，缺失值为 NaN。
+    安装了 numpy 时各列为 numpy 数组，否则为 array('d')。
+    """
+
+    def __init__(self, locations: List[str], dates: List[List[Optional[str]]], days: int,
+                 columns: Dict[str, Sequence[float]]):
+        self.locations = locations
+        self.dates = dates
+        self.days = days
+        self.columns = columns
+        self._index = {location: index for index, location in enumerate(locations)}
+
+    @classmethod
+    def from_clients(cls, weather_clients: Dict[str, Any], days: Optional[int] = None) -> "ForecastTable":
+        """
+        由已成功获取天气的 WeatherClient 构建预报表
+
+        Args:
+            weather_clients: 地点 -> WeatherClient（使用其 realtime_weather 与 forecast_weather）
+            days: 预报天数，默认取各地点逐日预报的最大天数（/weather/3d 为 3 天）
+        """
+        locations = list(weather_clients)
+        # 所有地点都没有逐日预报时仍保留第 0 天，用于存放实时字段
+        days = days or max((len(client.forecast_weather or []) for client in weather_clients.values()), default=0) or 1
+        size = len(locations) * days
+        nan = float("nan")
+        values = {field: [nan] * size for field in FIELDS}
+        dates: List[List[Optional[str]]] = []
+        for row, location in enumerate(locations):
+            client = weather_clients[location]
+            daily = (client.forecast_weather or [])[:days]
+            dates.append([item.get("fxDate") for item in daily] + [None] * (days - len(daily)))
+            base = row * days
+            for day, item in enumerate(daily):
+                temp_min, temp_max = _to_float(item.get("tempMin")), _to_float(item.get("tempMax"))
+                cells = {
+                    "temp_min": temp_min,
+                    "temp_max": temp_max,
+                    "temp_range": temp_max - temp_min if temp_min is not None and temp_max is not None else None,
+                    "precip": _to_float(item.get("precip")),
+                    "uv_index": _to_float(item.get("uvIndex")),
+                    "humidity": _to_float(item.get("humidity")),
+                }
+                for field, value in cells.items():
+                    if value is not None:
+                        values[field][base + day] = value
+            now = client.realtime_weather or {}
+            for field, key in (("temp_now", "temp"), ("precip_now", "precip")):
+                value = _to_float(now.get(key))
+                if value is not None:
+                    values[field][base] = value
+        if np is not None:
+            columns = {field: np.asarray(column, dtype=np.float64) for field, column in values.items()}
+        else:
+            columns = {field: array.array("d", column) for field, column in values.items()}
+        return cls(locations, dates, days, columns)
+
+    def index(self, location: str) -> int:
+        return self._index[location]
+
+    def value(self, field: str, location: str, day: int) -> Optional[float]:
+        value = float(self.columns[field][self._index[location] * self.days + day])
+        return None if math.isnan(value) else value
+
+
+class AlertResult:
+    """规则引擎的评估结果：每个 (地点, 预报日) 一个整数位掩码，第 i 位对应第 i 条规则"""
+
+    def __init__(self, table: ForecastTable, rules: Sequence[AlertRule], masks: Sequence[int]):
+        self.table = table
+        self.rules = list(rules)
+        self._masks = masks
+        self._bits = {rule.name: 1 << bit for bit, rule in enumerate(self.rules)}
+
+    def mask(self, location: str, day: int = 0) -> int:
+        return int(self._masks[self.table.index(location) * self.table.days + day])
+
+    def masks(self) -> List[List[int]]:
+        """按地点、预报日排列的位掩码矩阵"""
+        days = self.table.days
+        flat = [int(mask) for mask in self._masks]
+        return [flat[row * days:(row + 1) * days] for row in range(len(self.table.locations))]
+
+    def rule_names(self, location: str, day: int = 0) -> List[str]:
+        mask = self.mask(location, day)
+        return [rule.name for bit, rule in enumerate(self.rules) if mask >> bit & 1]
+
+    def messages(self, location: str, day: int = 0, rule_names: Optional[Sequence[str]] = None) -> List[str]:
+        """命中的规则按规则顺序生成的提示语，指定 rule_names 时只生成其中的规则"""
+        mask = self.mask(location, day)
+        if rule_names is not None:
+            mask &= sum(self._bits.get(name, 0) for name in set(rule_names))
+        if not mask:
+            return []
+        date = self.table.dates[self.table.index(location)][day] or ""
+        values = {field: format_number(self.table.value(field, location, day)) for field in FIELDS}
+        values["date"] = date
+        values["day_label"] = _DAY_LABELS[day] if day < len(_DAY_LABELS) else date[5:]
+        return [rule.message.format(**values) for bit, rule in enumerate(self.rules) if mask >> bit & 1]
+
+    def locations_with(self, rule_name: str, day: int) -> List[str]:
+        """在第 day 天命中某条规则的地点，例如 locations_with("rain", 1) 为明天有雨的地点"""
+        bit = self._bits[rule_name]
+        days = self.table.days
+        return [location for row, location in enumerate(self.table.locations)
+                if int(self._masks[row * days + day]) & bit]
+
+    def counts(self) -> Dict[str, List[int]]:
+        """每条规则在各预报日命中的地点数"""
+        days = self.table.days
+        counts = {rule.name: [0] * days for rule in self.rules}
+        for position, mask in enumerate(self._masks):
+            mask = int(mask)
+            if mask:
+                for bit, rule in enumerate(self.rules):
+                    if mask >> bit & 1:
+                        counts[rule.name][position % days] += 1
+        return counts
+
+
+class AlertEngine:
+    """阈值规则引擎：对预报表的每条规则做一次整列比较，得到所有地点、所有预报日的位掩码"""
+
+    def __init__(self, rules: Optional[Sequence[AlertRule]] = None):
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        if len(self.rules) > 63:
+            raise ValueError("预警规则最多 63 条")
+
+    def evaluate(self, table: ForecastTable) -> AlertResult:
+        size = len(table.locations) * table.days
+        if np is not None:
+            masks = self._evaluate_numpy(table, size)
+        else:
+            masks = self._evaluate_python(table, size)
+        return AlertResult(table, self.rules, masks)
+
+    def _day_filter(self, rule: AlertRule, days: int) -> Optional[List[bool]]:
+        if rule.days is None:
+            return None
+        return [day in rule.days for day in range(days)]
+
+    def _evaluate_numpy(self, table: ForecastTable, size: int) -> Any:
+        masks = np.zeros(size, dtype=np.int64)
+        locations = len(table.locations)
+        for bit, rule in enumerate(self.rules):
+            hit = np.ones(size, dtype=bool)
+            for field, op, threshold in rule.conditions:
+                # NaN 参与的比较结果为 False，缺失的字段不会命中
+                hit &= _OPERATORS[op](table.columns[field], threshold)
+            day_filter = self._day_filter(rule, table.days)
+            if day_filter is not None:
+                hit &= np.tile(np.asarray(day_filter, dtype=bool), locations)
+            masks[hit] |= 1 << bit
+        return masks
+
+    def _evaluate_python(self, table: ForecastTable, size: int) -> List[int]:
+        masks = [0] * size
+        days = table.days
+        for bit, rule in enumerate(self.rules):
+            hit = [True] * size
+            for field, op, threshold in rule.conditions:
+                compare = _OPERATORS[op]
+                hit = [h and compare(value, threshold) for h, value in zip(hit, table.columns[field])]
+            day_filter = self._day_filter(rule, days)
+            value = 1 << bit
+            for position, matched in enumerate(hit):
+                if matched and (day_filter is None or day_filter[position % days]):
+                    masks[position] |= value
+        return masks
+
+
+def load_rules(path: str) -> List[AlertRule]:
+    """从 JSON 文件加载规则列表，格式见 AlertRule.from_dict"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [AlertRule.from_dict(item) for item in json.load(f)]
+
+
+def create_alert_engine() -> AlertEngine:
+    """
+    根据配置文件 [alerts] 节创建规则引擎
+
+    rules_path 指向 JSON 规则文件时使用其中的规则，读取失败时回退到默认规则。
+    """
+    path = config.get("alerts", "rules_path")
+    if path:
+        try:
+            return AlertEngine(load_rules(path))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"预警规则文件 {path} 加载失败，使用默认规则: {e}")
+    return AlertEngine()
+
+
+def evaluate_clients(engine: AlertEngine, weather_clients: Dict[str, Any],
+                     days: Optional[int] = None) -> AlertResult:
+    """由一批 WeatherClient 构建预报表并评估规则"""
+    return engine.evaluate(ForecastTable.from_clients(weather_clients, days))
+
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+
+from config import config
+from http_transport import create_session, get_timeout
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp 为可选依赖，未安装时在线程池中执行 requests 请求
+    aiohttp = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class AsyncHttpError(Exception):
+    """
+    异步HTTP请求失败
+
+    status 为服务器返回的HTTP状态码（未收到响应时为 None）；
+    connect_failed 表示请求在建立连接阶段失败，服务器一定没有收到请求，可以安全重发。
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, connect_failed: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.connect_failed = connect_failed
+
+
+class AsyncHttpClient:
+    """异步模式使用的HTTP客户端接口，只提供本项目需要的 JSON GET / POST"""
+
+    name = "base"
+
+    async def get_json(self, url: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        发起 GET 请求并解析 JSON 响应
+
+        Raises:
+            AsyncHttpError: 网络错误、非 2xx 状态码或响应不是合法的JSON
+        """
+        raise NotImplementedError
+
+    async def post_json(self, url: str, body: bytes) -> Dict[str, Any]:
+        """
+        以 application/json 发送已经序列化好的请求体并解析 JSON 响应
+
+        Raises:
+            AsyncHttpError: 网络错误、非 2xx 状态码或响应不是合法的JSON
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+class AiohttpClient(AsyncHttpClient):
+    """基于 aiohttp 的客户端，所有请求共享一个带连接上限的连接池"""
+
+    name = "aiohttp"
+
+    def __init__(self, max_connections: int, timeout: float):
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._max_connections = max_connections
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # ClientSession 需要在事件循环中创建
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._max_connections)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    async def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        try:
+            async with self._get_session().request(method, url, **kwargs) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except aiohttp.ClientResponseError as e:
+            raise AsyncHttpError(f"{e.status} {e.message}", status=e.status) from e
+        except aiohttp.ClientConnectorError as e:
+            raise AsyncHttpError(str(e), connect_failed=True) from e
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise AsyncHttpError(str(e) or type(e).__name__) from e
+
+    async def get_json(self, url: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        return await self._request("GET", url, params=params)
+
+    async def post_json(self, url: str, body: bytes) -> Dict[str, Any]:
+        return await self._request("POST", url, data=body, headers={"Content-Type": "application/json"})
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class ThreadedRequestsClient(AsyncHttpClient):
+    """未安装 aiohttp 时的替代实现：在专用线程池中执行 requests 请求，线程数即最大并发连接数"""
+
+    name = "requests"
+
+    def __init__(self, max_connections: int, timeout: float):
+        self._timeout = timeout
+        self._session = create_session(pool_maxsize=max_connections)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="async-http")
+
+    def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        try:
+            response = self._session.request(method, url, timeout=self._timeout, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            raise AsyncHttpError(str(e), status=status) from e
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+            raise AsyncHttpError(str(e), connect_failed=True) from e
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise AsyncHttpError(str(e)) from e
+
+    async def _run(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self._request(method, url, **kwargs))
+
+    async def get_json(self, url: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        return await self._run("GET", url, params=params)
+
+    async def post_json(self, url: str, body: bytes) -> Dict[str, Any]:
+        return await self._run("POST", url, data=body, headers={"Content-Type": "application/json"})
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+
+def create_async_http_client(max_connections: Optional[int] = None) -> AsyncHttpClient:
+    """
+    创建异步HTTP客户端，安装了 aiohttp 时使用 aiohttp，否则使用线程池中的 requests
+
+    Args:
+        max_connections: 最大并发连接数，默认读取 [async] max_connections（64）
+    """
+    max_connections = max_connections or config.get_int("async", "max_connections", 64)
+    timeout = get_timeout()
+    if aiohttp is not None:
+        return AiohttpClient(max_connections, timeout)
+    logger.warning("未安装 aiohttp，异步模式将在线程池中执行HTTP请求（pip install aiohttp 可获得更高并发）")
+    return ThreadedRequestsClient(max_connections, timeout)
@@ -0,0 +1,70 @@
+"""
+预警规则引擎基准测试
+
+随机生成 N 个地点的实时天气与逐日预报，构建 ForecastTable 后用 AlertEngine 对所有地点、
+所有预报日一次性评估默认规则，报告构建预报表与评估规则的耗时以及各规则的命中地点数。
+安装了 numpy 时按列向量化比较，否则使用纯 Python 实现。不发起任何网络请求。
+
+用法:
+    python benchmarks/bench_alerts.py --locations 10000 --days 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert_rules import AlertEngine, ForecastTable, np  # noqa: E402
+
+
+class _Client:
+    """只包含 ForecastTable 需要的字段的天气客户端替身"""
+
+    def __init__(self, realtime_weather, forecast_weather):
+        self.realtime_weather = realtime_weather
+        self.forecast_weather = forecast_weather
+
+
+def _random_clients(locations: int, days: int, seed: int):
+    rnd = random.Random(seed)
+    clients = {}
+    for index in range(locations):
+        daily = [
+            {"fxDate": f"2024-05-{20 + day:02d}", "tempMin": str(rnd.randint(-10, 22)),
+             "tempMax": str(rnd.randint(5, 40)), "precip": rnd.choice(["0.0", "0.0", "0.0", "3.2"]),
+             "uvIndex": str(rnd.randint(0, 11)), "humidity": str(rnd.randint(20, 95))}
+            for day in range(days)
+        ]
+        now = {"temp": str(rnd.randint(-5, 35)), "precip": rnd.choice(["0.0", "0.0", "1.5"])}
+        clients[f"loc{index:06d}"] = _Client(now, daily)
+    return clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预警规则引擎基准测试")
+    parser.add_argument("--locations", type=int, default=10000, help="地点数")
+    parser.add_argument("--days", type=int, default=3, help="预报天数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    clients = _random_clients(args.locations, args.days, args.seed)
+
+    start = time.perf_counter()
+    table = ForecastTable.from_clients(clients)
+    built = time.perf_counter() - start
+
+    engine = AlertEngine()
+    start = time.perf_counter()
+    result = engine.evaluate(table)
+    evaluated = time.perf_counter() - start
+
+    print(f"{args.locations} 个地点 × {args.days} 天，{len(engine.rules)} 条规则（{'numpy' if np is not None else '纯 Python'}）")
+    print(f"构建预报表: {built * 1000:.1f} ms")
+    print(f"评估规则:   {evaluated * 1000:.1f} ms  每个地点-天 {evaluated / (args.locations * args.days) * 1e6:.2f} µs")
+    for name, counts in result.counts().items():
+        print(f"  {name:<12} {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+HTML页面渲染基准测试
+
+对比预编译模板（html_generator.render_html_page）与改造前每次调用都执行
+str.format 解析整份模板的写法，渲染 N 个页面的耗时，并校验两者输出一致。
+
+用法:
+    python benchmarks/bench_html_render.py --pages 10000
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_generator  # noqa: E402
+
+SAMPLE_DATA = {
+    "theme": "rainy",
+    "alerts": ["当前有降水(约1.2mm)，出门请记得带好雨具哦~", "紫外线强(6级)，请注意防晒"],
+    "greeting": "早上好呀！新的一天开始了，元气满满哦~",
+    "date": "2026年10月17日 Saturday",
+    "temperature_value": "10℃ ~ 22℃",
+    "temperature_tip": "昼夜温差较大，注意适时增减衣物，预防感冒~",
+    "weather_condition_value": "小雨",
+    "weather_condition_tip": "今天有雨，出门请记得带伞，雨天路滑注意安全。",
+    "wind_value": "东风 3级",
+    "wind_tip": "注意防风，关好门窗。",
+    "precipitation_value": "当前有降水(约1.2mm)",
+    "precipitation_tip": "出门请记得带好雨具哦~",
+    "uv_value": "6 ",
+    "uv_tip": "(强)，请做好防护，如戴帽子、太阳镜。",
+    "note": "仪姐，愿你今天有个好心情，一切顺利哦！💖",
+}
+
+
+def legacy_render(data: Dict[str, Any]) -> str:
+    """改造前的渲染方式：每次调用重建主题色表并对整份模板执行 str.format"""
+    theme = data.get("theme", "default")
+    data["header_emoji"] = html_generator._get_weather_emoji(theme)
+    data["condition_emoji"] = html_generator._get_condition_emoji(theme)
+    data["uv_level_class"] = html_generator._get_uv_level_class(data.get("uv_value", ""))
+    alerts_html = html_generator._generate_alerts_html(data.get("alerts", []))
+    theme_colors = {
+        "sunny": "#ffb74d", "rainy": "#4dd0e1", "cloudy": "#90a4ae",
+        "snowy": "#e0f2f1", "foggy": "#b0bec5", "default": "#66a6ff"
+    }
+    return html_generator._HTML_TEMPLATE.format(
+        theme_color=theme_colors.get(theme),
+        alerts_html=alerts_html,
+        forecast_html=html_generator._generate_forecast_html(data.get("forecast")),
+        trend_html=html_generator._generate_trend_html(data.get("trend")),
+        **data
+    )
+
+
+def _time_it(render, pages: int) -> float:
+    start = time.perf_counter()
+    for _ in range(pages):
+        render(dict(SAMPLE_DATA))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML页面渲染基准测试")
+    parser.add_argument("--pages", type=int, default=10000, help="渲染页面数")
+    args = parser.parse_args()
+
+    if legacy_render(dict(SAMPLE_DATA)) != html_generator.render_html_page(dict(SAMPLE_DATA)):
+        print("错误：预编译模板与 str.format 的渲染结果不一致")
+        sys.exit(1)
+
+    # 预热，排除首次编译模板的开销
+    html_generator.render_html_page(dict(SAMPLE_DATA))
+
+    legacy = _time_it(legacy_render, args.pages)
+    compiled = _time_it(html_generator.render_html_page, args.pages)
+    print(f"渲染 {args.pages} 个页面")
+    print(f"str.format  : {legacy:6.3f}s  ({legacy / args.pages * 1e6:7.1f} µs/页)")
+    print(f"预编译模板  : {compiled:6.3f}s  ({compiled / args.pages * 1e6:7.1f} µs/页)")
+    print(f"加速比      : {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
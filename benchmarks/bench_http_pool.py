@@ -0,0 +1,101 @@
+"""
+HTTP连接池基准测试
+
+在本地启动一个支持 keep-alive 的桩 HTTP 服务，分别用
+  1. 模块级 requests.get（每次请求新建连接，即改造前的写法）
+  2. http_transport.create_session() 创建的连接池会话
+发送相同数量的请求，对比服务端看到的TCP连接（握手）次数与单次请求延迟。
+
+用法:
+    python benchmarks/bench_http_pool.py --requests 500 --workers 8
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+from http_transport import create_session  # noqa: E402
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    """每个处理器实例对应一条TCP连接，在 setup 中计数即可得到握手次数"""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        with _CountingHandler.lock:
+            _CountingHandler.connections += 1
+        super().setup()
+        # 关闭 Nagle，避免响应头与响应体分两次写出时触发延迟确认，干扰 keep-alive 的延迟测量
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        body = b'{"code":"200","now":{"text":"\xe6\x99\xb4"}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _run(label: str, get: Callable[[str], requests.Response], url: str, total: int, workers: int) -> None:
+    """用指定的 get 函数并发发起 total 次请求并打印统计结果"""
+    _CountingHandler.connections = 0
+    latencies: List[float] = []
+    latencies_lock = threading.Lock()
+
+    def _one(_):
+        start = time.perf_counter()
+        get(url).raise_for_status()
+        elapsed = time.perf_counter() - start
+        with latencies_lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<14} 连接数: {_CountingHandler.connections:>5}  "
+          f"总耗时: {wall:6.2f}s  "
+          f"p50: {statistics.median(latencies) * 1000:6.2f}ms  "
+          f"p99: {p99 * 1000:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP连接池基准测试")
+    parser.add_argument("--requests", type=int, default=500, help="请求总数")
+    parser.add_argument("--workers", type=int, default=8, help="并发线程数")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v7/weather/now"
+
+    print(f"请求数: {args.requests}，并发: {args.workers}")
+    _run("requests.get", lambda u: requests.get(u, timeout=10), url, args.requests, args.workers)
+    session = create_session(pool_maxsize=args.workers)
+    _run("pooled session", lambda u: session.get(u, timeout=10), url, args.requests, args.workers)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+个性化消息构建基准测试
+
+用固定的天气快照构建 N 条个性化模板消息（问候语、温度/天气/降水/紫外线提示、每日寄语），
+衡量文案目录查表与记忆化之后，每条消息的 CPU 开销。不发起任何网络请求。
+
+用法:
+    python benchmarks/bench_message_build.py --messages 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_builder import MessageBuilder  # noqa: E402
+from weather_cache import WeatherCache  # noqa: E402
+from weather_client import WeatherClient  # noqa: E402
+from weather_snapshot import WeatherSnapshot  # noqa: E402
+
+CONDITIONS = ["晴", "多云", "阴", "小雨", "中雨", "雷阵雨", "小雪", "雨夹雪", "雾", "霾", "大风"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="个性化消息构建基准测试")
+    parser.add_argument("--messages", type=int, default=100000, help="构建的消息条数")
+    args = parser.parse_args()
+
+    # 不配置任何TTL的缓存等同于关闭缓存，避免基准测试在工作目录下创建缓存文件
+    builders = []
+    for index, condition in enumerate(CONDITIONS):
+        client = WeatherClient(location=f"bench-{index}", cache=WeatherCache(ttls={}))
+        client.snapshot = WeatherSnapshot(
+            location=client.location, condition=condition, temp_now=18.0,
+            temp_min=8.0 + index, temp_max=18.0 + index * 1.5, precip=0.5 if "雨" in condition else 0.0,
+            uv_index=index, wind_dir="东北风", wind_scale="3",
+        )
+        builders.append(MessageBuilder(client))
+
+    # 预热：加载文案目录并填充查找索引
+    for builder in builders:
+        builder.compose_message("预热")
+
+    start = time.perf_counter()
+    for i in range(args.messages):
+        builders[i % len(builders)].compose_message(f"用户{i}")
+    elapsed = time.perf_counter() - start
+
+    print(f"构建 {args.messages} 条个性化消息（{len(builders)} 种天气）")
+    print(f"总耗时: {elapsed:.3f}s  每条: {elapsed / args.messages * 1e6:.2f} µs  吞吐: {args.messages / elapsed:,.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
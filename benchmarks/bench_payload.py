@@ -0,0 +1,66 @@
+"""
+模板消息请求体序列化基准测试
+
+对比两种生成 N 个用户请求体的方式：每个用户构建完整字典再 json.dumps（旧方式），
+以及由 TemplatePayloadBuilder 预序列化公共部分后按用户拼接字节片段。不发起任何网络请求。
+
+用法:
+    python benchmarks/bench_payload.py --users 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payload_builder import USER_NAME, TemplatePayloadBuilder, build_template_request, orjson  # noqa: E402
+
+FIELDS = {
+    "greeting": "早上好呀！新的一天开始啦~ ☀️",
+    "date": "2024年05月20日 星期一",
+    "temperature": "当前 18℃，今日 12℃ ~ 24℃，早晚温差较大，记得带件外套哦~",
+    "weather_condition": "多云，云朵在天空中漂浮，心情也会变得轻盈起来~",
+    "wind": "东北风 3级",
+    "precipitation": "0.0mm，今天不会下雨，可以放心出门~",
+    "uv": "5 (中等)，外出记得涂防晒霜哦~",
+}
+
+
+def _message_data(user_name: str):
+    data = [{"name": "greeting", "value": f"{user_name}，{FIELDS['greeting']}"}]
+    data.extend({"name": name, "value": value} for name, value in FIELDS.items() if name != "greeting")
+    data.append({"name": "note", "value": "点击查看今日天气详情与穿搭建议💖"})
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模板消息请求体序列化基准测试")
+    parser.add_argument("--users", type=int, default=100000, help="生成的请求体数量")
+    args = parser.parse_args()
+    url = "https://example.github.io/weather/reports/2024-05-20/beijing.html"
+    users = [(f"oAbCdEfGhIjKlMnOpQrStUv{i:06d}", f"用户{i}") for i in range(args.users)]
+
+    start = time.perf_counter()
+    legacy_bytes = 0
+    for open_id, name in users:
+        request_data = build_template_request("template-id", open_id, _message_data(name), url)
+        legacy_bytes += len(json.dumps(request_data, ensure_ascii=False).encode("utf-8"))
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    builder = TemplatePayloadBuilder("template-id", _message_data(USER_NAME), url)
+    prepared_bytes = 0
+    for open_id, name in users:
+        prepared_bytes += len(builder.build(open_id, name))
+    prepared = time.perf_counter() - start
+
+    print(f"生成 {args.users} 个请求体（JSON 后端: {'orjson' if orjson is not None else 'json'}）")
+    print(f"逐用户 json.dumps: {legacy:.3f}s  每条 {legacy / args.users * 1e6:.2f} µs  共 {legacy_bytes / 1e6:.1f} MB")
+    print(f"预序列化拼接:     {prepared:.3f}s  每条 {prepared / args.users * 1e6:.2f} µs  共 {prepared_bytes / 1e6:.1f} MB")
+    print(f"加速比: {legacy / prepared:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+端到端推送流水线基准测试（离线）
+
+启动本地桩服务模拟和风天气与微信接口，在临时目录中生成指向桩服务的 config.ini
+和 N 个用户、M 个地点的名单，然后运行真实的 WeatherNotificationScheduler 流水线
+（获取天气 → 生成页面 → 发送模板消息），报告吞吐量、单条发送延迟 p50/p99 与内存占用。
+
+可以配置桩服务的延迟、错误率和服务端限速；给出 --min-throughput / --max-p99-ms 时，
+结果不达标会以非零状态码退出，便于在 CI 中发现性能回退。
+
+用法:
+    python benchmarks/bench_pipeline.py --users 5000 --locations 20
+    python benchmarks/bench_pipeline.py --users 5000 --mode async --rate 1000 --latency-ms 50
+    python benchmarks/bench_pipeline.py --users 2000 --error-rate 0.05 --server-rate-limit 300 --json result.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubServer, StubSettings  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _write_workspace(workdir: str, base_url: str, args: argparse.Namespace) -> None:
+    """在临时目录中写入指向桩服务的配置文件与用户名单"""
+    locations = [f"bench{index:04d}" for index in range(args.locations)]
+    with open(os.path.join(workdir, "users.jsonl"), "w", encoding="utf-8") as f:
+        for index in range(args.users):
+            user = {"open_id": f"bench-openid-{index:07d}", "name": f"用户{index}",
+                    "location": locations[index % len(locations)]}
+            f.write(json.dumps(user, ensure_ascii=False) + "\n")
+
+    config_text = f"""
+[wechat]
+app_id = bench-app
+app_secret = bench-secret
+template_id = bench-template
+api_base = {base_url}
+token_store = memory
+backoff_base = 0.05
+backoff_max = 1
+
+[weather_api]
+key = bench-key
+location = {locations[0]}
+url = {base_url}/v7/weather/now
+url_forecast = {base_url}/v7/weather/3d
+max_workers = 16
+
+[users]
+source = jsonl
+path = users.jsonl
+
+[delivery]
+max_workers = {args.workers}
+rate_per_second = {args.rate}
+
+[async]
+max_concurrency = {args.concurrency}
+max_connections = {args.concurrency}
+
+[http]
+pool_maxsize = {max(args.workers, args.concurrency)}
+
+[cache]
+enabled = false
+
+[queue]
+batch_size = 1000
+
+[publish]
+backend = none
+
+[metrics]
+json_path = metrics.json
+"""
+    with open(os.path.join(workdir, "config.ini"), "w", encoding="utf-8") as f:
+        f.write(config_text)
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    settings = StubSettings(
+        weather_latency=args.weather_latency_ms / 1000, wechat_latency=args.latency_ms / 1000,
+        error_rate=args.error_rate, rate_limit=args.server_rate_limit,
+    )
+    with StubServer(settings) as stub, tempfile.TemporaryDirectory(prefix="weather-bench-") as workdir:
+        _write_workspace(workdir, stub.base_url, args)
+        # 项目模块在导入时读取当前目录下的 config.ini，且相对路径（队列、页面、指标）都落在临时目录中
+        os.chdir(workdir)
+        if args.quiet:
+            logging.disable(logging.INFO)
+        from scheduler import WeatherNotificationScheduler
+
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        scheduler = WeatherNotificationScheduler()
+        if args.mode == "async":
+            summary = asyncio.run(scheduler.send_weather_notification_async())
+        else:
+            summary = scheduler.send_weather_notification()
+        elapsed = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+
+        with open(os.path.join(workdir, "metrics.json"), "r", encoding="utf-8") as f:
+            metrics = json.load(f)["metrics"]
+        os.chdir(ROOT)
+
+    send_stats = metrics["stages"].get("send", {})
+    send_ok = send_stats.get("ok", {})
+    result = {
+        "mode": args.mode,
+        "users": args.users,
+        "locations": args.locations,
+        "sent": summary.get("sent", 0),
+        "failed": summary.get("failed", 0),
+        "error": summary.get("error"),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(summary.get("sent", 0) / elapsed, 1) if elapsed else 0.0,
+        "send_p50_ms": round(send_ok.get("p50", 0.0) * 1000, 2),
+        "send_p99_ms": round(send_ok.get("p99", 0.0) * 1000, 2),
+        "stage_seconds": {stage: round(sum(item["sum"] for item in stats.values()), 3)
+                          for stage, stats in metrics["stages"].items()},
+        "errcodes": metrics["counters"].get("wechat_errcode", {}),
+        "server_calls": dict(stub.state.calls),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    if traced_peak is not None:
+        result["traced_peak_mb"] = round(traced_peak, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端推送流水线离线基准测试")
+    parser.add_argument("--users", type=int, default=2000, help="用户数")
+    parser.add_argument("--locations", type=int, default=10, help="地点数，用户平均分布在各地点")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="运行同步流水线或 --mode async 流水线")
+    parser.add_argument("--rate", type=float, default=1000, help="客户端限速（条/秒），对应 [delivery] rate_per_second")
+    parser.add_argument("--workers", type=int, default=16, help="同步模式的发送线程数")
+    parser.add_argument("--concurrency", type=int, default=64, help="异步模式的在途请求数")
+    parser.add_argument("--latency-ms", type=float, default=20, help="微信接口的模拟延迟（毫秒）")
+    parser.add_argument("--weather-latency-ms", type=float, default=50, help="和风天气接口的模拟延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模板消息返回 -1 的概率")
+    parser.add_argument("--server-rate-limit", type=float, default=None, help="服务端限速（条/秒），超出时返回 45009")
+    parser.add_argument("--trace-memory", action="store_true", help="使用 tracemalloc 统计 Python 堆峰值（会降低速度）")
+    parser.add_argument("--quiet", action="store_true", help="只输出警告及以上级别的日志")
+    parser.add_argument("--json", dest="json_path", help="把结果写入 JSON 文件")
+    parser.add_argument("--min-throughput", type=float, help="吞吐量低于该值（条/秒）时以状态码 1 退出")
+    parser.add_argument("--max-p99-ms", type=float, help="发送延迟 p99 高于该值（毫秒）时以状态码 1 退出")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+
+    print(f"模式: {result['mode']}  用户: {result['users']}  地点: {result['locations']}")
+    print(f"发送成功 {result['sent']}，失败 {result['failed']}，总耗时 {result['elapsed']:.2f}s，"
+          f"吞吐 {result['throughput']:,.1f} 条/秒")
+    print(f"单条发送延迟 p50 {result['send_p50_ms']:.1f}ms  p99 {result['send_p99_ms']:.1f}ms")
+    print(f"各阶段累计耗时: {result['stage_seconds']}")
+    print(f"错误码统计: {result['errcodes']}")
+    memory = f"峰值 RSS {result['peak_rss_mb']:.1f} MB"
+    if "traced_peak_mb" in result:
+        memory += f"，Python 堆峰值 {result['traced_peak_mb']:.1f} MB"
+    print(memory)
+    if result["error"]:
+        print(f"运行出错: {result['error']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if result["error"]:
+        failures.append("流水线运行出错")
+    if args.min_throughput is not None and result["throughput"] < args.min_throughput:
+        failures.append(f"吞吐量 {result['throughput']} < {args.min_throughput}")
+    if args.max_p99_ms is not None and result["send_p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 {result['send_p99_ms']}ms > {args.max_p99_ms}ms")
+    if failures:
+        print("性能检查未通过: " + "；".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+冷启动导入耗时检查
+
+在全新的解释器中以 -X importtime 导入手动模式会用到的模块（main、scheduler 及其依赖），
+统计总导入耗时和最耗时的模块，并检查:
+  - 不应出现在一次性运行中的重型模块（APScheduler、asyncio、aiohttp、multiprocessing）没有被导入
+  - 导入过程中没有读取 config.ini（配置在第一次读取配置项时才加载）
+  - 总导入耗时不超过 --max-ms（取多次运行的最小值，减少机器抖动的影响）
+
+任一检查不通过时以状态码 1 退出，可在 CI 中防止冷启动回退。
+
+用法:
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --max-ms 150 --repeat 5 --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 手动模式（python main.py --mode manual）会导入的入口模块
+DEFAULT_MODULES = ["main", "scheduler"]
+
+# 一次性运行不应加载的模块（及其子模块）
+FORBIDDEN_MODULES = ["apscheduler", "asyncio", "aiohttp", "multiprocessing"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+_PROBE = """
+import {modules}
+import config
+print("CONFIG_LOADED=%d" % (config.config._parser is not None))
+"""
+
+
+def measure(modules: List[str]) -> Tuple[float, Dict[str, Tuple[int, int]], bool]:
+    """
+    在子进程中导入 modules 一次
+
+    Returns:
+        (总导入耗时毫秒, 模块名 -> (自身耗时微秒, 累计耗时微秒), 导入过程中是否加载了配置文件)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory(prefix="importtime-") as workdir:
+        # 在空目录中运行，确保结果不受当前目录下 config.ini 的影响
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(modules=", ".join(modules))],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True,
+        )
+
+    timings: Dict[str, Tuple[int, int]] = {}
+    total_us = 0
+    tracking = False
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        # site 及其依赖在解释器启动时导入，与本项目无关；之后的导入才计入统计
+        if not tracking:
+            if len(indent) == 1 and name == "site":
+                tracking = True
+            continue
+        timings[name] = (self_us, cumulative_us)
+        if len(indent) == 1:
+            total_us += cumulative_us
+    config_loaded = "CONFIG_LOADED=1" in completed.stdout
+    return total_us / 1000, timings, config_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时检查")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="要导入的入口模块")
+    parser.add_argument("--max-ms", type=float, default=200.0, help="总导入耗时上限（毫秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="运行次数，取最小值")
+    parser.add_argument("--top", type=int, default=10, help="列出累计耗时最高的模块数")
+    args = parser.parse_args()
+
+    runs = [measure(args.modules) for _ in range(max(1, args.repeat))]
+    total_ms, timings, config_loaded = min(runs, key=lambda run: run[0])
+
+    print(f"导入 {', '.join(args.modules)} 总耗时 {total_ms:.1f} ms（{len(runs)} 次取最小值）")
+    print(f"累计耗时最高的 {args.top} 个模块:")
+    ranked = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (自身 {self_us / 1000:6.1f} ms)  {name}")
+
+    failures = []
+    loaded = sorted({name.split(".")[0] for name in timings} & set(FORBIDDEN_MODULES))
+    if loaded:
+        failures.append(f"导入了一次性运行不需要的模块: {', '.join(loaded)}")
+    if config_loaded:
+        failures.append("导入模块时读取了配置文件")
+    if total_ms > args.max_ms:
+        failures.append(f"总导入耗时 {total_ms:.1f} ms > {args.max_ms} ms")
+    if failures:
+        print("冷启动检查未通过: " + "；".join(failures))
+        sys.exit(1)
+    print("冷启动检查通过")
+
+
+if __name__ == "__main__":
+    main()
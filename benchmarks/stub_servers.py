@@ -0,0 +1,176 @@
+"""
+和风天气与微信接口的本地桩服务，供离线基准测试使用
+
+一个 HTTP 服务同时模拟:
+  - /v7/weather/now、/v7/weather/3d            和风天气实时天气与3天预报
+  - /cgi-bin/token                               微信 access_token
+  - /cgi-bin/message/template/send               微信模板消息发送
+
+可以分别配置天气与微信接口的响应延迟、模板消息的随机错误率（-1 系统繁忙）以及
+服务端限速（超过每秒配额时返回 45009），用于观察重试与自适应限速在压力下的表现。
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = ["晴", "多云", "阴", "小雨", "中雨", "雷阵雨", "小雪", "雾", "霾"]
+
+
+class StubSettings:
+    """桩服务的行为参数，运行中修改立即生效"""
+
+    def __init__(self, weather_latency: float = 0.05, wechat_latency: float = 0.05, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, seed: int = 0):
+        """
+        Args:
+            weather_latency: 和风天气接口的响应延迟（秒）
+            wechat_latency: 微信接口的响应延迟（秒）
+            error_rate: 模板消息返回 -1（系统繁忙）的概率
+            rate_limit: 模板消息的服务端限速（条/秒），超出时返回 45009；None 表示不限速
+            seed: 随机错误的种子，保证多次运行可比
+        """
+        self.weather_latency = weather_latency
+        self.wechat_latency = wechat_latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+
+
+class _StubState:
+    """请求计数与服务端限速窗口"""
+
+    def __init__(self, settings: StubSettings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.errcodes: Dict[int, int] = {}
+        self.tokens_issued = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def count(self, path: str) -> None:
+        with self.lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+
+    def send_errcode(self) -> int:
+        with self.lock:
+            errcode = 0
+            if self.settings.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                if self._window_count > self.settings.rate_limit:
+                    errcode = 45009
+            if not errcode and self.settings.error_rate and self.settings.random.random() < self.settings.error_rate:
+                errcode = -1
+            self.errcodes[errcode] = self.errcodes.get(errcode, 0) + 1
+            return errcode
+
+
+def _weather_now(location: str) -> dict:
+    seed = sum(ord(ch) for ch in location)
+    return {
+        "code": "200",
+        "now": {"text": CONDITIONS[seed % len(CONDITIONS)], "temp": str(10 + seed % 20), "windDir": "东北风",
+                "windScale": str(1 + seed % 5), "precip": "0.0" if seed % 3 else "1.5", "humidity": "60"},
+    }
+
+
+def _weather_3d(location: str) -> dict:
+    seed = sum(ord(ch) for ch in location)
+    return {
+        "code": "200",
+        "daily": [
+            {"fxDate": time.strftime("%Y-%m-%d", time.localtime(time.time() + day * 86400)),
+             "tempMin": str(5 + seed % 10 + day), "tempMax": str(15 + seed % 15 + day),
+             "uvIndex": str((seed + day) % 11), "textDay": CONDITIONS[(seed + day) % len(CONDITIONS)], "precip": "0.0"}
+            for day in range(3)
+        ],
+    }
+
+
+def _make_handler(state: _StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            state.count(url.path)
+            location = parse_qs(url.query).get("location", ["default"])[0]
+            if url.path.endswith("/weather/now"):
+                time.sleep(state.settings.weather_latency)
+                return self._reply(_weather_now(location))
+            if url.path.endswith("/weather/3d"):
+                time.sleep(state.settings.weather_latency)
+                return self._reply(_weather_3d(location))
+            if url.path.endswith("/cgi-bin/token"):
+                time.sleep(state.settings.wechat_latency)
+                with state.lock:
+                    state.tokens_issued += 1
+                    token = f"bench-token-{state.tokens_issued}"
+                return self._reply({"access_token": token, "expires_in": 7200})
+            self.send_error(404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            state.count(url.path)
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not url.path.endswith("/message/template/send"):
+                return self.send_error(404)
+            time.sleep(state.settings.wechat_latency)
+            errcode = state.send_errcode()
+            return self._reply({"errcode": errcode, "errmsg": "ok" if errcode == 0 else "stub error"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的 listen 队列只有 5，高并发压测时会出现连接被重置
+    request_queue_size = 1024
+
+
+class StubServer:
+    """在后台线程中运行的桩服务"""
+
+    def __init__(self, settings: Optional[StubSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or StubSettings()
+        self.state = _StubState(self.settings)
+        self._server = _Server((host, port), _make_handler(self.state))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
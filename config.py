@@ -1,19 +1,51 @@
 import configparser
+import logging
+import threading
 from typing import Dict, Optional
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 
 class Config:
-    """配置文件处理类，负责读取和解析配置信息"""
+    """
+    配置文件处理类，负责读取和解析配置信息
+
+    配置文件在第一次读取配置项时才加载，导入本模块本身不访问磁盘。
+    """
 
     def __init__(self, config_path: str = "config.ini"):
         """
-        初始化配置解析器并加载配置文件
+        初始化配置解析器，配置文件延迟到第一次读取时加载
 
         Args:
             config_path: 配置文件路径，默认为 "config.ini"
         """
-        self.config = configparser.ConfigParser()
-        self.config.read(config_path, encoding="utf-8")
+        self.config_path = config_path
+        self._parser: Optional[configparser.ConfigParser] = None
+        self._lock = threading.Lock()
+        self._warned = set()
+
+    @property
+    def config(self) -> configparser.ConfigParser:
+        """已加载的 ConfigParser，第一次访问时读取配置文件"""
+        parser = self._parser
+        if parser is None:
+            with self._lock:
+                if self._parser is None:
+                    # 允许在值后面用 " ; 说明" 写注释（README 中的示例配置即为这种写法）
+                    parser = configparser.ConfigParser(inline_comment_prefixes=(";",))
+                    parser.read(self.config_path, encoding="utf-8")
+                    self._parser = parser
+                parser = self._parser
+        return parser
+
+    def reload(self, config_path: Optional[str] = None) -> None:
+        """丢弃已加载的配置，下次读取时重新加载（可同时切换配置文件路径）"""
+        with self._lock:
+            if config_path is not None:
+                self.config_path = config_path
+            self._parser = None
 
     def get(self, section: str, key: str, default: Optional[str] = None) -> Optional[str]:
         """
@@ -29,6 +61,12 @@ class Config:
         """
         return self.config.get(section, key, fallback=default)
 
+    def _warn_invalid(self, section: str, key: str, value: str, default) -> None:
+        """配置值无法解析时提示一次，避免写错的配置被默认值悄悄替换"""
+        if (section, key) not in self._warned:
+            self._warned.add((section, key))
+            logger.warning(f"配置 [{section}] {key} = {value!r} 无法解析，使用默认值 {default}")
+
     def get_int(self, section: str, key: str, default: Optional[int] = None) -> Optional[int]:
         """获取整数类型的配置值"""
         value = self.get(section, key)
@@ -37,6 +75,20 @@ class Config:
         try:
             return int(value)
         except (ValueError, TypeError):
+            if value.strip():
+                self._warn_invalid(section, key, value, default)
+            return default
+
+    def get_float(self, section: str, key: str, default: Optional[float] = None) -> Optional[float]:
+        """获取浮点数类型的配置值"""
+        value = self.get(section, key)
+        if value is None:
+            return default
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            if value.strip():
+                self._warn_invalid(section, key, value, default)
             return default
 
     def get_boolean(self, section: str, key: str, default: Optional[bool] = None) -> Optional[bool]:
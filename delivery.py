@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from config import config
+from metrics import bind_run
+from payload_builder import TemplatePayloadBuilder
+from wechat_client import THROTTLE_ERRCODES, WeChatClient
+
+if TYPE_CHECKING:  # asyncio 与异步HTTP客户端只在 --mode async 下导入
+    from async_http import AsyncHttpClient
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限速器，多个发送线程共享同一个桶，平滑控制每秒请求数"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数，即稳定状态下的最大请求速率
+            capacity: 桶容量，即允许的瞬时突发请求数，默认与 rate 相同
+        """
+        if rate <= 0:
+            raise ValueError("令牌桶速率必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """按流逝的时间补充令牌（调用方需持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        阻塞直到取得指定数量的令牌
+
+        Returns:
+            float: 本次等待的秒数
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        不阻塞地尝试取得令牌，供事件循环中的调用方使用
+
+        Returns:
+            float: 取得令牌时返回 0，否则返回还需要等待的秒数
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def set_rate(self, rate: float) -> None:
+        """调整补充速率，降速时同时丢弃超出新速率一秒配额的存量令牌，避免降速后仍有突发"""
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            self._tokens = min(self._tokens, max(1.0, self.rate))
+
+
+class DeliveryEngine:
+    """并发投递引擎：有界线程池 + 令牌桶限速，同时向多个 open_id 发送模板消息"""
+
+    def __init__(self, wechat_client: WeChatClient, max_workers: Optional[int] = None,
+                 rate_per_second: Optional[float] = None, burst: Optional[float] = None):
+        """
+        初始化投递引擎，未显式传入的参数从配置文件 [delivery] 节读取
+
+        Args:
+            wechat_client: 已初始化的微信客户端
+            max_workers: 并发发送线程数
+            rate_per_second: 每秒最多发送的消息数
+            burst: 允许的瞬时突发消息数
+        """
+        self.wechat_client = wechat_client
+        self.max_workers = max_workers or config.get_int("delivery", "max_workers", 8)
+        rate = rate_per_second or config.get_float("delivery", "rate_per_second", 20.0)
+        burst = burst or config.get_float("delivery", "burst", rate)
+        self.rate_limiter = TokenBucket(rate, burst)
+
+        # 自适应限速：遇到频率/配额类错误码时按比例降速（每秒最多一次），之后每次成功逐步恢复
+        self.max_rate = rate
+        self.min_rate = min(rate, config.get_float("delivery", "min_rate", 1.0))
+        self.slowdown_factor = config.get_float("delivery", "slowdown_factor", 0.5)
+        self.recovery_step = config.get_float("delivery", "recovery_step", max(0.1, rate * 0.05))
+        self._rate_lock = threading.Lock()
+        self._last_slowdown = 0.0
+
+    def adjust_rate(self, errcode: Optional[int]) -> None:
+        """根据微信返回的错误代码调整发送速率"""
+        if errcode in THROTTLE_ERRCODES:
+            with self._rate_lock:
+                now = time.monotonic()
+                # 并发线程往往同时收到同一波限流错误，短时间内只降速一次
+                if now - self._last_slowdown < 1.0:
+                    return
+                self._last_slowdown = now
+                new_rate = max(self.min_rate, self.rate_limiter.rate * self.slowdown_factor)
+                self.rate_limiter.set_rate(new_rate)
+            logger.warning(f"微信接口返回错误代码 {errcode}，发送速率降至 {new_rate:.1f} 条/秒")
+        elif errcode == 0 and self.rate_limiter.rate < self.max_rate:
+            with self._rate_lock:
+                self.rate_limiter.set_rate(min(self.max_rate, self.rate_limiter.rate + self.recovery_step))
+
+    def _send_one(self, user: Dict[str, str], send: Callable[[str, Dict[str, str]], bool]) -> bool:
+        """限速后向单个用户发送消息，任何异常都视为发送失败"""
+        open_id = user.get("open_id")
+        user_name = user.get("name", "亲爱的")
+        try:
+            self.rate_limiter.acquire()
+            success = send(open_id, user)
+        except Exception as e:
+            logger.error(f"向用户 {user_name} (open_id: {open_id}) 发送消息时发生错误: {e}")
+            return False
+        self._log_result(user_name, success)
+        return success
+
+    @staticmethod
+    def _log_result(user_name: str, success: bool) -> None:
+        if success:
+            logger.info(f"向用户 {user_name} 发送消息成功")
+        else:
+            logger.error(f"向用户 {user_name} 发送消息失败")
+
+    def _run(self, users: Iterable[Dict[str, str]], send: Callable[[str, Dict[str, str]], bool]) -> Dict[str, bool]:
+        """在有界线程池中对每个用户执行 send(open_id, user)，返回以 open_id 为键的结果字典"""
+        results: Dict[str, bool] = {}
+        # 限制在途任务数量，避免超大用户列表一次性全部进入线程池队列
+        in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        start = time.monotonic()
+        self.wechat_client.add_errcode_listener(self.adjust_rate)
+
+        @bind_run
+        def _task(user: Dict[str, str]) -> None:
+            try:
+                results[user["open_id"]] = self._send_one(user, send)
+            finally:
+                in_flight.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="wechat-send") as executor:
+                for user in users:
+                    if not user.get("open_id"):
+                        logger.warning("跳过没有open_id的用户")
+                        continue
+                    in_flight.acquire()
+                    executor.submit(_task, user)
+        finally:
+            self.wechat_client.remove_errcode_listener(self.adjust_rate)
+
+        succeeded = sum(1 for ok in results.values() if ok)
+        logger.info(f"投递完成: 成功 {succeeded}/{len(results)}，耗时 {time.monotonic() - start:.2f} 秒，"
+                    f"当前速率 {self.rate_limiter.rate:.1f} 条/秒，错误代码统计 {self.wechat_client.errcode_stats()}")
+        return results
+
+    def deliver(self, users: Iterable[Dict[str, str]],
+                build_message: Callable[[Dict[str, str]], List[Dict[str, str]]],
+                url: Optional[str] = None) -> Dict[str, bool]:
+        """
+        并发向多个用户发送模板消息
+
+        Args:
+            users: 用户列表，每个用户至少包含 open_id
+            build_message: 根据用户信息构建模板消息数据的函数
+            url: (可选) 用户点击模板消息后跳转的URL
+
+        Returns:
+            以 open_id 为键、发送是否成功为值的结果字典
+        """
+        def _send(open_id: str, user: Dict[str, str]) -> bool:
+            return self.wechat_client.send_template_message(open_id, build_message(user), url=url)
+
+        return self._run(users, _send)
+
+    def deliver_prepared(self, users: Iterable[Dict[str, str]], payload: TemplatePayloadBuilder) -> Dict[str, bool]:
+        """
+        并发发送同一条预序列化的模板消息，每个用户只拼接自己的 open_id 和称呼
+
+        Args:
+            users: 用户列表，每个用户至少包含 open_id
+            payload: 由 WeChatClient.prepare_template 创建的请求体构建器
+
+        Returns:
+            以 open_id 为键、发送是否成功为值的结果字典
+        """
+        def _send(open_id: str, user: Dict[str, str]) -> bool:
+            body = payload.build(open_id, user.get("name", "亲爱的"))
+            return self.wechat_client.send_template_payload(open_id, body)
+
+        return self._run(users, _send)
+
+    async def deliver_prepared_async(self, users: Iterable[Dict[str, str]], payload: TemplatePayloadBuilder,
+                                     http: "AsyncHttpClient", max_concurrency: Optional[int] = None) -> Dict[str, bool]:
+        """
+        deliver_prepared 的异步版本：在事件循环中并发发送，速率与自适应降速规则相同
+
+        Args:
+            users: 用户列表，每个用户至少包含 open_id
+            payload: 由 WeChatClient.prepare_template 创建的请求体构建器
+            http: 异步HTTP客户端
+            max_concurrency: 同时在途的请求数，默认读取 [async] max_concurrency（32）
+
+        Returns:
+            以 open_id 为键、发送是否成功为值的结果字典
+        """
+        import asyncio
+
+        semaphore = asyncio.Semaphore(max_concurrency or config.get_int("async", "max_concurrency", 32))
+        results: Dict[str, bool] = {}
+        start = time.monotonic()
+
+        async def _send(user: Dict[str, str]) -> None:
+            open_id = user["open_id"]
+            user_name = user.get("name", "亲爱的")
+            # 先取令牌再占用并发名额，等待限速时不占用连接
+            wait = self.rate_limiter.try_acquire()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.rate_limiter.try_acquire()
+            async with semaphore:
+                try:
+                    success = await self.wechat_client.send_template_payload_async(
+                        http, open_id, payload.build(open_id, user_name)
+                    )
+                except Exception as e:
+                    logger.error(f"向用户 {user_name} (open_id: {open_id}) 发送消息时发生错误: {e}")
+                    success = False
+            self._log_result(user_name, success)
+            results[open_id] = success
+
+        self.wechat_client.add_errcode_listener(self.adjust_rate)
+        try:
+            await asyncio.gather(*(_send(user) for user in users if user.get("open_id")))
+        finally:
+            self.wechat_client.remove_errcode_listener(self.adjust_rate)
+
+        succeeded = sum(1 for ok in results.values() if ok)
+        logger.info(f"投递完成: 成功 {succeeded}/{len(results)}，耗时 {time.monotonic() - start:.2f} 秒，"
+                    f"当前速率 {self.rate_limiter.rate:.1f} 条/秒")
+        return results
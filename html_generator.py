@@ -1,72 +1,40 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+from string import Formatter
+import hashlib
+import json
+import logging
+import os
 import re
+import tempfile
+import time
 
+from phrase_catalog import get_catalog
 
-def _generate_alerts_html(alerts: List[str]) -> str:
-    """如果存在预警信息，则生成HTML模块"""
-    if not alerts:
-        return ""
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-    items_html = "".join([f"<li>{alert}</li>" for alert in alerts])
-    return f"""
-    <div class="alerts-card glass-card">
-        <div class="alerts-header">
-            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M10.29 3.86L1.82 18a2 2 0 0 0 1.71 3h16.94a2 2 0 0 0 1.71-3L13.71 3.86a2 2 0 0 0-3.42 0z"></path><line x1="12" y1="9" x2="12" y2="13"></line><line x1="12" y1="17" x2="12.01" y2="17"></line></svg>
-            <span>今日特别提醒</span>
-        </div>
-        <ul>{items_html}</ul>
-    </div>
-    """
 
+# 天气主题对应的 header 大 emoji
+_WEATHER_EMOJIS = {
+    "sunny": "☀️",
+    "rainy": "🌧️",
+    "cloudy": "☁️",
+    "snowy": "❄️",
+    "foggy": "🌫️",
+    "default": "🌤️",
+}
 
-def _get_weather_emoji(theme: str) -> str:
-    """根据天气主题返回对应的 header 大 emoji"""
-    emoji_map = {
-        "sunny": "☀️",
-        "rainy": "🌧️",
-        "cloudy": "☁️",
-        "snowy": "❄️",
-        "foggy": "🌫️",
-        "default": "🌤️",
-    }
-    return emoji_map.get(theme, "🌤️")
+# 紫外线取值 -> 进度条 CSS 类名 的解析结果缓存
+_UV_LEVEL_CLASS_CACHE: Dict[str, str] = {}
 
+# 天气主题对应的浏览器 theme-color
+_THEME_COLORS = {
+    "sunny": "#ffb74d", "rainy": "#4dd0e1", "cloudy": "#90a4ae",
+    "snowy": "#e0f2f1", "foggy": "#b0bec5", "default": "#66a6ff"
+}
 
-def _get_condition_emoji(theme: str) -> str:
-    """根据天气主题返回天气状况小 emoji"""
-    return _get_weather_emoji(theme)
-
-
-def _get_uv_level_class(uv_value: str) -> str:
-    """根据紫外线值返回进度条 CSS 类名"""
-    match = re.search(r'(\d+)', str(uv_value))
-    if match:
-        try:
-            uv = int(match.group(1))
-            if uv <= 2:   return "uv-level-1"
-            if uv <= 5:   return "uv-level-2"
-            if uv <= 7:   return "uv-level-3"
-            if uv <= 10:  return "uv-level-4"
-            return "uv-level-5"
-        except ValueError:
-            pass
-    return "uv-level-1"
-
-
-def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.html"):
-    """
-    根据传入的天气数据字典，生成毛玻璃（Glassmorphism）风格的天气报告HTML页面。
-    """
-    # 动态生成预警模块
-    alerts_html = _generate_alerts_html(data.get("alerts", []))
-
-    # 衍生字段
-    theme = data.get("theme", "default")
-    data["header_emoji"] = _get_weather_emoji(theme)
-    data["condition_emoji"] = _get_condition_emoji(theme)
-    data["uv_level_class"] = _get_uv_level_class(data.get("uv_value", ""))
-
-    html_template = """
+# 页面模板，使用 str.format 语法（{{ }} 为字面量花括号），首次渲染时编译
+_HTML_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
@@ -383,6 +351,74 @@ def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.ht
             .uv-level-4 {{ background: linear-gradient(90deg, #ff9800, #f44336); width: 80%; }}
             .uv-level-5 {{ background: linear-gradient(90deg, #f44336, #d32f2f); width: 100%; }}
 
+            /* ===== 多日预报 ===== */
+            .forecast-card {{
+                display: flex;
+                padding: 14px 8px;
+                margin-bottom: 16px;
+            }}
+            .forecast-day {{
+                flex: 1;
+                display: flex;
+                flex-direction: column;
+                align-items: center;
+                gap: 3px;
+                font-size: 12px;
+                color: var(--secondary-text-color);
+            }}
+            .forecast-day + .forecast-day {{
+                border-left: 1px solid rgba(255, 255, 255, 0.25);
+            }}
+            .forecast-day .forecast-label {{
+                font-size: 14px;
+                font-weight: 600;
+                color: var(--theme-primary);
+            }}
+            .forecast-day .forecast-emoji {{
+                font-size: 24px;
+                line-height: 1.3;
+            }}
+            .forecast-day .forecast-temp {{
+                font-size: 13px;
+                font-weight: 600;
+                color: var(--text-color);
+            }}
+
+            /* ===== 温度趋势 ===== */
+            .trend-card {{
+                padding: 16px 18px 14px;
+                margin-bottom: 16px;
+            }}
+            .trend-header {{
+                display: flex;
+                justify-content: space-between;
+                align-items: baseline;
+                font-size: 14px;
+                font-weight: 600;
+                color: var(--theme-primary);
+            }}
+            .trend-header .trend-range {{
+                font-size: 12px;
+                font-weight: 400;
+                color: var(--secondary-text-color);
+            }}
+            .trend-card svg {{
+                display: block;
+                width: 100%;
+                height: 72px;
+                margin-top: 8px;
+            }}
+            .trend-card .trend-max {{ stroke: var(--theme-primary); }}
+            .trend-card .trend-min {{ stroke: var(--secondary-text-color); opacity: 0.55; }}
+            .trend-axis {{
+                display: flex;
+                justify-content: space-between;
+                font-size: 11px;
+                color: var(--secondary-text-color);
+                opacity: 0.7;
+                margin-top: 4px;
+            }}
+
             /* ===== Footer 页脚 ===== */
             .footer-card {{
                 padding: 20px;
@@ -489,6 +525,12 @@ def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.ht
                 </div>
             </div>
 
+            <!-- 未来几天预报 -->
+            {forecast_html}
+
+            <!-- 近期温度趋势（如有历史数据） -->
+            {trend_html}
+
             <!-- 页脚寄语 -->
             <div class="footer-card glass-card">
                 <p><span class="footer-icon">💖</span> {note}</p>
@@ -498,19 +540,193 @@ def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.ht
     </html>
     """
 
+
+class CompiledTemplate:
+    """
+    预编译的 str.format 风格模板
+
+    模板只在编译时解析一次，拆分为静态文本片段与占位符槽位；
+    渲染时仅把槽位填入数据后整体 join，不再重复解析模板和转义花括号。
+    """
+
+    def __init__(self, template: str):
+        self._chunks: List[str] = []
+        self._slots: List[Tuple[int, str]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if literal:
+                self._chunks.append(literal)
+            if field_name is None:
+                continue
+            if format_spec or conversion or not field_name.isidentifier():
+                raise ValueError(f"模板占位符 {{{field_name}}} 不支持格式说明或属性访问")
+            self._slots.append((len(self._chunks), field_name))
+            self._chunks.append("")
+        self.field_names = frozenset(name for _, name in self._slots)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """
+        用 values 填充所有槽位并返回完整文本
+
+        Raises:
+            KeyError: values 中缺少模板需要的字段
+        """
+        chunks = self._chunks.copy()
+        for index, name in self._slots:
+            chunks[index] = str(values[name])
+        return "".join(chunks)
+
+
+_compiled_template: Optional[CompiledTemplate] = None
+
+
+def _get_compiled_template() -> CompiledTemplate:
+    """获取编译后的页面模板，首次调用时编译"""
+    global _compiled_template
+    if _compiled_template is None:
+        _compiled_template = CompiledTemplate(_HTML_TEMPLATE)
+    return _compiled_template
+
+
+def _generate_alerts_html(alerts: List[str]) -> str:
+    """如果存在预警信息，则生成HTML模块"""
+    if not alerts:
+        return ""
+
+    items_html = "".join([f"<li>{alert}</li>" for alert in alerts])
+    return f"""
+    <div class="alerts-card glass-card">
+        <div class="alerts-header">
+            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M10.29 3.86L1.82 18a2 2 0 0 0 1.71 3h16.94a2 2 0 0 0 1.71-3L13.71 3.86a2 2 0 0 0-3.42 0z"></path><line x1="12" y1="9" x2="12" y2="13"></line><line x1="12" y1="17" x2="12.01" y2="17"></line></svg>
+            <span>今日特别提醒</span>
+        </div>
+        <ul>{items_html}</ul>
+    </div>
+    """
+
+
+def _generate_forecast_html(forecast: Optional[List[Dict[str, str]]]) -> str:
+    """
+    生成未来几天的逐日预报卡片，只有今天一天的数据时不显示
+
+    Args:
+        forecast: MessageBuilder.get_forecast_days() 的结果
+    """
+    if not forecast or len(forecast) < 2:
+        return ""
+    days_html = "".join(
+        f"""
+        <div class="forecast-day">
+            <span class="forecast-label">{day["label"]}</span>
+            <span>{day["date"]}</span>
+            <span class="forecast-emoji">{_get_weather_emoji(day.get("theme", "default"))}</span>
+            <span>{day["condition"]}</span>
+            <span class="forecast-temp">{day["temperature"]}</span>
+            <span>💧 {day["precipitation"]}</span>
+        </div>"""
+        for day in forecast
+    )
+    return f"""
+    <div class="forecast-card glass-card">{days_html}
+    </div>
+    """
+
+
+def _sparkline_points(values: List[Optional[float]], low: float, high: float,
+                      width: float, height: float, pad: float) -> str:
+    """把一组数值映射为 SVG polyline 的坐标，缺失的值跳过"""
+    step = width / (len(values) - 1)
+    scale = (height - 2 * pad) / ((high - low) or 1.0)
+    return " ".join(
+        f"{index * step:.1f},{height - pad - (value - low) * scale:.1f}"
+        for index, value in enumerate(values) if value is not None
+    )
+
+
+def _generate_trend_html(trend: Optional[Dict[str, List[Any]]]) -> str:
+    """
+    根据历史存档的逐日最高/最低温度生成趋势折线图（内联 SVG），不足两天的数据时不显示
+
+    Args:
+        trend: {"date": [...], "temp_max": [...], "temp_min": [...]}
+    """
+    if not trend or len(trend.get("date", [])) < 2:
+        return ""
+    highs, lows = trend.get("temp_max", []), trend.get("temp_min", [])
+    known = [value for value in highs + lows if value is not None]
+    if not known:
+        return ""
+    low, high = min(known), max(known)
+    width, height, pad = 300.0, 72.0, 6.0
+    lines = "".join(
+        f'<polyline class="{css_class}" points="{_sparkline_points(values, low, high, width, height, pad)}" '
+        f'fill="none" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" />'
+        for css_class, values in (("trend-max", highs), ("trend-min", lows)) if any(v is not None for v in values)
+    )
+    first, last = trend["date"][0][5:], trend["date"][-1][5:]
+    return f"""
+    <div class="trend-card glass-card">
+        <div class="trend-header">
+            <span>近 {len(trend["date"])} 天气温</span>
+            <span class="trend-range">{low:g}℃ ~ {high:g}℃</span>
+        </div>
+        <svg viewBox="0 0 {width:g} {height:g}" preserveAspectRatio="none">{lines}</svg>
+        <div class="trend-axis"><span>{first}</span><span>{last}</span></div>
+    </div>
+    """
+
+
+def _get_weather_emoji(theme: str) -> str:
+    """根据天气主题返回对应的 header 大 emoji"""
+    return _WEATHER_EMOJIS.get(theme, "🌤️")
+
+
+def _get_condition_emoji(theme: str) -> str:
+    """根据天气主题返回天气状况小 emoji"""
+    return _get_weather_emoji(theme)
+
+
+def _get_uv_level_class(uv_value: str) -> str:
+    """根据紫外线值返回进度条 CSS 类名，同一取值只解析一次"""
+    uv_value = str(uv_value)
+    css_class = _UV_LEVEL_CLASS_CACHE.get(uv_value)
+    if css_class is None:
+        match = re.search(r'(\d+)', uv_value)
+        css_class = get_catalog().uv_level(int(match.group(1)))[2] if match else "uv-level-1"
+        _UV_LEVEL_CLASS_CACHE[uv_value] = css_class
+    return css_class
+
+
+def render_html_page(data: Dict[str, Any]) -> str:
+    """
+    根据传入的天气数据字典渲染毛玻璃风格天气页面，返回HTML文本（不写文件）
+
+    Raises:
+        KeyError: 数据字典中缺少模板需要的字段
+    """
+    # 衍生字段
+    theme = data.get("theme", "default")
+    data["header_emoji"] = _get_weather_emoji(theme)
+    data["condition_emoji"] = _get_condition_emoji(theme)
+    data["uv_level_class"] = _get_uv_level_class(data.get("uv_value", ""))
+
+    values = dict(data)
+    # 动态生成预警模块
+    values["alerts_html"] = _generate_alerts_html(data.get("alerts", []))
+    # 未来几天预报
+    values["forecast_html"] = _generate_forecast_html(data.get("forecast"))
+    # 历史温度趋势图
+    values["trend_html"] = _generate_trend_html(data.get("trend"))
     # 动态设置 theme-color
-    theme_colors = {
-        "sunny": "#ffb74d", "rainy": "#4dd0e1", "cloudy": "#90a4ae",
-        "snowy": "#e0f2f1", "foggy": "#b0bec5", "default": "#66a6ff"
-    }
-    theme_color = theme_colors.get(data.get("theme", "default"))
+    values["theme_color"] = _THEME_COLORS.get(theme)
+    return _get_compiled_template().render(values)
+
 
+def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.html"):
+    """
+    根据传入的天气数据字典，生成毛玻璃（Glassmorphism）风格的天气报告HTML页面。
+    """
     try:
-        filled_html = html_template.format(
-            theme_color=theme_color,
-            alerts_html=alerts_html,
-            **data
-        )
+        filled_html = render_html_page(data)
         with open(output_path, "w", encoding="utf-8") as f:
             f.write(filled_html)
         print(f"成功生成毛玻璃风格HTML页面: {output_path}")
@@ -518,3 +734,126 @@ def create_html_page(data: Dict[str, Any], output_path: str = "weather_report.ht
         print(f"生成HTML失败：数据字典中缺少键 {e}。")
     except Exception as e:
         print(f"生成或写入HTML文件时发生未知错误: {e}")
+
+
+def safe_path_component(name: str) -> str:
+    """把地点等任意字符串转换为可安全用作目录名的形式"""
+    return re.sub(r"[^0-9A-Za-z_-]+", "_", name).strip("_") or "default"
+
+
+def report_path(output_dir: str, key: str, date: Optional[str] = None) -> str:
+    """报告页面的路径 output_dir/<key>/<date>.html，渲染前即可确定，用于提前生成访问链接"""
+    return os.path.join(output_dir, safe_path_component(key), f"{date or time.strftime('%Y-%m-%d')}.html")
+
+
+def write_file_atomic(path: str, content: str) -> None:
+    """先写入同目录下的临时文件再原子替换，读者不会看到写了一半的页面"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".html")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _render_report_job(job: Tuple[str, Dict[str, Any], str, Optional[str]]) -> Tuple[str, str, str, bool]:
+    """
+    批量渲染的单个任务（需为模块级函数以便在子进程中执行）
+
+    渲染结果的哈希与上次记录相同且文件仍存在时跳过写盘。
+    """
+    key, data, output_path, previous_hash = job
+    html = render_html_page(data)
+    digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    if digest == previous_hash and os.path.exists(output_path):
+        return key, output_path, digest, False
+    write_file_atomic(output_path, html)
+    return key, output_path, digest, True
+
+
+def load_report_state(state_path: str) -> Dict[str, str]:
+    """读取上次运行记录的 页面路径 -> 内容哈希，文件不存在或损坏时返回空字典"""
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取页面状态文件 {state_path} 失败，将重新生成所有页面: {e}")
+        return {}
+
+
+def save_report_state(state_path: str, state: Dict[str, str]) -> None:
+    """保存 页面路径 -> 内容哈希，内容没有变化时不重写文件"""
+    content = json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    write_file_atomic(state_path, content)
+
+
+def render_reports_batch(reports: Dict[str, Dict[str, Any]], output_dir: str = "reports",
+                         date: Optional[str] = None, max_workers: Optional[int] = None,
+                         parallel_threshold: int = 8,
+                         previous_hashes: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    批量渲染多份天气报告到 output_dir/<key>/<date>.html
+
+    报告数量达到 parallel_threshold 时使用进程池并行渲染，否则在当前进程内渲染，
+    避免少量页面时创建进程的开销。每个页面都以原子方式写入；内容哈希与
+    previous_hashes 中记录的相同时跳过写盘。
+
+    Args:
+        reports: 以报告键（通常为地点）为键、页面数据字典为值
+        output_dir: 输出根目录
+        date: 文件名（不含扩展名），默认今天的日期（YYYY-MM-DD）；非默认时间槽为 "<日期>-<时间槽>"
+        max_workers: 进程数，默认为 CPU 核数
+        parallel_threshold: 启用进程池的最少报告数
+        previous_hashes: (可选) 上次运行记录的 页面路径 -> 内容哈希
+
+    Returns:
+        清单字典：报告键 -> {"path": 页面路径, "sha256": 页面内容哈希, "changed": 是否重新写入}；
+        渲染失败的报告不会出现在清单中
+    """
+    date = date or time.strftime("%Y-%m-%d")
+    previous_hashes = previous_hashes or {}
+    jobs = []
+    for key, data in reports.items():
+        output_path = report_path(output_dir, key, date)
+        jobs.append((key, data, output_path, previous_hashes.get(output_path)))
+
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if len(jobs) >= parallel_threshold and (max_workers is None or max_workers > 1):
+        # 进程池会连带导入 multiprocessing，只在确实需要并行渲染时才导入
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(job[0], executor.submit(_render_report_job, job)) for job in jobs]
+            for key, future in futures:
+                try:
+                    _, path, digest, changed = future.result()
+                    manifest[key] = {"path": path, "sha256": digest, "changed": changed}
+                except Exception as e:
+                    logger.error(f"渲染报告 {key} 失败: {e}")
+    else:
+        for job in jobs:
+            try:
+                key, path, digest, changed = _render_report_job(job)
+                manifest[key] = {"path": path, "sha256": digest, "changed": changed}
+            except Exception as e:
+                logger.error(f"渲染报告 {job[0]} 失败: {e}")
+
+    changed_count = sum(1 for entry in manifest.values() if entry["changed"])
+    logger.info(f"批量生成HTML页面完成: {len(manifest)}/{len(jobs)} 份，其中 {changed_count} 份内容有变化，输出目录 {output_dir}")
+    return manifest
@@ -0,0 +1,68 @@
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_timeout() -> float:
+    """获取HTTP请求超时时间（秒），对应配置 [http] timeout"""
+    return config.get_float("http", "timeout", 10.0)
+
+
+def create_session(pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                   max_retries: Optional[int] = None, backoff_factor: Optional[float] = None) -> requests.Session:
+    """
+    创建带连接池和重试策略的 requests.Session
+
+    同一个 Session 会复用到同一主机的 keep-alive 连接，避免每次请求都重新进行 TCP/TLS 握手。
+    未显式传入的参数从配置文件 [http] 节读取。
+
+    Args:
+        pool_connections: 缓存的主机连接池数量
+        pool_maxsize: 每个主机连接池的最大连接数，应不小于并发发送线程数
+        max_retries: 连接错误及 5xx 响应的最大重试次数（仅对 GET 等幂等请求生效）
+        backoff_factor: 重试退避系数
+    """
+    pool_connections = pool_connections or config.get_int("http", "pool_connections", 4)
+    pool_maxsize = pool_maxsize or config.get_int("http", "pool_maxsize", 16)
+    if max_retries is None:
+        max_retries = config.get_int("http", "max_retries", 2)
+    if backoff_factor is None:
+        backoff_factor = config.get_float("http", "backoff_factor", 0.3)
+
+    # 模板消息发送是 POST，不在传输层自动重试，避免网络抖动时给用户重复推送
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """获取进程内共享的 Session，天气客户端与微信客户端默认共用同一组连接池"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+                logger.info("已创建共享HTTP连接池")
+    return _shared_session
@@ -1,7 +1,9 @@
-from scheduler import WeatherNotificationScheduler
 import logging
 import argparse
 
+# 各模式用到的模块在对应的函数中才导入：手动模式不加载 APScheduler 与 asyncio，
+# 配置文件也在第一次读取配置项时才加载，缩短 GitHub Actions 上一次性运行的冷启动时间
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,8 @@ def manual_send():
     """手动发送一次天气通知"""
     try:
         logger.info("开始手动发送天气通知...")
+        from scheduler import WeatherNotificationScheduler
+
         # 直接复用 WeatherNotificationScheduler 中的发送逻辑，不再重复造轮子
         scheduler_instance = WeatherNotificationScheduler()
         scheduler_instance.send_weather_notification()
@@ -20,22 +24,75 @@ def manual_send():
         logger.error(traceback.format_exc())
 
 
+def async_send():
+    """在事件循环上手动发送一次天气通知"""
+    try:
+        logger.info("开始以异步模式发送天气通知...")
+        import asyncio
+        from scheduler import WeatherNotificationScheduler
+
+        scheduler_instance = WeatherNotificationScheduler()
+        asyncio.run(scheduler_instance.send_weather_notification_async())
+        logger.info("异步模式发送天气通知完成")
+    except Exception as e:
+        logger.error(f"异步模式发送时发生错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+
+def tomorrow_send():
+    """手动发送一次明日天气通知（复用缓存中的 3 天预报）"""
+    try:
+        logger.info("开始发送明日天气通知...")
+        from scheduler import WeatherNotificationScheduler
+
+        scheduler_instance = WeatherNotificationScheduler()
+        scheduler_instance.send_tomorrow_notification()
+        logger.info("明日天气通知发送完成")
+    except Exception as e:
+        logger.error(f"发送明日天气通知时发生错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+
+def watch():
+    """持续轮询天气，天气变化时向受影响地点的用户推送提醒"""
+    try:
+        from scheduler import WeatherNotificationScheduler
+        from weather_watcher import WeatherWatcher
+
+        WeatherWatcher(WeatherNotificationScheduler()).run()
+    except Exception as e:
+        logger.error(f"天气监控运行时发生错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+
 def main():
     """主函数，解析命令行参数并执行相应操作"""
     parser = argparse.ArgumentParser(description="天气微信推送系统")
     parser.add_argument(
         "--mode",
-        choices=["scheduler", "manual"],
+        choices=["scheduler", "manual", "async", "tomorrow", "watch"],
         default="scheduler",
-        help="运行模式: scheduler(定时任务模式) 或 manual(手动发送模式)"
+        help="运行模式: scheduler(定时任务模式)、manual(手动发送模式)、async(异步流水线，手动发送一次) "
+             "、tomorrow(手动发送一次明日天气) 或 watch(持续监控天气变化并推送提醒)"
     )
     args = parser.parse_args()
 
     if args.mode == "scheduler":
+        from scheduler import WeatherNotificationScheduler
+
         scheduler = WeatherNotificationScheduler()
         scheduler.start_scheduler()
     elif args.mode == "manual":
         manual_send()
+    elif args.mode == "async":
+        async_send()
+    elif args.mode == "tomorrow":
+        tomorrow_send()
+    elif args.mode == "watch":
+        watch()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from weather_client import WeatherClient
+from weather_snapshot import DailyForecast, WeatherSnapshot, format_number
+from phrase_catalog import PhraseCatalog, get_catalog
 from datetime import datetime
 import logging
-import random
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -11,120 +12,174 @@ logger = logging.getLogger(__name__)
 class MessageBuilder:
     """消息构建器，负责根据天气数据生成个性化提示信息"""
 
-    def __init__(self, weather_client: WeatherClient):
+    def __init__(self, weather_client: WeatherClient, catalog: Optional[PhraseCatalog] = None):
+        """
+        Args:
+            weather_client: 天气客户端
+            catalog: (可选) 文案目录，默认使用按 [messages] 配置加载的共享目录
+        """
         self.weather_client = weather_client
+        self.catalog = catalog or get_catalog()
+        self._shared_values_key: Optional[tuple] = None
+        self._shared_values: Tuple[str, ...] = ()
 
-    def get_greeting(self) -> str:
-        """根据当前时间生成问候语"""
-        hour = datetime.now().hour
-        if 5 <= hour < 9:
-            return "早上好呀！新的一天开始了，元气满满哦~"
-        elif 9 <= hour < 12:
-            return "上午好呀！工作学习也要记得适当休息哦~"
-        elif 12 <= hour < 18:
-            return "下午好呀！注意劳逸结合，保持高效状态~"
-        else:
-            return "晚上好呀！忙碌了一天，好好放松一下吧~"
+    def get_greeting(self, hour: Optional[int] = None) -> str:
+        """根据当前时间（或指定的小时，如用户所在时区的当前小时）生成问候语"""
+        return self.catalog.greeting(datetime.now().hour if hour is None else hour)
+
+    @property
+    def snapshot(self) -> Optional[WeatherSnapshot]:
+        """当前天气客户端最近一次成功获取的天气快照"""
+        return self.weather_client.snapshot
+
+    def get_temperature_level(self) -> Optional[str]:
+        """
+        根据今日最高/最低气温判断体感类别
+
+        Returns:
+            "hot"（炎热）、"cold"（寒冷）、"wide_range"（昼夜温差大）、"mild"（适宜），温度数据缺失时返回 None
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return self._temperature_level(snapshot.temp_min, snapshot.temp_max)
+
+    @staticmethod
+    def _temperature_level(temp_min: Optional[float], temp_max: Optional[float]) -> Optional[str]:
+        if temp_min is None or temp_max is None:
+            return None
+        if temp_max >= 30:
+            return "hot"
+        if temp_max <= 10:
+            return "cold"
+        if (temp_max - temp_min) >= 8:
+            return "wide_range"
+        return "mild"
+
+    def get_temperature_parts(self) -> Tuple[str, Optional[str]]:
+        """返回 (今日气温说明, 体感提示)，温度数据不完整时体感提示为 None"""
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.has_forecast:
+            return "今日温度信息获取失败", None
+
+        temp_range = snapshot.temperature_range
+        level = self.get_temperature_level()
+        if level is None:
+            return f"今日气温: {temp_range}，请注意根据实际情况增减衣物~", None
+        return f"今日气温: {temp_range}", self.catalog.temperature_advice(level)
 
     def get_temperature_tips(self) -> str:
         """根据温度范围生成提示"""
-        temp_range = self.weather_client.get_temperature_range()
-        if temp_range == "未知":
-            return "今日温度信息获取失败"
+        headline, advice = self.get_temperature_parts()
+        return f"{headline}\n{advice}" if advice else headline
 
-        try:
-            min_temp_str, max_temp_str = temp_range.split(" ~ ")
-            min_temp = float(min_temp_str.replace("℃", ""))
-            max_temp = float(max_temp_str.replace("℃", ""))
-        except:
-            return f"今日气温: {temp_range}，请注意根据实际情况增减衣物~"
-
-        tip = f"今日气温: {temp_range}\n"
-        if max_temp >= 30:
-            tip += "天气炎热，注意防暑降温，多补充水分哦~"
-        elif max_temp <= 10:
-            tip += "天气寒冷，注意保暖，出门记得多穿点~"
-        elif (max_temp - min_temp) >= 8:
-            tip += "昼夜温差较大，注意适时增减衣物，预防感冒~"
-        else:
-            tip += "温度适宜，体感舒适，祝你一天好心情~"
-        return tip
+    def get_precipitation_parts(self) -> Tuple[str, str]:
+        """返回 (降水情况, 出行提示)"""
+        precip = self.snapshot.precip if self.snapshot is not None else 0.0
+        if precip > 0:
+            return f"当前有降水(约{precip}mm)", "出门请记得带好雨具哦~"
+        return "当前无降水", "放心出行~"
 
     def get_precipitation_tips(self) -> str:
         """根据实时降水生成提示"""
-        precip = self.weather_client.get_precipitation()
-        if precip > 0:
-            return f"当前有降水(约{precip}mm)，出门请记得带好雨具哦~"
-        return "当前无降水，放心出行~"
+        return "，".join(self.get_precipitation_parts())
 
-    def get_weather_condition_tips(self) -> str:
-        """根据天气状况生成提示，每种天气有3句随机提示语"""
+    def get_condition_tip_list(self) -> List[str]:
+        """根据天气状况生成提示语列表，每种天气有3句随机提示语"""
         condition = self.weather_client.get_weather_condition().lower()
         if condition == "未知":
-            return "天气状况信息获取失败"
-
-        # 为每种天气定义3句不同的提示语
-        weather_tips = {
-            "雨": [
-                "今天有雨，出门请记得带伞，雨天路滑注意安全。",
-                "雨天出行，记得穿防滑鞋，开车减速慢行，注意安全。",
-                "雨水滋润万物，但也别忘了保持干爽，带好雨具出门哦。"
-            ],
-            "雪": [
-                "今天有雪，注意防寒保暖，雪天路滑，出行请格外小心。",
-                "雪花纷飞的日子，多穿些保暖的衣物，防止感冒。",
-                "银装素裹的美景虽美，但路面湿滑，出行需谨慎。"
-            ],
-            "晴": [
-                "天气晴朗，阳光明媚，适合户外活动，也要注意防晒哦。",
-                "晴空万里，是出游的好日子，记得涂抹防晒霜保护皮肤。",
-                "阳光正好，不妨出门走走，呼吸新鲜空气，放松心情。"
-            ],
-            "阴": [
-                "今天天气阴沉，但别让天气影响心情，要开心呀。",
-                "阴天虽然没有阳光，但也不会晒伤，适合轻松出行。",
-                "阴天光线柔和，是拍照的好时机，不妨记录美好瞬间。"
-            ],
-            "雾霾": [
-                "今天有雾或霾，能见度较低，外出请注意安全，可佩戴口罩。",
-                "雾霾天气，尽量减少户外活动，必须外出时请戴好口罩。",
-                "今天空气质量不佳，开车注意减速慢行，保持安全距离。"
-            ],
-            "风": [
-                "今天风力较大，注意防风，保护好自己不要着凉。",
-                "大风天气，外出请系好围巾，扣好衣扣，以防感冒。",
-                "风大时请关好门窗，外出注意安全，避免在广告牌等物体下逗留。"
-            ]
-        }
+            return ["天气状况信息获取失败"]
+        # 以日期为种子随机选择提示语：同一天重复运行得到相同的内容，页面没有变化时可以跳过重新生成
+        return list(self.catalog.condition_tips(condition, seed=f"{datetime.now():%Y-%m-%d}"))
 
-        tips = []
-        # 根据天气状况选择对应的随机提示语
-        if "雨" in condition: 
-            tips.append(random.choice(weather_tips["雨"]))
-        if "雪" in condition: 
-            tips.append(random.choice(weather_tips["雪"]))
-        if "晴" in condition: 
-            tips.append(random.choice(weather_tips["晴"]))
-        if "阴" in condition: 
-            tips.append(random.choice(weather_tips["阴"]))
-        if "雾" in condition or "霾" in condition: 
-            tips.append(random.choice(weather_tips["雾霾"]))
-        if "风" in condition: 
-            tips.append(random.choice(weather_tips["风"]))
-
-        return "\n".join(tips) if tips else f"今天天气{condition}，祝你事事顺心~。爱你仪姐，明天见"
+    def get_weather_condition_tips(self) -> str:
+        """根据天气状况生成提示，每种天气有3句随机提示语"""
+        return "\n".join(self.get_condition_tip_list())
+
+    def get_uv_parts(self) -> Tuple[str, Optional[str]]:
+        """返回 (紫外线指数, 防护提示)，紫外线数据缺失时防护提示为 None"""
+        uv_index = self.snapshot.uv_index if self.snapshot is not None else None
+        if uv_index is None:
+            return "紫外线指数信息获取失败", None
+
+        label, tip, _ = self.catalog.uv_level(uv_index)
+        return f"{uv_index}", f"({label})，{tip}"
 
     def get_uv_tips(self) -> str:
         """根据紫外线指数生成提示"""
-        uv_index = self.weather_client.get_uv_index()
-        if uv_index is None:
-            return "紫外线指数信息获取失败"
+        value, tip = self.get_uv_parts()
+        return f"紫外线指数: {value} {tip}" if tip else value
 
-        if uv_index <= 2: return f"紫外线指数: {uv_index} (最弱)，无需特殊防护。"
-        if uv_index <= 5: return f"紫外线指数: {uv_index} (中等)，外出建议涂抹防晒霜。"
-        if uv_index <= 7: return f"紫外线指数: {uv_index} (强)，请做好防护，如戴帽子、太阳镜。"
-        if uv_index <= 10: return f"紫外线指数: {uv_index} (很强)，尽量减少在午间长时间暴露。"
-        return f"紫外线指数: {uv_index} (极强)，请尽量避免外出，做好万全防护。"
+    def _day_label(self, offset: int, forecast: DailyForecast) -> str:
+        labels = ("今天", "明天", "后天")
+        if offset < len(labels):
+            return labels[offset]
+        return forecast.date[5:] if forecast.date else f"第{offset + 1}天"
+
+    def get_forecast_days(self, days: int = 3) -> List[Dict[str, str]]:
+        """
+        逐日预报列表，用于页面的多日天气卡片
+
+        Returns:
+            每天一项: label（今天/明天/后天）、date（MM-DD）、condition、theme、temperature、precipitation、uv
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+        rows = []
+        for offset, forecast in enumerate(snapshot.forecast[:days]):
+            rows.append({
+                "label": self._day_label(offset, forecast),
+                "date": forecast.date[5:] if forecast.date else "",
+                "condition": forecast.condition,
+                "theme": self.catalog.theme_for((forecast.condition_day or "").lower()),
+                "temperature": forecast.temperature_range,
+                "precipitation": f"{format_number(forecast.precip)}mm" if forecast.precip is not None else "?",
+                "uv": format_number(forecast.uv_index),
+            })
+        return rows
+
+    def get_forecast_overview(self, days: int = 3) -> str:
+        """多日天气概览文本，每天一行，如 "明天 05-21 小雨转多云 12℃ ~ 20℃" """
+        return "\n".join(
+            " ".join(filter(None, (row["label"], row["date"], row["condition"], row["temperature"])))
+            for row in self.get_forecast_days(days)
+        )
+
+    def get_day_parts(self, offset: int = 1) -> Optional[Dict[str, str]]:
+        """
+        第 offset 天（默认明天）的模板消息字段，用于晚间的明日天气推送
+
+        Returns:
+            temperature / weather_condition / wind / precipitation / uv 五个字段；没有该天的预报时返回 None
+        """
+        forecast = self.weather_client.get_daily_forecast(offset)
+        if forecast is None:
+            return None
+        label = self._day_label(offset, forecast)
+
+        temperature = f"{label}气温: {forecast.temperature_range}"
+        level = self._temperature_level(forecast.temp_min, forecast.temp_max)
+        if level is not None:
+            temperature = f"{temperature}，{self.catalog.temperature_advice(level)}"
+
+        # 文案库中的天气提示语以"今天"为语境，明日消息只给出天气状况本身
+        if forecast.precip:
+            precipitation = f"{label}预计有降水(约{format_number(forecast.precip)}mm)，出门请记得带好雨具哦~"
+        else:
+            precipitation = f"{label}预计无降水，放心出行~"
+        if forecast.uv_index is None:
+            uv = "紫外线指数信息获取失败"
+        else:
+            uv_label, uv_tip, _ = self.catalog.uv_level(forecast.uv_index)
+            uv = f"{forecast.uv_index} ({uv_label})，{uv_tip}"
+        return {
+            "temperature": temperature,
+            "weather_condition": f"{label}{forecast.condition}",
+            "wind": forecast.wind_info,
+            "precipitation": precipitation,
+            "uv": uv,
+        }
 
     def get_wind_tips(self) -> str:
         """根据风力风向生成提示"""
@@ -137,53 +192,49 @@ class MessageBuilder:
         每天一句不重复，用日期(1~31)从31句语料池中选取，
         同一日期的每天固定对应同一句，形成"每日限定"的感觉。
         """
-        now = datetime.now()
-        day = now.day          # 1~31
-        weekday = now.weekday()  # 0=周一, 6=周日
-
-        # 31句每日寄语池（每天不重样）
-        daily_notes = [
-            "愿你今天有个好心情，一切顺利哦！💖",
-            "今天也要做个开心的人，世界也会对你温柔以待🌸",
-            "日子平淡，好在有你在身边，今天也要好好过呀✨",
-            "新的一天，新的好运正在派送中，请查收🎁",
-            "今天也要好好吃饭、好好喝水、好好爱自己哦🥰",
-            "不管天气怎样，都要做自己的小太阳☀️",
-            "今天的你，比昨天更好，比明天更值得期待🌈",
-            "生活明朗，万物可爱，今天也要元气满满💪",
-            "把每一天都过得闪闪发光，你就是最棒的🌟",
-            "今天又是被世界偏爱的一天，要开心呀🎈",
-            "累了就歇歇，想我了就看看天气推送，我一直都在💕",
-            "今天的任务：认真做好每件小事，然后好好休息😊",
-            "好运正在路上，你先要开心起来，它才能找到你🍀",
-            "不管今天遇到什么，记得有我在背后支持你💗",
-            "生活可能偶尔不如意，但你的笑容总能治愈一切😄",
-            "今天也要像阳光一样，温暖而不炙热，明亮而不刺眼🌻",
-            "每一个平凡的日子，都值得被认真对待和珍惜📅",
-            "今天的你，一定会被好运和善意包围的🤗",
-            "愿你今天所有的小目标都能实现，加油呀🎯",
-            "今天是最年轻的一天，当然要开心地过呀🎉",
-            "记得多笑笑，你笑起来真的很好看😊",
-            "生活也许很忙，但别忘了照顾好自己，你很重要💝",
-            "今天的快乐正在派送中，记得保持心情愉快哦📬",
-            "愿你的每一天都像今天的天气一样，刚刚好☁️",
-            "万物皆可期待，今天也要满怀希望地出发🚀",
-            "你是被爱着的，今天也是，每一天都是💗",
-            "今天做个简单快乐的人，不想太多，只管开心🥳",
-            "今天的运气指数五颗星，快去发现生活中的小确幸⭐",
-            "无论今天发生了什么，回家路上记得买点好吃的犒劳自己🍰",
-            "你值得拥有这世界上所有美好的东西，包括今天的美好🌷",
-            "又过了一天，离我们见面的日子又近了一点🥰",
-        ]
-
-        # 用日期选取当天的专属寄语（day 取值范围 1~31）
-        note = daily_notes[(day - 1) % len(daily_notes)]
+        note = self.catalog.daily_note(datetime.now().day)
 
         # 如果有名字，加上称呼
         if name:
             return f"{name}，{note}"
         return note
 
+    def _shared_message_values(self) -> Tuple[str, ...]:
+        """
+        与用户无关的消息字段，按 (天气快照, 日期, 小时) 缓存
+
+        同一地点的所有用户共享这些内容，批量构建消息时只需计算一次。
+        """
+        now = datetime.now()
+        key = (self.snapshot, now.year, now.month, now.day, now.hour)
+        if self._shared_values_key != key:
+            self._shared_values = (
+                self.get_greeting(),
+                now.strftime("%Y年%m月%d日 %A"),
+                self.get_temperature_tips(),
+                self.get_weather_condition_tips(),
+                self.get_wind_tips(),
+                self.get_precipitation_tips(),
+                self.get_uv_tips(),
+                self.get_daily_note(),
+            )
+            self._shared_values_key = key
+        return self._shared_values
+
+    def compose_message(self, user_name: str = "亲爱的") -> List[Dict[str, str]]:
+        """用已获取的天气数据构建模板消息内容（不会重新请求天气）"""
+        greeting, date, temperature, condition, wind, precipitation, uv, note = self._shared_message_values()
+        return [
+            {"name": "greeting", "value": f"{user_name}，{greeting}"},
+            {"name": "date", "value": date},
+            {"name": "temperature", "value": temperature},
+            {"name": "weather_condition", "value": condition},
+            {"name": "wind", "value": wind},
+            {"name": "precipitation", "value": precipitation},
+            {"name": "uv", "value": uv},
+            {"name": "note", "value": note}
+        ]
+
     def build_personalized_message(self, user_name: str = "亲爱的") -> List[Dict[str, str]]:
         """构建个性化的微信模板消息内容"""
         # 确保在构建消息前，获取最新的天气数据
@@ -195,16 +246,7 @@ class MessageBuilder:
             ]
 
         try:
-            message = [
-                {"name": "greeting", "value": f"{user_name}，{self.get_greeting()}"},
-                {"name": "date", "value": datetime.now().strftime("%Y年%m月%d日 %A")},
-                {"name": "temperature", "value": self.get_temperature_tips()},
-                {"name": "weather_condition", "value": self.get_weather_condition_tips()},
-                {"name": "wind", "value": self.get_wind_tips()},
-                {"name": "precipitation", "value": self.get_precipitation_tips()},
-                {"name": "uv", "value": self.get_uv_tips()},
-                {"name": "note", "value": self.get_daily_note()}
-            ]
+            message = self.compose_message(user_name)
             logger.info("成功构建个性化消息")
             return message
         except Exception as e:
@@ -0,0 +1,290 @@
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from config import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的桶上限（秒），覆盖从单次 HTTP 请求到整次 git 推送的范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "weather_push"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """固定桶的耗时直方图，记录次数、总和、最值，分位数按桶内线性插值估算"""
+
+    __slots__ = ("buckets", "counts", "count", "total", "min", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """估算分位数（0 < q < 1）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": round(self.min, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+class MetricsRegistry:
+    """
+    一次运行的指标：各阶段耗时直方图（带成功/失败标签）与计数器
+
+    线程安全，可在发送线程池、事件循环和渲染线程中同时记录。
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._histograms: Dict[LabelKey, Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def observe(self, stage: str, seconds: float, status: str = "ok", **labels: Any) -> None:
+        """记录某个阶段的一次耗时"""
+        key = _label_key(dict(labels, stage=stage, status=status))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """计数器加 value"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    @contextmanager
+    def span(self, stage: str, **labels: Any) -> Iterator["Span"]:
+        """
+        计时一个阶段，代码块抛出异常或调用了 span.fail() 时记为失败
+
+        用法:
+            with metrics.span("render") as span:
+                if not ok:
+                    span.fail()
+        """
+        span = Span()
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.failed = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, "error" if span.failed else "ok", **labels)
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式（可供 node_exporter 的 textfile collector 采集）"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Duration of each pipeline stage",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        for key, histogram in histograms:
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f"{METRIC_PREFIX}_stage_seconds_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{_format_labels(key)} {histogram.total:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{_format_labels(key)} {histogram.count}")
+
+        declared = set()
+        for (name, key), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(key)} {value:g}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def to_summary(self) -> Dict[str, Any]:
+        """导出为 JSON 友好的字典：stages[阶段][状态] = 耗时统计，counters[名称][标签] = 值"""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        stages: Dict[str, Dict[str, Any]] = {}
+        for key, histogram in histograms:
+            labels = dict(key)
+            stage, status = labels.pop("stage"), labels.pop("status")
+            name = status if not labels else f"{status}," + ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            stages.setdefault(stage, {})[name] = histogram.to_dict()
+        counter_summary: Dict[str, Dict[str, float]] = {}
+        for (name, key), value in counters:
+            label = ",".join(f"{k}={v}" for k, v in key) or "total"
+            counter_summary.setdefault(name, {})[label] = value
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": counter_summary,
+        }
+
+
+class Span:
+    """span() 产出的句柄，用于把没有抛出异常的失败（如返回 False）标记为失败"""
+
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self) -> None:
+        self.failed = True
+
+
+# 每次运行的注册表保存在上下文变量中：定时推送与天气监控在各自的线程中运行，
+# 互相重叠时各自记录、各自导出；没有开始运行的线程（如 token 后台刷新）记入默认注册表
+_current: "contextvars.ContextVar[MetricsRegistry]" = contextvars.ContextVar(
+    "metrics_registry", default=MetricsRegistry())
+
+
+def get_metrics() -> MetricsRegistry:
+    """当前运行的指标注册表"""
+    return _current.get()
+
+
+def start_run() -> MetricsRegistry:
+    """在当前线程（或协程）中开始新一次运行，之后记录的指标都属于这次运行"""
+    registry = MetricsRegistry()
+    _current.set(registry)
+    return registry
+
+
+def bind_run(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    把函数绑定到当前运行的注册表
+
+    线程池的工作线程不会继承提交者的上下文，提交任务前用它包装，
+    工作线程中记录的指标才会属于发起提交的这次运行。
+    """
+    registry = _current.get()
+
+    @functools.wraps(func)
+    def _run(*args, **kwargs):
+        token = _current.set(registry)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return _run
+
+
+def _write_atomic(path: str, content: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def export_run(run_summary: Optional[Dict[str, Any]] = None,
+               registry: Optional[MetricsRegistry] = None,
+               json_path: Optional[str] = None,
+               prometheus_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    在运行结束时按配置 [metrics] 导出指标
+
+    prometheus_path 写入 Prometheus 文本格式，json_path 写入包含运行摘要的 JSON，
+    两者都配置时同时写入；enabled = false 时不写任何文件。
+
+    Args:
+        run_summary: 写入 JSON 的运行摘要
+        registry: 要导出的注册表，默认为当前运行的注册表
+        json_path / prometheus_path: 传入时代替 [metrics] 中的同名配置，空字符串表示不写该文件
+
+    Returns:
+        指标摘要（同 MetricsRegistry.to_summary）
+    """
+    registry = registry or _current.get()
+    summary = registry.to_summary()
+    if not config.get_boolean("metrics", "enabled", True):
+        return summary
+    if prometheus_path is None:
+        prometheus_path = config.get("metrics", "prometheus_path")
+    if json_path is None:
+        json_path = config.get("metrics", "json_path", ".cache/last_run_metrics.json")
+    try:
+        if prometheus_path:
+            _write_atomic(prometheus_path, registry.to_prometheus())
+        if json_path:
+            document = {"run": run_summary or {}, "metrics": summary}
+            _write_atomic(json_path, json.dumps(document, ensure_ascii=False, indent=2, default=str))
+    except OSError as e:
+        logger.warning(f"写入运行指标失败: {e}")
+        return summary
+
+    send = summary["stages"].get("send", {})
+    parts = [f"{stage} {sum(h['sum'] for h in stats.values()):.2f}s" for stage, stats in summary["stages"].items()
+             if stage != "send"]
+    if send:
+        counts = sum(h["count"] for h in send.values())
+        p99 = max(h["p99"] for h in send.values())
+        parts.append(f"send {counts} 次 p99 {p99 * 1000:.0f}ms")
+    logger.info(f"运行指标已导出（{'，'.join(parts)}）")
+    return summary
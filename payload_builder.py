@@ -0,0 +1,101 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库 json
+    orjson = None
+
+# 消息数据中代表用户称呼的占位符，构建请求体时替换为每个用户的名字
+USER_NAME = "\x00user_name\x00"
+_OPEN_ID = "\x00open_id\x00"
+
+# 需要 JSON 转义的字符：双引号、反斜杠和控制字符
+_NEEDS_ESCAPE = re.compile(r'["\\\x00-\x1f]')
+
+
+def build_template_request(template_id: str, open_id: str, data: List[Dict[str, str]],
+                           url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    把 [{"name": ..., "value": ..., "color": ...}] 形式的消息数据转换为模板消息接口的请求体
+
+    Args:
+        template_id: 模板ID
+        open_id: 接收消息的用户openid
+        data: 消息数据
+        url: (可选) 用户点击模板消息后跳转的URL
+    """
+    template_data = {}
+    for item in data:
+        name = item.get("name")
+        value = item.get("value", "")
+        color = item.get("color", "#173177")
+        if name:
+            template_data[name] = {"value": value, "color": color}
+
+    request_data = {
+        "touser": open_id,
+        "template_id": template_id,
+        "data": template_data
+    }
+    if url:
+        request_data["url"] = url
+    return request_data
+
+
+def encode_template_request(request_data: Dict[str, Any]) -> bytes:
+    """把请求体序列化为微信接口要求的 UTF-8 JSON，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(request_data)
+    return json.dumps(request_data, ensure_ascii=False).encode("utf-8")
+
+
+def _escape_json_string(value: str) -> str:
+    """返回 value 作为 JSON 字符串内容（不含两侧引号）的转义形式"""
+    if _NEEDS_ESCAPE.search(value) is None:
+        return value
+    return json.dumps(value, ensure_ascii=False)[1:-1]
+
+
+class TemplatePayloadBuilder:
+    """
+    模板消息请求体的预序列化构建器
+
+    一次推送中，所有用户的请求体只有 touser 与称呼不同。构建器在创建时把公共部分
+    序列化一次并按占位符切分为字节片段，之后每个用户只需转义自己的 open_id 和名字，
+    再把片段拼接起来，不再对整个请求体重复执行 json.dumps。
+    """
+
+    def __init__(self, template_id: str, data: List[Dict[str, str]], url: Optional[str] = None):
+        """
+        Args:
+            template_id: 模板ID
+            data: 消息数据，值中可包含 USER_NAME 占位符
+            url: (可选) 用户点击模板消息后跳转的URL
+        """
+        serialized = encode_template_request(build_template_request(template_id, _OPEN_ID, data, url))
+        # json.dumps 会把占位符中的控制字符转义为 \u0000，按转义后的形式切分
+        open_id_marker = json.dumps(_OPEN_ID)[1:-1].encode("utf-8")
+        user_name_marker = json.dumps(USER_NAME)[1:-1].encode("utf-8")
+
+        self._segments: List[bytes] = []
+        self._slots: List[bool] = []  # True 表示 open_id 槽位，False 表示用户名槽位
+        pattern = re.compile(re.escape(open_id_marker) + b"|" + re.escape(user_name_marker))
+        position = 0
+        for match in pattern.finditer(serialized):
+            self._segments.append(serialized[position:match.start()])
+            self._slots.append(match.group() == open_id_marker)
+            position = match.end()
+        self._tail = serialized[position:]
+
+    def build(self, open_id: str, user_name: str = "") -> bytes:
+        """生成某个用户的完整请求体"""
+        open_id_bytes = _escape_json_string(open_id).encode("utf-8")
+        user_name_bytes = _escape_json_string(user_name).encode("utf-8")
+        parts = []
+        for segment, is_open_id in zip(self._segments, self._slots):
+            parts.append(segment)
+            parts.append(open_id_bytes if is_open_id else user_name_bytes)
+        parts.append(self._tail)
+        return b"".join(parts)
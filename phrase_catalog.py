@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import random
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Optional, Tuple
+
+from config import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_PHRASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "phrases.json")
+
+# 预先展开的紫外线等级表覆盖的指数范围，超出范围时按最后一级处理
+_UV_TABLE_SIZE = 16
+
+# 条件提示语的记忆化缓存上限，超过后整体清空（日期变化后旧条目自然失效）
+_MEMO_LIMIT = 1024
+
+_catalog: Optional["PhraseCatalog"] = None
+_catalog_lock = threading.Lock()
+
+
+class PhraseCatalog:
+    """
+    只读的文案目录：问候语、温度/天气/紫外线提示、页面主题和每日寄语
+
+    文案从 JSON 文件加载，便于本地化和扩充；加载时一次性构建好查找表，
+    运行期间的各类查询都是查表或命中记忆化缓存，不再重复构建列表和执行字符串匹配。
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data: 文案数据，结构见 phrases.json
+        """
+        # 按小时预先展开问候语
+        default_greeting = data["default_greeting"]
+        greetings = [default_greeting] * 24
+        for item in data["greetings"]:
+            for hour in range(int(item["start_hour"]), int(item["end_hour"])):
+                greetings[hour % 24] = item["text"]
+        self._greetings: Tuple[str, ...] = tuple(greetings)
+
+        self._temperature_advice = MappingProxyType(dict(data["temperature_advice"]))
+
+        self._condition_categories: Tuple[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ...] = tuple(
+            (item["name"], tuple(item["keywords"]), tuple(item["tips"]))
+            for item in data["condition_categories"]
+        )
+        self._condition_fallback: str = data["condition_fallback"]
+        self._themes: Tuple[Tuple[str, str], ...] = tuple(
+            (item["keyword"], item["theme"]) for item in data["themes"]
+        )
+
+        # 按指数预先展开紫外线等级 (等级名称, 防护提示, CSS 类名)
+        levels = [(item.get("max"), item["label"], item["tip"], item["css_class"]) for item in data["uv_levels"]]
+        uv_table = []
+        for uv in range(_UV_TABLE_SIZE):
+            for max_value, label, tip, css_class in levels:
+                if max_value is None or uv <= max_value:
+                    uv_table.append((label, tip, css_class))
+                    break
+        self._uv_table: Tuple[Tuple[str, str, str], ...] = tuple(uv_table)
+
+        self._daily_notes: Tuple[str, ...] = tuple(data["daily_notes"])
+
+        # 天气状况 -> 分类 / 主题 的索引。和风天气的天气描述是有限集合，
+        # 每种描述只在第一次出现时做关键字匹配，之后直接查表
+        self._category_index: Dict[str, Tuple[int, ...]] = {}
+        self._theme_index: Dict[str, str] = {}
+        self._tips_memo: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+    def greeting(self, hour: int) -> str:
+        """根据小时（0~23）返回问候语"""
+        return self._greetings[hour % 24]
+
+    def temperature_advice(self, level: str) -> str:
+        """根据体感类别（hot/cold/wide_range/mild）返回穿衣提示"""
+        return self._temperature_advice[level]
+
+    def _categories_for(self, condition: str) -> Tuple[int, ...]:
+        """天气状况命中的分类下标"""
+        categories = self._category_index.get(condition)
+        if categories is None:
+            categories = tuple(
+                index for index, (_, keywords, _) in enumerate(self._condition_categories)
+                if any(keyword in condition for keyword in keywords)
+            )
+            self._category_index[condition] = categories
+        return categories
+
+    def condition_tips(self, condition: str, seed: str = "") -> Tuple[str, ...]:
+        """
+        返回天气状况对应的提示语，每个命中的分类随机选择一句
+
+        Args:
+            condition: 天气状况描述，如 "小雨"
+            seed: 随机种子的附加部分（如日期），相同的 condition 与 seed 总是得到相同的结果
+        """
+        key = (condition, seed)
+        tips = self._tips_memo.get(key)
+        if tips is not None:
+            return tips
+
+        rng = random.Random(f"{seed}-{condition}")
+        tips = tuple(rng.choice(self._condition_categories[index][2]) for index in self._categories_for(condition))
+        if not tips:
+            tips = (self._condition_fallback.format(condition=condition),)
+        if len(self._tips_memo) >= _MEMO_LIMIT:
+            self._tips_memo.clear()
+        self._tips_memo[key] = tips
+        return tips
+
+    def theme_for(self, condition: str) -> str:
+        """根据天气状况返回页面主题名称，未命中任何关键字时为 "default" """
+        theme = self._theme_index.get(condition)
+        if theme is None:
+            theme = next((name for keyword, name in self._themes if keyword in condition), "default")
+            self._theme_index[condition] = theme
+        return theme
+
+    def uv_level(self, uv_index: int) -> Tuple[str, str, str]:
+        """返回紫外线指数对应的 (等级名称, 防护提示, 进度条 CSS 类名)"""
+        if uv_index < 0:
+            uv_index = 0
+        return self._uv_table[min(uv_index, len(self._uv_table) - 1)]
+
+    def daily_note(self, day: int) -> str:
+        """根据日期（1~31）返回当天的专属寄语"""
+        return self._daily_notes[(day - 1) % len(self._daily_notes)]
+
+
+def load_catalog(path: Optional[str] = None) -> PhraseCatalog:
+    """从 JSON 文件加载文案目录，默认加载项目根目录下的 phrases.json"""
+    path = path or DEFAULT_PHRASES_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        return PhraseCatalog(json.load(f))
+
+
+def get_catalog() -> PhraseCatalog:
+    """获取进程内共享的文案目录，首次调用时按配置 [messages] phrases_path 加载"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                path = config.get("messages", "phrases_path") or DEFAULT_PHRASES_PATH
+                _catalog = load_catalog(path)
+                logger.info(f"已加载文案目录: {path}")
+    return _catalog
@@ -0,0 +1,172 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from config import config
+from metrics import bind_run, get_metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PublishResult:
+    """一次发布的结果：是否成功、耗时和说明"""
+
+    def __init__(self, backend: str, success: bool, duration: float, message: str = "", files: int = 0):
+        self.backend = backend
+        self.success = success
+        self.duration = duration
+        self.message = message
+        self.files = files
+
+    def to_dict(self) -> dict:
+        return {
+            "backend": self.backend,
+            "success": self.success,
+            "duration": round(self.duration, 3),
+            "message": self.message,
+            "files": self.files,
+        }
+
+
+class Publisher:
+    """
+    生成页面的发布后端接口
+
+    子类实现 _publish；publish_async 在后台线程中执行发布，
+    调用方可以在发布进行的同时继续发送微信消息。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _publish(self, paths: List[str], message: str) -> str:
+        """
+        执行发布，返回结果说明
+
+        Raises:
+            Exception: 发布失败时抛出
+        """
+        raise NotImplementedError
+
+    def publish(self, paths: List[str], message: str) -> PublishResult:
+        """同步发布指定文件，任何异常都会被记录为失败结果"""
+        start = time.monotonic()
+        try:
+            detail = self._publish(paths, message)
+            result = PublishResult(self.name, True, time.monotonic() - start, detail, len(paths))
+            logger.info(f"[{self.name}] 发布完成，共 {len(paths)} 个文件，耗时 {result.duration:.2f} 秒: {detail}")
+        except Exception as e:
+            result = PublishResult(self.name, False, time.monotonic() - start, str(e), len(paths))
+            logger.error(f"[{self.name}] 发布失败，耗时 {result.duration:.2f} 秒: {e}")
+        get_metrics().observe("publish", result.duration, "ok" if result.success else "error", backend=self.name)
+        return result
+
+    def publish_async(self, paths: List[str], message: str) -> "Future[PublishResult]":
+        """在后台线程中发布，立即返回 Future"""
+        if self._executor is None:
+            # 单线程执行器保证多次发布按顺序进行，不会并发操作同一个 git 仓库
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"publish-{self.name}")
+        return self._executor.submit(bind_run(self.publish), list(paths), message)
+
+
+class GitPublisher(Publisher):
+    """只暂存生成的文件，合并为一次提交后推送到远程仓库"""
+
+    name = "git"
+
+    def __init__(self, repo_dir: str = ".", remote: Optional[str] = None, branch: Optional[str] = None,
+                 push: bool = True, timeout: float = 120.0):
+        super().__init__()
+        self.repo_dir = repo_dir
+        self.remote = remote
+        self.branch = branch
+        self.push = push
+        self.timeout = timeout
+
+    def _git(self, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        """执行 git 命令，失败时抛出带有 git 输出的 RuntimeError"""
+        completed = subprocess.run(
+            ["git", *args], cwd=self.repo_dir, capture_output=True, text=True, timeout=self.timeout
+        )
+        if check and completed.returncode != 0:
+            output = (completed.stderr or completed.stdout).strip()
+            raise RuntimeError(f"git {args[0]} 失败(退出码 {completed.returncode}): {output}")
+        return completed
+
+    def _publish(self, paths: List[str], message: str) -> str:
+        if not paths:
+            return "没有需要发布的文件"
+        self._git("add", "--", *paths)
+        # 只检查本次生成的文件是否有暂存的改动，不受工作区中其他文件影响
+        if self._git("diff", "--cached", "--quiet", "--", *paths, check=False).returncode == 0:
+            return "文件与仓库中一致，无需提交"
+        self._git("commit", "-m", message, "--", *paths)
+        if not self.push:
+            return "已提交（未推送）"
+        push_args = ["push"]
+        if self.remote:
+            push_args.append(self.remote)
+            if self.branch:
+                push_args.append(self.branch)
+        self._git(*push_args)
+        return "已提交并推送"
+
+
+class LocalDirectoryPublisher(Publisher):
+    """把生成的文件按相对路径复制到本地目录，例如静态网站服务器的根目录"""
+
+    name = "local"
+
+    def __init__(self, target_dir: str):
+        super().__init__()
+        self.target_dir = target_dir
+
+    def _publish(self, paths: List[str], message: str) -> str:
+        for path in paths:
+            destination = os.path.join(self.target_dir, os.path.relpath(path))
+            os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+            tmp_path = f"{destination}.tmp"
+            shutil.copy2(path, tmp_path)
+            os.replace(tmp_path, destination)
+        return f"已复制到 {self.target_dir}"
+
+
+class NoopPublisher(Publisher):
+    """不执行任何发布操作，用于本地调试或由外部流程（如 GitHub Actions）负责提交"""
+
+    name = "none"
+
+    def _publish(self, paths: List[str], message: str) -> str:
+        return "已跳过发布"
+
+
+def create_publisher() -> Publisher:
+    """
+    根据配置文件 [publish] 节创建发布后端
+
+    backend 可选 git（默认）/ local / none。
+    """
+    backend = config.get("publish", "backend", "git")
+    if backend == "none":
+        return NoopPublisher()
+    if backend == "local":
+        target_dir = config.get("publish", "target_dir")
+        if not target_dir:
+            logger.error("publish.backend = local 但未配置 target_dir，将不执行发布")
+            return NoopPublisher()
+        return LocalDirectoryPublisher(target_dir)
+    if backend != "git":
+        logger.warning(f"未知的发布后端: {backend}，使用 git")
+    return GitPublisher(
+        repo_dir=config.get("publish", "repo_dir", "."),
+        remote=config.get("publish", "git_remote"),
+        branch=config.get("publish", "git_branch"),
+        push=config.get_boolean("publish", "git_push", True),
+    )
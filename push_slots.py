@@ -0,0 +1,135 @@
+import datetime
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python 3.8 没有 zoneinfo，此时只支持默认时区
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PushSlot:
+    """
+    推送时间槽：某个时区中每天的一个推送时刻
+
+    推送时间按 slot_minutes 向下取整，同一时区、同一时间槽的用户共用一个定时任务，
+    任务内再按地点分组，每个地点只获取一次天气、批量发送一次。
+    """
+
+    __slots__ = ("hour", "minute", "timezone")
+
+    def __init__(self, hour: int, minute: int, timezone: str):
+        self.hour = hour
+        self.minute = minute
+        self.timezone = timezone
+
+    @property
+    def key(self) -> str:
+        """时间槽标识，如 "07:30@Asia/Shanghai"，用于任务 ID 与发送队列的运行键"""
+        return f"{self.hour:02d}:{self.minute:02d}@{self.timezone}"
+
+    def local_now(self) -> datetime.datetime:
+        """该时区的当前时间，时区无法解析时为本机时间"""
+        zone = _get_zone(self.timezone)
+        return datetime.datetime.now(zone) if zone is not None else datetime.datetime.now()
+
+    def local_date(self) -> str:
+        """该时区当前的日期（YYYY-MM-DD），即这个时间槽本次推送所属的日期"""
+        return self.local_now().strftime("%Y-%m-%d")
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PushSlot) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"PushSlot({self.key!r})"
+
+
+_zone_cache: Dict[str, Optional["ZoneInfo"]] = {}
+
+
+def _get_zone(name: str) -> Optional["ZoneInfo"]:
+    """按名称获取时区，同一名称只解析一次；无效名称返回 None"""
+    if name not in _zone_cache:
+        zone = None
+        if ZoneInfo is not None:
+            try:
+                zone = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                zone = None
+        _zone_cache[name] = zone
+    return _zone_cache[name]
+
+
+def parse_push_time(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """解析 "HH:MM" 格式的推送时间，格式不正确时返回 None"""
+    try:
+        hour, minute = (int(part) for part in (value or "").split(":"))
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour, minute
+
+
+class SlotResolver:
+    """把用户的推送时间与时区归入时间槽，缺失或无效的设置使用默认时间槽"""
+
+    def __init__(self, default_push_time: str, default_timezone: str, slot_minutes: int = 15):
+        """
+        Args:
+            default_push_time: 未设置推送时间的用户使用的时间（HH:MM）
+            default_timezone: 未设置时区的用户使用的时区
+            slot_minutes: 时间槽粒度（分钟），推送时间向下取整到该粒度
+        """
+        self.slot_minutes = max(1, min(slot_minutes, 60))
+        parsed = parse_push_time(default_push_time)
+        if parsed is None:
+            raise ValueError(f"推送时间格式不正确: {default_push_time}，请使用 HH:MM 格式")
+        if ZoneInfo is not None and _get_zone(default_timezone) is None:
+            raise ValueError(f"未知的时区: {default_timezone}")
+        self.default_timezone = default_timezone
+        # 默认时间槽保持配置的推送时间，不做取整
+        self.default = PushSlot(*parsed, default_timezone)
+        self._warned = set()
+
+    def _make_slot(self, hour: int, minute: int, timezone: str) -> PushSlot:
+        return PushSlot(hour, minute - minute % self.slot_minutes, timezone)
+
+    def _warn_once(self, message: str) -> None:
+        if message not in self._warned:
+            self._warned.add(message)
+            logger.warning(message)
+
+    def resolve(self, push_time: Optional[str] = None, timezone: Optional[str] = None) -> PushSlot:
+        """用户的时间槽；只设置了时区时使用该时区的默认推送时间"""
+        if not push_time and not timezone:
+            return self.default
+        if timezone and _get_zone(timezone) is None:
+            self._warn_once(f"未知的时区: {timezone}，相关用户使用默认时区 {self.default_timezone}")
+            timezone = None
+        timezone = timezone or self.default_timezone
+        parsed = parse_push_time(push_time) if push_time else None
+        if push_time and parsed is None:
+            self._warn_once(f"推送时间格式不正确: {push_time}，相关用户使用默认推送时间")
+        if parsed is None:
+            slot = PushSlot(self.default.hour, self.default.minute, timezone)
+            return self.default if slot == self.default else slot
+        return self._make_slot(*parsed, timezone)
+
+    def resolve_user(self, user) -> PushSlot:
+        return self.resolve(user.push_time, user.timezone)
+
+    def count_slots(self, users: Iterable) -> Dict[PushSlot, int]:
+        """统计名单中各时间槽的用户数（流式读取名单，不保存用户）"""
+        counts: Dict[PushSlot, int] = {}
+        for user in users:
+            slot = self.resolve_user(user)
+            counts[slot] = counts.get(slot, 0) + 1
+        return counts
@@ -0,0 +1,53 @@
+import random
+import time
+
+from config import config
+
+
+class RetryPolicy:
+    """
+    指数退避重试策略
+
+    第 n 次重试前等待 [0, min(max_delay, base_delay * 2^(n-1))] 之间的随机时长（full jitter），
+    多个线程或进程同时遇到错误时不会在同一时刻集中重试。
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 jitter: bool = True):
+        """
+        Args:
+            max_attempts: 最多尝试次数（包含第一次请求），1 表示不重试
+            base_delay: 第一次重试的退避上限（秒）
+            max_delay: 单次退避的最大时长（秒）
+            jitter: 是否在退避上限内随机取值
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(0.0, float(max_delay))
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, section: str, max_attempts: int = 3, base_delay: float = 0.5,
+                    max_delay: float = 8.0) -> "RetryPolicy":
+        """从配置文件的指定节读取 max_attempts、backoff_base、backoff_max"""
+        return cls(
+            max_attempts=config.get_int(section, "max_attempts", max_attempts),
+            base_delay=config.get_float(section, "backoff_base", base_delay),
+            max_delay=config.get_float(section, "backoff_max", max_delay),
+        )
+
+    def should_retry(self, attempt: int) -> bool:
+        """第 attempt 次（从 1 开始）尝试失败后是否还可以重试"""
+        return attempt < self.max_attempts
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次尝试失败后、下一次重试前应等待的秒数"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+    def sleep(self, attempt: int) -> float:
+        """按退避时长等待，返回实际等待的秒数"""
+        delay = self.backoff(attempt)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
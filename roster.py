@@ -0,0 +1,214 @@
+import csv
+import json
+import logging
+import sqlite3
+from typing import Any, Iterator, List, Optional
+
+from config import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认每批读取的用户数
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class UserRecord:
+    """
+    一个订阅用户：open_id、称呼、地点，以及可选的推送时间（HH:MM）与时区（如 America/New_York）
+
+    使用 __slots__ 保持每个用户的内存占用最小；同时提供 get / [] 访问，
+    可以直接传给原来接收用户字典的接口（如 DeliveryEngine）。
+    """
+
+    __slots__ = ("open_id", "name", "location", "push_time", "timezone")
+
+    def __init__(self, open_id: str, name: Optional[str] = None, location: Optional[str] = None,
+                 push_time: Optional[str] = None, timezone: Optional[str] = None):
+        self.open_id = open_id
+        self.name = name
+        self.location = location
+        self.push_time = push_time
+        self.timezone = timezone
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return (f"UserRecord(open_id={self.open_id!r}, name={self.name!r}, location={self.location!r}, "
+                f"push_time={self.push_time!r}, timezone={self.timezone!r})")
+
+
+def _field(row: tuple, index: int) -> str:
+    """取第 index 列并转为去除首尾空白的字符串；sqlite 整数列、JSONL 中的数字等非字符串值同样适用"""
+    value = row[index] if len(row) > index else None
+    return str(value).strip() if value is not None else ""
+
+
+class RosterSource:
+    """
+    用户名单来源接口
+
+    子类实现 _iter_raw，逐个产出 (open_id, 称呼, 地点[, 推送时间, 时区])；iter_users 负责校验并补全默认地点，
+    调用方按需逐个或按批读取，整个名单不会一次性加载到内存。
+    """
+
+    name = "base"
+
+    def __init__(self, default_location: Optional[str] = None):
+        """
+        Args:
+            default_location: 未指定地点的用户使用的默认地点
+        """
+        self.default_location = default_location
+
+    def _iter_raw(self) -> Iterator[tuple]:
+        raise NotImplementedError
+
+    def iter_users(self) -> Iterator[UserRecord]:
+        """逐个产出用户，跳过缺少 open_id 或称呼的记录"""
+        skipped = 0
+        for row in self._iter_raw():
+            open_id, name, location, push_time, timezone = (_field(row, index) for index in range(5))
+            if not open_id or not name:
+                skipped += 1
+                continue
+            yield UserRecord(open_id, name, location or self.default_location, push_time or None, timezone or None)
+        if skipped:
+            logger.warning(f"[{self.name}] 跳过 {skipped} 条格式不正确的用户记录，正确格式应为 'openid, 用户名[, 地点]'")
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[UserRecord]]:
+        """按批产出用户列表"""
+        chunk: List[UserRecord] = []
+        for user in self.iter_users():
+            chunk.append(user)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        return self.iter_users()
+
+
+class ConfigRosterSource(RosterSource):
+    """config.ini [users] user_list 中以分号分隔的 "openid, 用户名[, 地点[, 推送时间[, 时区]]]" 列表"""
+
+    name = "config"
+
+    def __init__(self, user_list: str, default_location: Optional[str] = None):
+        super().__init__(default_location)
+        self.user_list = user_list or ""
+
+    def _iter_raw(self) -> Iterator[tuple]:
+        for user_info in self.user_list.split(";"):
+            user_info = user_info.strip()
+            if user_info:
+                yield tuple(part.strip() for part in user_info.split(","))
+
+
+class CsvRosterSource(RosterSource):
+    """CSV 文件，每行 open_id,name[,location[,push_time[,timezone]]]，首行为 open_id 开头的表头时自动跳过"""
+
+    name = "csv"
+
+    def __init__(self, path: str, default_location: Optional[str] = None):
+        super().__init__(default_location)
+        self.path = path
+
+    def _iter_raw(self) -> Iterator[tuple]:
+        with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+            for index, row in enumerate(csv.reader(f)):
+                if index == 0 and row and row[0].strip().lower() == "open_id":
+                    continue
+                if row:
+                    yield row
+
+
+class JsonlRosterSource(RosterSource):
+    """JSON Lines 文件，每行一个 {"open_id", "name", "location", "push_time", "timezone"} 对象，后三项可省略"""
+
+    name = "jsonl"
+
+    def __init__(self, path: str, default_location: Optional[str] = None):
+        super().__init__(default_location)
+        self.path = path
+
+    def _iter_raw(self) -> Iterator[tuple]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    logger.warning(f"[{self.name}] {self.path} 第 {line_no} 行不是合法的JSON: {e}")
+                    continue
+                if not isinstance(item, dict):
+                    logger.warning(f"[{self.name}] {self.path} 第 {line_no} 行不是JSON对象，已跳过")
+                    continue
+                yield (item.get("open_id"), item.get("name"), item.get("location"),
+                       item.get("push_time"), item.get("timezone"))
+
+
+class SqliteRosterSource(RosterSource):
+    """sqlite 数据库中的用户表，表中需有 open_id、name、location 三列，可选 push_time、timezone 列"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, table: str = "users", default_location: Optional[str] = None,
+                 fetch_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(default_location)
+        self.path = path
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"不合法的表名: {table}")
+        self.table = table
+        self.fetch_size = fetch_size
+
+    def _iter_raw(self) -> Iterator[tuple]:
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            columns = {row[1] for row in db.execute(f"PRAGMA table_info({self.table})")}
+            optional = [column if column in columns else "NULL" for column in ("push_time", "timezone")]
+            cursor = db.execute(f"SELECT open_id, name, location, {', '.join(optional)} FROM {self.table}")
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            db.close()
+
+
+def create_roster_source(default_location: Optional[str] = None) -> RosterSource:
+    """
+    根据配置文件 [users] 节创建用户名单来源
+
+    source 可选 config（默认，读取 user_list）/ csv / jsonl / sqlite，后三者从 path 指定的文件读取，
+    sqlite 还可通过 table 指定表名（默认 users）。
+    """
+    source = config.get("users", "source", "config")
+    path = config.get("users", "path")
+    if source in ("csv", "jsonl", "sqlite") and not path:
+        logger.error(f"users.source = {source} 但未配置 path，改为读取 user_list")
+        source = "config"
+    if source == "csv":
+        return CsvRosterSource(path, default_location)
+    if source == "jsonl":
+        return JsonlRosterSource(path, default_location)
+    if source == "sqlite":
+        return SqliteRosterSource(path, config.get("users", "table", "users"), default_location)
+    if source != "config":
+        logger.warning(f"未知的用户名单来源: {source}，使用 user_list")
+    user_list = config.get("users", "user_list", "")
+    if not user_list:
+        logger.warning("未配置任何用户，将无法发送消息")
+    return ConfigRosterSource(user_list, default_location)
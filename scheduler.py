@@ -1,180 +1,697 @@
-from apscheduler.schedulers.blocking import BlockingScheduler
-from weather_client import WeatherClient
+from weather_client import WeatherClient, fetch_forecast_batch, fetch_weather_batch, fetch_weather_batch_async
 from message_builder import MessageBuilder
 from wechat_client import WeChatClient
+from delivery import DeliveryEngine
+from payload_builder import USER_NAME, TemplatePayloadBuilder
+from publisher import PublishResult, create_publisher
+from roster import UserRecord, create_roster_source
+from push_slots import PushSlot, SlotResolver
+from send_queue import create_send_queue
+from weather_archive import create_weather_archive
+from alert_rules import AlertResult, create_alert_engine, evaluate_clients
+from phrase_catalog import get_catalog
 from config import config
-from typing import List, Dict, Any
+from metrics import bind_run, export_run, get_metrics, start_run
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Dict, Any, Optional, Tuple
 import logging
 import traceback
 import time
-from html_generator import create_html_page
+from datetime import datetime
+from html_generator import (render_reports_batch, safe_path_component, write_file_atomic,
+                            load_report_state, save_report_state)
 import os
 
+if TYPE_CHECKING:  # asyncio 与异步HTTP客户端只在 --mode async 下导入
+    import asyncio
+    from async_http import AsyncHttpClient
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 模板消息末尾的默认备注
+DEFAULT_NOTE = "点击查看今日天气详情与穿搭建议💖"
+
+# 明日天气推送在发送队列中的运行键后缀，与当天早上的推送互不影响
+TOMORROW_RUN_SUFFIX = "#tomorrow"
+
+# 非默认时间槽的运行键为 "<日期>#HH:MM@时区"，与 "<日期>" 一起构成当天的早间推送（sqlite GLOB 模式）
+SLOT_RUN_GLOB = "#[0-2][0-9]:[0-5][0-9]@*"
+
 
 class WeatherNotificationScheduler:
     """天气通知定时任务调度器，负责每日自动推送天气信息"""
 
     def __init__(self):
         """初始化定时任务调度器"""
-        self.scheduler = BlockingScheduler(timezone="Asia/Shanghai")
+        # APScheduler 只有定时任务模式才需要，延迟到 start_scheduler 中创建
+        self.scheduler = None
         self.push_time = config.get("scheduler", "push_time", "07:30")
-        self.user_list = self._get_user_list()
+        self.timezone = config.get("scheduler", "timezone", "Asia/Shanghai")
+        self._slot_resolver: Optional[SlotResolver] = None
+        self.tomorrow_push_time = config.get("scheduler", "tomorrow_push_time")
         self.weather_client = WeatherClient()
+        self.default_location = self.weather_client.location
+        self.roster = create_roster_source(self.default_location)
         self.wechat_client = WeChatClient()
+        self.delivery_engine = DeliveryEngine(self.wechat_client)
+        self.publisher = create_publisher()
+        self.send_queue = create_send_queue()
+        self.archive = create_weather_archive()
+        self.alert_engine = create_alert_engine()
+        self._purge_send_queue()
         logger.info(f"定时任务初始化完成，每日推送时间: {self.push_time}")
 
-    def _get_user_list(self) -> List[Dict[str, str]]:
-        """从配置获取用户列表"""
-        users = []
-        user_str = config.get("users", "user_list", "")
-        if not user_str:
-            logger.warning("未配置任何用户，将无法发送消息")
-            return users
-        for user_info in user_str.split(";"):
-            user_info = user_info.strip()
-            if not user_info: continue
-            parts = [part.strip() for part in user_info.split(",")]
-            if len(parts) >= 2:
-                users.append({"open_id": parts[0], "name": parts[1]})
-            else:
-                logger.warning(f"用户信息格式不正确: {user_info}，正确格式应为 'openid, 用户名'")
-        logger.info(f"共加载 {len(users)} 个用户")
-        return users
+    def _purge_send_queue(self) -> None:
+        """清理超过 [queue] retention_days（默认7天）的发送记录"""
+        retention_days = config.get_int("queue", "retention_days", 7)
+        cutoff = time.strftime("%Y-%m-%d", time.localtime(time.time() - retention_days * 86400))
+        deleted = self.send_queue.purge_before(cutoff)
+        if deleted:
+            logger.info(f"已清理 {deleted} 条 {cutoff} 之前的发送记录")
 
     def _get_weather_theme(self, weather_condition: str) -> str:
         """根据天气状况决定页面主题"""
-        condition = weather_condition.lower()
-        if "晴" in condition: return "sunny"
-        if "雨" in condition: return "rainy"
-        if "雪" in condition: return "snowy"
-        if "阴" in condition or "多云" in condition: return "cloudy"
-        if "雾" in condition or "霾" in condition: return "foggy"
-        return "default"
-
-    def _generate_alerts(self, message_builder: MessageBuilder) -> List[str]:
-        """生成需要高亮提醒的关键信息列表"""
-        alerts = []
-        # 降水提醒
-        precip_str = message_builder.get_precipitation_tips()
-        if "带好雨具" in precip_str:
-            alerts.append(precip_str)
-        # 紫外线提醒
-        uv_index = self.weather_client.get_uv_index()
-        if uv_index is not None and uv_index >= 6:
-            alerts.append(f"紫外线强({uv_index}级)，请注意防晒")
-        # 温差提醒
-        temp_tips = message_builder.get_temperature_tips()
-        if "温差较大" in temp_tips:
-            alerts.append("昼夜温差较大，注意及时增减衣物")
-
-        return alerts
-
-
-    def send_weather_notification(self) -> None:
-        """发送天气通知给所有用户"""
+        return get_catalog().theme_for(weather_condition.lower())
+
+    def _render_reports(self, reports: Dict[str, Dict[str, Any]], page_name: Optional[str] = None) -> List[str]:
+        """
+        批量渲染各地点的HTML页面，并为每份报告填入页面路径与访问URL
+
+        页面写入 [report] output_dir/<地点>/<page_name>.html（默认为本机当天的日期）；默认地点的页面额外复制到
+        [report] latest_path（默认 weather_report.html），保持原有的固定链接可用。
+        渲染结果与状态文件中上次记录的哈希相同的页面不会重写。
+
+        Returns:
+            本次内容有变化、实际写入磁盘的文件路径列表
+        """
+        output_dir = config.get("report", "output_dir", "reports")
+        latest_path = config.get("report", "latest_path", "weather_report.html")
+        state_path = self._get_report_state_path()
+        state = load_report_state(state_path)
+
+        with get_metrics().span("render"):
+            manifest = render_reports_batch(
+                {location: report["html_data"] for location, report in reports.items()},
+                output_dir=output_dir,
+                date=page_name,
+                max_workers=config.get_int("report", "max_workers"),
+                previous_hashes=state,
+            )
+        changed_paths = []
+        for location, entry in manifest.items():
+            reports[location]["path"] = entry["path"]
+            reports[location]["sha256"] = entry["sha256"]
+            reports[location]["url"] = self._report_url(entry["path"])
+            state[entry["path"]] = entry["sha256"]
+            if entry["changed"]:
+                changed_paths.append(entry["path"])
+            logger.info(f"地点 {location} 详情页URL: {reports[location]['url']}")
+
+        if latest_path and self.default_location in manifest:
+            entry = manifest[self.default_location]
+            if state.get(latest_path) != entry["sha256"] or not os.path.exists(latest_path):
+                with open(entry["path"], "r", encoding="utf-8") as f:
+                    write_file_atomic(latest_path, f.read())
+                state[latest_path] = entry["sha256"]
+                changed_paths.append(latest_path)
+
+        if changed_paths:
+            save_report_state(state_path, state)
+            changed_paths.append(state_path)
+        unchanged = sum(1 for entry in manifest.values() if not entry["changed"])
+        logger.info(f"页面生成完成: {len(manifest)} 份，其中 {unchanged} 份内容未变化，已跳过写入")
+        return changed_paths
+
+    @staticmethod
+    def _report_url(path: str) -> str:
+        """页面路径对应的访问URL，由 [report] base_url 拼接"""
+        base_url = config.get("report", "base_url", "https://wps0718.github.io/weather-wechat-notification").rstrip("/")
+        return f"{base_url}/{path.replace(os.sep, '/')}"
+
+    def _get_report_state_path(self) -> str:
+        """页面内容哈希状态文件的路径"""
+        output_dir = config.get("report", "output_dir", "reports")
+        return config.get("report", "state_file", os.path.join(output_dir, ".report_state.json"))
+
+    def _forget_report_hashes(self, paths: List[str]) -> None:
+        """发布失败时从状态文件中移除这些页面的哈希，保证下次运行会重新发布"""
+        state_path = self._get_report_state_path()
+        state = load_report_state(state_path)
+        for path in paths:
+            state.pop(path, None)
+        save_report_state(state_path, state)
+
+    def evaluate_alerts(self, weather_clients: Dict[str, WeatherClient]) -> AlertResult:
+        """对本次获取的所有地点、所有预报日一次性评估预警规则，并记录各规则的命中地点数"""
+        with get_metrics().span("alerts"):
+            result = evaluate_clients(self.alert_engine, weather_clients)
+        hits = {name: counts for name, counts in result.counts().items() if any(counts)}
+        if hits:
+            logger.info(f"预警规则命中地点数（按预报日）: {hits}")
+        return result
+
+    def _prepare_reports(self, weather_clients: Dict[str, WeatherClient],
+                         local_now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """为本次获取到天气的每个地点准备页面数据和消息字段，预警规则对所有地点一次性评估"""
+        alert_result = self.evaluate_alerts(weather_clients)
+        return {
+            location: self._prepare_location_report(weather_client, alert_result.messages(location, 0), local_now)
+            for location, weather_client in weather_clients.items()
+        }
+
+    def _archive_and_load_trend(self, weather_client: WeatherClient) -> Optional[Dict[str, List[Any]]]:
+        """
+        把本次获取的快照追加到历史存档，并读取最近 [archive] trend_days（默认14）天的温度趋势
+
+        存档未启用或读写失败时返回 None，页面不显示趋势图。
+        """
+        if self.archive is None or weather_client.snapshot is None:
+            return None
         try:
-            logger.info("开始发送天气通知")
-            message_builder = MessageBuilder(self.weather_client)
-
-            if not self.weather_client.fetch_weather_data():
-                logger.error("获取天气数据失败，无法继续发送通知。")
-                return
-
-            # --- 数据准备逻辑优化 ---
-            weather_condition = self.weather_client.get_weather_condition()
-            temp_full = message_builder.get_temperature_tips().split('\n')
-            cond_full = message_builder.get_weather_condition_tips().split('\n')
-            precip_full = message_builder.get_precipitation_tips().split('，')
-            uv_full = message_builder.get_uv_tips().split('(')
-
-            # 1. 生成智能预警信息
-            alerts = self._generate_alerts(message_builder)
-
-            # 2. 准备用于HTML的数据字典 (结构更清晰)
-            html_data = {
-                "theme": self._get_weather_theme(weather_condition),
-                "alerts": alerts,
-                "greeting": message_builder.get_greeting(),
-                "date": time.strftime("%Y年%m月%d日 %A"),
-                "temperature_value": self.weather_client.get_temperature_range(),
-                "temperature_tip": temp_full[1] if len(temp_full) > 1 else "注意适当增减衣物。",
-                "weather_condition_value": weather_condition,
-                "weather_condition_tip": " ".join(cond_full),
-                "wind_value": message_builder.get_wind_tips().replace("今日风向风力: ", ""),
-                "wind_tip": "注意防风，关好门窗。",
-                "precipitation_value": precip_full[0],
-                "precipitation_tip": precip_full[1] if len(precip_full) > 1 else "天气状况良好。",
-                "uv_value": uv_full[0].replace("紫外线指数: ", ""),
-                "uv_tip": '(' + uv_full[1] if len(uv_full) > 1 else "无需特殊防护。",
-                "note": message_builder.get_daily_note("仪姐")
-            }
+            self.archive.append(weather_client.location, weather_client.snapshot)
+            return self.archive.daily_series(weather_client.location, days=config.get_int("archive", "trend_days", 14))
+        except (OSError, ValueError) as e:
+            logger.warning(f"读写地点 {weather_client.location} 的天气存档失败: {e}")
+            return None
+
+    def _prepare_location_report(self, weather_client: WeatherClient, alerts: Optional[List[str]] = None,
+                                 local_now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        根据某个地点已获取的天气快照，准备HTML页面数据和模板消息字段
+
+        Args:
+            weather_client: 已成功获取天气的客户端
+            alerts: 今日需要高亮的预警提示，默认对该地点单独评估预警规则
+            local_now: (可选) 用户所在时区的当前时间，决定问候语与日期，默认为本机时间
+
+        Returns:
+            包含 html_data（HTML页面数据）和 message_fields（模板消息公共字段）的字典
+        """
+        message_builder = MessageBuilder(weather_client)
 
-            html_output_path = "weather_report.html"
-            create_html_page(html_data, html_output_path)
-
-            logger.info("开始将HTML页面推送到GitHub...")
-            os.system('git add .')
-            os.system(f'git commit -m "Update weather report for {time.strftime("%Y-%m-%d")}"')
-            os.system('git push')
-            logger.info("推送完成！")
-
-            github_username = "wps0718"
-            repo_name = "weather-wechat-notification"
-            html_url = f"https://{github_username}.github.io/{repo_name}/{html_output_path}"
-            logger.info(f"详情页URL: {html_url}")
-
-            for user in self.user_list:
-                open_id = user.get("open_id")
-                user_name = user.get("name", "亲爱的")
-                logger.info(f"为用户 {user_name} (open_id: {open_id}) 构建消息")
-
-                message_data = [
-                    {"name": "greeting", "value": f"{user_name}，{html_data['greeting']}"},
-                    {"name": "date", "value": html_data['date']},
-                    {"name": "temperature", "value": temp_full[0]},
-                    {"name": "weather_condition", "value": cond_full[0]},
-                    {"name": "wind", "value": html_data['wind_value']},
-                    {"name": "precipitation", "value": html_data['precipitation_value']},
-                    {"name": "uv", "value": html_data['uv_value']},
-                    {"name": "note", "value": "点击查看今日天气详情与穿搭建议💖"}
-                ]
-
-                success = self.wechat_client.send_template_message(open_id, message_data, url=html_url)
-
-                if success:
-                    logger.info(f"向用户 {user_name} 发送消息成功")
+        weather_condition = weather_client.get_weather_condition()
+        temp_headline, temp_advice = message_builder.get_temperature_parts()
+        condition_tips = message_builder.get_condition_tip_list()
+        precip_value, precip_tip = message_builder.get_precipitation_parts()
+        uv_value, uv_tip = message_builder.get_uv_parts()
+        wind_value = weather_client.get_wind_info()
+
+        # 1. 生成智能预警信息
+        if alerts is None:
+            location = weather_client.location
+            alerts = self.evaluate_alerts({location: weather_client}).messages(location, 0)
+
+        # 2. 准备用于HTML的数据字典 (结构更清晰)
+        html_data = {
+            "theme": self._get_weather_theme(weather_condition),
+            "alerts": alerts,
+            "greeting": message_builder.get_greeting(local_now.hour if local_now is not None else None),
+            "date": (local_now or datetime.now()).strftime("%Y年%m月%d日 %A"),
+            "temperature_value": weather_client.get_temperature_range(),
+            "temperature_tip": temp_advice or "注意适当增减衣物。",
+            "weather_condition_value": weather_condition,
+            "weather_condition_tip": " ".join(condition_tips),
+            "wind_value": wind_value,
+            "wind_tip": "注意防风，关好门窗。",
+            "precipitation_value": precip_value,
+            "precipitation_tip": precip_tip,
+            "uv_value": uv_value,
+            "uv_tip": uv_tip or "无需特殊防护。",
+            "note": message_builder.get_daily_note("仪姐"),
+            "forecast": message_builder.get_forecast_days(),
+            "trend": self._archive_and_load_trend(weather_client),
+        }
+
+        message_fields = {
+            "greeting": html_data['greeting'],
+            "date": html_data['date'],
+            "temperature": temp_headline,
+            "weather_condition": condition_tips[0],
+            "wind": wind_value,
+            "precipitation": precip_value,
+            "uv": uv_value,
+        }
+        return {"html_data": html_data, "message_fields": message_fields}
+
+    @staticmethod
+    def _build_message_data(fields: Dict[str, str], note: str = DEFAULT_NOTE) -> List[Dict[str, str]]:
+        """构建某个地点的模板消息数据，用户称呼以 USER_NAME 占位符表示；fields 中带有 note 时优先使用"""
+        return [
+            {"name": "greeting", "value": f"{USER_NAME}，{fields['greeting']}"},
+            {"name": "date", "value": fields['date']},
+            {"name": "temperature", "value": fields['temperature']},
+            {"name": "weather_condition", "value": fields['weather_condition']},
+            {"name": "wind", "value": fields['wind']},
+            {"name": "precipitation", "value": fields['precipitation']},
+            {"name": "uv", "value": fields['uv']},
+            {"name": "note", "value": fields.get('note', note)}
+        ]
+
+    def _get_slot_resolver(self) -> SlotResolver:
+        """
+        推送时间槽解析器，由 [scheduler] push_time、timezone、slot_minutes 决定默认时间槽与粒度
+
+        Raises:
+            ValueError: 默认推送时间或时区配置不正确
+        """
+        if self._slot_resolver is None:
+            self._slot_resolver = SlotResolver(self.push_time, self.timezone,
+                                               config.get_int("scheduler", "slot_minutes", 15))
+        return self._slot_resolver
+
+    def _resolve_run(self, slot: Optional[PushSlot]) -> Tuple[str, str, Iterable[UserRecord]]:
+        """
+        确定本次推送的 (页面文件名, 发送队列运行键, 用户)
+
+        slot 为 None（手动运行）时推送给名单中的所有用户，日期为本机当天，页面文件名与运行键都是日期；
+        否则只推送属于该时间槽的用户，日期取该时区的当天。默认时间槽与手动运行相同，
+        其他时间槽的运行键为 "<日期>#<时间槽>"、页面为 "<日期>-<时间槽>"，各时间槽分别记录发送进度，
+        同一地点不同时间槽的页面互不覆盖。
+        """
+        if slot is None:
+            run_date = time.strftime("%Y-%m-%d")
+            return run_date, run_date, self.roster.iter_users()
+        resolver = self._get_slot_resolver()
+        run_date = slot.local_date()
+        users = (user for user in self.roster.iter_users() if resolver.resolve_user(user) == slot)
+        if slot == resolver.default:
+            return run_date, run_date, users
+        return f"{run_date}-{safe_path_component(slot.key)}", f"{run_date}#{slot.key}", users
+
+    def _plan_run(self, run_key: str,
+                  users: Optional[Iterable[UserRecord]] = None) -> Optional[Tuple[List[str], Dict[str, Dict[str, Any]], List[str]]]:
+        """
+        把名单写入当天的发送队列，并确定本次需要处理的地点
+
+        Args:
+            run_key: 发送队列中的运行键（日期或 "<日期>#<时间槽>"）
+            users: 本次推送的用户，默认为名单中的所有用户
+
+        Returns:
+            (仍有待发送用户的地点, 可复用的已保存消息 {地点: report}, 需要获取天气并渲染页面的地点)；
+            当天的消息已全部发送时返回 None
+        """
+        # 名单按批流式写入队列，之后的发送也从队列中分批读取，内存占用与用户数无关
+        users = self.roster.iter_users() if users is None else users
+        added = self.send_queue.enqueue(run_key, users, self.default_location)
+        if added:
+            logger.info(f"已将 {added} 个用户加入 {run_key} 的发送队列（名单来源: {self.roster.name}）")
+        # 手动运行与时间槽运行的运行键不同，当天已在其中一个收到推送的用户不再重复发送
+        skipped = self.send_queue.skip_sent_elsewhere(run_key, run_key.partition("#")[0], SLOT_RUN_GLOB)
+        if skipped:
+            logger.info(f"{run_key} 中有 {skipped} 个用户当天已收到推送，跳过")
+        has_users = self.send_queue.total(run_key) > 0
+        pending_locations = self.send_queue.pending_locations(run_key)
+        if has_users and not pending_locations:
+            logger.info(f"{run_key} 的消息已全部发送，无需重复推送")
+            return None
+
+        # 续发时复用已保存的消息内容，只为尚未保存的地点获取天气、渲染页面
+        reports: Dict[str, Dict[str, Any]] = {
+            location: payload for location, payload in self.send_queue.load_payloads(run_key).items()
+            if location in pending_locations
+        }
+        locations = [location for location in pending_locations if location not in reports]
+        if not has_users:
+            locations = [self.default_location]
+        if reports:
+            logger.info(f"续发 {run_key} 未完成的推送，复用 {len(reports)} 个地点已保存的消息内容")
+        return pending_locations, reports, locations
+
+    def send_weather_notification(self, slot: Optional[PushSlot] = None) -> Dict[str, Any]:
+        """
+        发送天气通知给所有用户（或某个推送时间槽的用户），同一地点的用户只获取一次天气
+
+        用户先写入当天的持久化发送队列，再按地点分批发送并逐批提交进度。中途退出后重新运行时，
+        已发送的用户会被跳过，已保存消息内容的地点也不再重新获取天气和渲染页面。
+
+        Args:
+            slot: (可选) 只推送该时间槽的用户，由定时任务按时间槽传入；默认推送给所有用户
+
+        Returns:
+            本次运行摘要：changed_files（实际写入的文件）、published（是否发布成功）、publish（发布耗时与详情）、
+            sent / failed（本次发送成功、失败的人数，每个用户的状态记录在发送队列中）、queue（当天队列各状态人数），
+            出错时包含 error
+        """
+        summary: Dict[str, Any] = {"changed_files": [], "published": False, "sent": 0, "failed": 0}
+        start_run()
+        try:
+            logger.info(f"开始发送天气通知（推送时间槽 {slot.key}）" if slot is not None else "开始发送天气通知")
+            page_name, run_key, users = self._resolve_run(slot)
+            local_now = slot.local_now() if slot is not None else None
+            plan = self._plan_run(run_key, users)
+            if plan is None:
+                summary["queue"] = self.send_queue.counts(run_key)
+                return summary
+            pending_locations, reports, locations = plan
+
+            publish_future = None
+            if locations:
+                weather_clients = fetch_weather_batch(locations)
+                if not weather_clients and not reports:
+                    logger.error("获取天气数据失败，无法继续发送通知。")
+                    summary["error"] = "获取天气数据失败"
+                    return summary
+                if self.default_location in weather_clients:
+                    self.weather_client = weather_clients[self.default_location]
+
+                fresh_reports = self._prepare_reports(weather_clients, local_now)
+                summary["changed_files"] = self._render_reports(fresh_reports, page_name)
+                # 只保存页面已生成的地点，渲染失败的地点在续发时重新获取天气并渲染
+                for location, report in fresh_reports.items():
+                    if report.get("url"):
+                        self.send_queue.save_payload(run_key, location, report["message_fields"], report["url"])
+                reports.update(fresh_reports)
+
+                # 发布在后台进行，微信消息无需等待推送完成即可开始发送
+                if summary["changed_files"]:
+                    logger.info(f"开始发布 {len(summary['changed_files'])} 个文件（{self.publisher.name}）...")
+                    publish_future = self.publisher.publish_async(
+                        summary["changed_files"], f"Update weather report for {page_name}"
+                    )
                 else:
-                    logger.error(f"向用户 {user_name} 发送消息失败")
-                time.sleep(1)
+                    logger.info("所有页面内容均未变化，跳过写入与推送")
+
+            # 早上的推送必须带页面链接，页面缺失的地点跳过
+            self.deliver_reports(run_key, pending_locations,
+                                 {location: report for location, report in reports.items() if report.get("url")},
+                                 summary)
+
+            if publish_future is not None:
+                publish_result = publish_future.result()
+                summary["published"] = publish_result.success
+                summary["publish"] = publish_result.to_dict()
+                if not publish_result.success:
+                    self._forget_report_hashes(summary["changed_files"])
 
-            logger.info("天气通知发送完成")
+            summary["queue"] = self.send_queue.counts(run_key)
+            logger.info(f"天气通知发送完成，队列状态: {summary['queue']}")
         except Exception as e:
             logger.error(f"发送天气通知时发生严重错误: {e}")
             logger.error(traceback.format_exc())
+            summary["error"] = str(e)
+        finally:
+            export_run(summary)
+        return summary
+
+    def send_tomorrow_notification(self) -> Dict[str, Any]:
+        """
+        晚间推送明日天气，内容来自 3 天预报中的明天
+
+        预报优先复用缓存中 [scheduler] tomorrow_max_age 秒（默认 18 小时）内获取的 3 天预报，
+        通常就是当天早上推送时已经请求过的数据，不会产生新的接口调用。用户以 "<日期>#tomorrow"
+        为运行键写入发送队列，与早上的推送分别记录进度，中途退出后重新运行同样只补发未成功的用户。
+        消息链接沿用当天早上（手动运行或任一时间槽）生成的页面（页面中包含未来几天的预报），当天没有页面时不带链接。
+
+        Returns:
+            运行摘要：sent / failed（本次发送成功、失败的人数）、queue（队列各状态人数），出错时包含 error
+        """
+        summary: Dict[str, Any] = {"sent": 0, "failed": 0}
+        today = time.strftime("%Y-%m-%d")
+        run_key = f"{today}{TOMORROW_RUN_SUFFIX}"
+        start_run()
+        try:
+            logger.info("开始发送明日天气通知")
+            added = self.send_queue.enqueue(run_key, self.roster.iter_users(), self.default_location)
+            if added:
+                logger.info(f"已将 {added} 个用户加入 {run_key} 的发送队列（名单来源: {self.roster.name}）")
+            pending_locations = self.send_queue.pending_locations(run_key)
+            if not pending_locations:
+                logger.info(f"{run_key} 没有待发送的用户")
+                summary["queue"] = self.send_queue.counts(run_key)
+                return summary
+
+            reports: Dict[str, Dict[str, Any]] = {
+                location: payload for location, payload in self.send_queue.load_payloads(run_key).items()
+                if location in pending_locations
+            }
+            locations = [location for location in pending_locations if location not in reports]
+            if locations:
+                max_age = config.get_float("scheduler", "tomorrow_max_age", 18 * 3600)
+                weather_clients = fetch_forecast_batch(locations, max_age=max_age)
+                morning_urls = self.report_urls(today)
+                tomorrow = time.strftime("%Y年%m月%d日 %A", time.localtime(time.time() + 86400))
+                for location, weather_client in weather_clients.items():
+                    message_builder = MessageBuilder(weather_client)
+                    fields = message_builder.get_day_parts(1)
+                    if fields is None:
+                        logger.error(f"地点 {location} 的预报中没有明天的数据")
+                        continue
+                    fields["greeting"] = message_builder.get_greeting()
+                    fields["date"] = tomorrow
+                    url = morning_urls.get(location)
+                    self.send_queue.save_payload(run_key, location, fields, url)
+                    reports[location] = {"message_fields": fields, "url": url}
+
+            self.deliver_reports(run_key, pending_locations, reports, summary, note="明天也要元气满满哦💖")
+            summary["queue"] = self.send_queue.counts(run_key)
+            logger.info(f"明日天气通知发送完成，队列状态: {summary['queue']}")
+        except Exception as e:
+            logger.error(f"发送明日天气通知时发生严重错误: {e}")
+            logger.error(traceback.format_exc())
+            summary["error"] = str(e)
+        finally:
+            export_run(summary)
+        return summary
+
+    def report_urls(self, date: str) -> Dict[str, str]:
+        """当天早间推送（手动运行与各时间槽）生成的各地点页面链接，同一地点有多个页面时取最近生成的"""
+        return self.send_queue.load_urls(date, SLOT_RUN_GLOB)
+
+    def deliver_reports(self, run_key: str, pending_locations: List[str], reports: Dict[str, Dict[str, Any]],
+                         summary: Dict[str, Any], note: str = DEFAULT_NOTE) -> None:
+        """
+        向队列中 run_key 下各地点的待发送用户发送对应地点的消息，链接可以为空
+
+        同一地点的消息只有接收人和称呼不同，请求体只序列化一次。
+
+        Args:
+            run_key: 发送队列中的运行键
+            pending_locations: 需要发送的地点
+            reports: 地点 -> {"message_fields": ..., "url": ...}
+            summary: 运行摘要，累计 sent / failed
+            note: 消息末尾的备注，message_fields 中带有 note 时以其为准
+        """
+        batch_size = config.get_int("queue", "batch_size", 500)
+        for location, payload in self._location_payloads(run_key, pending_locations, reports, note):
+            for batch in self.send_queue.iter_pending(run_key, location, batch_size):
+                results = self.delivery_engine.deliver_prepared(batch, payload)
+                self._record_batch(run_key, results, summary)
+
+    async def deliver_reports_async(self, run_key: str, pending_locations: List[str],
+                                    reports: Dict[str, Dict[str, Any]], summary: Dict[str, Any],
+                                    http: "AsyncHttpClient", note: str = DEFAULT_NOTE) -> None:
+        """deliver_reports 的异步版本，通过 http 在事件循环中并发发送"""
+        batch_size = config.get_int("queue", "batch_size", 500)
+        for location, payload in self._location_payloads(run_key, pending_locations, reports, note):
+            for batch in self.send_queue.iter_pending(run_key, location, batch_size):
+                results = await self.delivery_engine.deliver_prepared_async(batch, payload, http)
+                self._record_batch(run_key, results, summary)
+
+    def _location_payloads(self, run_key: str, pending_locations: List[str], reports: Dict[str, Dict[str, Any]],
+                           note: str) -> Iterator[Tuple[str, TemplatePayloadBuilder]]:
+        """逐个产出有消息内容的待发送地点及其预序列化的请求体，缺少消息内容的地点记录错误后跳过"""
+        for location in pending_locations:
+            if location not in reports:
+                logger.error(f"地点 {location} 的天气数据、消息内容或页面缺失，跳过该地点的用户")
+                continue
+            payload = self.wechat_client.prepare_template(
+                self._build_message_data(reports[location]["message_fields"], note=note),
+                url=reports[location].get("url")
+            )
+            logger.info(f"开始向地点 {location} 的用户发送消息（{run_key}）")
+            yield location, payload
+
+    def _record_batch(self, run_key: str, results: Dict[str, bool], summary: Dict[str, Any]) -> None:
+        """提交一批发送结果到队列，并累计到运行摘要"""
+        self.send_queue.mark_results(run_key, results)
+        sent = sum(1 for ok in results.values() if ok)
+        summary["sent"] += sent
+        summary["failed"] += len(results) - sent
+
+    async def send_weather_notification_async(self, slot: Optional[PushSlot] = None) -> Dict[str, Any]:
+        """
+        send_weather_notification 的异步版本，整个流程运行在事件循环上
+
+        各地点的天气在同一个异步HTTP客户端上并发获取；HTML渲染在线程池中执行，完成后才开始发送，
+        链接只指向已成功写入的页面，较慢的发布则在后台与发送同时进行；消息发送受 [async] max_concurrency
+        与令牌桶共同限制，总耗时取决于限速而不是逐个请求的网络延迟。
+
+        Args:
+            slot: (可选) 只推送该时间槽的用户，默认推送给所有用户
+
+        Returns:
+            与 send_weather_notification 相同的运行摘要
+        """
+        import asyncio
+        from async_http import create_async_http_client
+
+        summary: Dict[str, Any] = {"changed_files": [], "published": False, "sent": 0, "failed": 0}
+        loop = asyncio.get_running_loop()
+        start_run()
+        try:
+            logger.info("开始发送天气通知（异步模式）")
+            page_name, run_key, users = self._resolve_run(slot)
+            local_now = slot.local_now() if slot is not None else None
+            plan = await loop.run_in_executor(None, bind_run(self._plan_run), run_key, users)
+            if plan is None:
+                summary["queue"] = self.send_queue.counts(run_key)
+                return summary
+            pending_locations, reports, locations = plan
+
+            async with create_async_http_client() as http:
+                publish_task = None
+                if locations:
+                    weather_clients = await fetch_weather_batch_async(locations, http)
+                    if not weather_clients and not reports:
+                        logger.error("获取天气数据失败，无法继续发送通知。")
+                        summary["error"] = "获取天气数据失败"
+                        return summary
+                    if self.default_location in weather_clients:
+                        self.weather_client = weather_clients[self.default_location]
+
+                    fresh_reports = self._prepare_reports(weather_clients, local_now)
+                    summary["changed_files"], publish_task = await self._render_and_publish_async(
+                        page_name, fresh_reports, run_key
+                    )
+                    reports.update(fresh_reports)
+
+                # 早上的推送必须带页面链接，页面缺失的地点跳过
+                await self.deliver_reports_async(
+                    run_key, pending_locations,
+                    {location: report for location, report in reports.items() if report.get("url")}, summary, http
+                )
+
+                if publish_task is not None:
+                    publish_result = await publish_task
+                    summary["published"] = publish_result.success
+                    summary["publish"] = publish_result.to_dict()
+
+            summary["queue"] = self.send_queue.counts(run_key)
+            logger.info(f"天气通知发送完成，队列状态: {summary['queue']}")
+        except Exception as e:
+            logger.error(f"发送天气通知时发生严重错误: {e}")
+            logger.error(traceback.format_exc())
+            summary["error"] = str(e)
+        finally:
+            export_run(summary)
+        return summary
+
+    async def _render_and_publish_async(self, page_name: str, reports: Dict[str, Dict[str, Any]],
+                                        run_key: str) -> Tuple[List[str], Optional["asyncio.Future"]]:
+        """
+        在线程池中渲染页面并保存各地点的消息内容，随后在后台发布有变化的文件
+
+        只有渲染成功的地点会填入页面链接并保存到发送队列（运行键 run_key），渲染失败的地点不保存，
+        续发时重新渲染；续发时复用的链接一定指向已生成的页面。
+
+        Returns:
+            (实际写入的文件列表, 结果为 PublishResult 的发布任务；没有需要发布的文件时为 None)
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        changed_files = await loop.run_in_executor(None, bind_run(self._render_reports), reports, page_name)
+        for location, report in reports.items():
+            if report.get("url"):
+                self.send_queue.save_payload(run_key, location, report["message_fields"], report["url"])
+        if not changed_files:
+            logger.info("所有页面内容均未变化，跳过写入与推送")
+            return changed_files, None
+
+        async def _publish() -> PublishResult:
+            publish_result = await asyncio.wrap_future(
+                self.publisher.publish_async(changed_files, f"Update weather report for {page_name}")
+            )
+            if not publish_result.success:
+                await loop.run_in_executor(None, bind_run(self._forget_report_hashes), changed_files)
+            return publish_result
+
+        logger.info(f"开始发布 {len(changed_files)} 个文件（{self.publisher.name}）...")
+        return changed_files, asyncio.ensure_future(_publish())
+
+    def _sync_push_jobs(self) -> Dict[PushSlot, int]:
+        """
+        按名单中用户的推送时间槽注册定时任务
+
+        每个不同的 (时区, 时间槽) 只注册一个 cron 任务（在该时区中按时触发，自动处理夏令时），
+        任务执行时再按地点分组获取天气、批量发送；名单中已不存在的时间槽的任务会被移除。
+        默认时间槽始终保留，没有用户时也照常生成默认地点的页面。
+
+        Returns:
+            时间槽 -> 用户数
+        """
+        resolver = self._get_slot_resolver()
+        counts = resolver.count_slots(self.roster.iter_users())
+        counts.setdefault(resolver.default, 0)
+        wanted = {f"push:{slot.key}": slot for slot in counts}
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith("push:") and job.id not in wanted:
+                job.remove()
+                logger.info(f"推送时间槽 {job.id[5:]} 已没有用户，移除对应的定时任务")
+        for job_id, slot in wanted.items():
+            if self.scheduler.get_job(job_id) is None:
+                self.scheduler.add_job(
+                    self.send_weather_notification,
+                    'cron',
+                    hour=slot.hour,
+                    minute=slot.minute,
+                    timezone=slot.timezone,
+                    args=[slot],
+                    id=job_id
+                )
+        summary = ", ".join(f"{slot.key}({count}人)" for slot, count in sorted(counts.items(), key=lambda item: item[0].key))
+        logger.info(f"已注册 {len(wanted)} 个推送时间槽: {summary}")
+        return counts
 
     def start_scheduler(self) -> None:
         """启动定时任务调度器"""
+        from apscheduler.schedulers.blocking import BlockingScheduler
+
         try:
-            hour, minute = self.push_time.split(":")
+            if self.scheduler is None:
+                self.scheduler = BlockingScheduler(timezone=self.timezone)
+            self._sync_push_jobs()
+            # 名单变化后（新增用户、修改推送时间）定期重新分组，无需重启调度器
             self.scheduler.add_job(
-                self.send_weather_notification,
-                'cron',
-                hour=int(hour),
-                minute=int(minute)
+                self._sync_push_jobs,
+                'interval',
+                seconds=config.get_float("scheduler", "slot_refresh", 3600.0),
+                id="sync-push-slots"
             )
-            logger.info(f"定时任务已启动，将在每日 {self.push_time} 发送天气通知")
+            if self.tomorrow_push_time:
+                tomorrow_hour, tomorrow_minute = self.tomorrow_push_time.split(":")
+                self.scheduler.add_job(
+                    self.send_tomorrow_notification,
+                    'cron',
+                    hour=int(tomorrow_hour),
+                    minute=int(tomorrow_minute)
+                )
+                logger.info(f"将在每日 {self.tomorrow_push_time} 发送明日天气通知")
+            if config.get_boolean("watch", "enabled", False):
+                from weather_watcher import WeatherWatcher
+
+                watcher = WeatherWatcher(self)
+                # 上一轮未结束时跳过本轮，错过的轮次合并为一次
+                self.scheduler.add_job(
+                    watcher.poll_once,
+                    'interval',
+                    seconds=watcher.interval,
+                    max_instances=1,
+                    coalesce=True
+                )
+                logger.info(f"天气变化监控已启用，每 {watcher.interval:g} 秒检查一次")
+            self.wechat_client.start_background_refresh()
+            logger.info(f"定时任务已启动，默认每日 {self.push_time}（{self.timezone}）发送天气通知")
             logger.info("按 Ctrl+C 停止调度器")
             self.scheduler.start()
-        except ValueError:
-            logger.error(f"推送时间格式不正确: {self.push_time}，请使用 HH:MM 格式。")
+        except ValueError as e:
+            push_times = " / ".join(filter(None, (self.push_time, self.tomorrow_push_time)))
+            logger.error(f"推送时间或时区配置不正确（{push_times}，{self.timezone}）: {e}。推送时间请使用 HH:MM 格式。")
         except Exception as e:
             logger.error(f"启动定时任务时发生错误: {e}")
             logger.error(traceback.format_exc())
 
-
 if __name__ == "__main__":
     scheduler = WeatherNotificationScheduler()
     scheduler.start_scheduler()
\ No newline at end of file
@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config import config
+from roster import UserRecord
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+# 当天已在其他推送运行中收到消息，本次运行不再发送
+STATUS_SKIPPED = "skipped"
+
+# 批量写入时每条 executemany 的行数
+_WRITE_CHUNK = 1000
+
+
+class SendQueue:
+    """
+    每日推送的持久化发送队列
+
+    每个 (日期, open_id) 一行，记录发送状态；同时保存每个地点当天的消息字段与页面链接。
+    进程中途退出后重新运行时，已发送的用户直接跳过，剩余用户复用已保存的消息内容，
+    无需重新获取天气、渲染页面。数据库使用 WAL 模式，逐批提交发送进度。
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Args:
+            path: sqlite 数据库文件路径，":memory:" 表示只在进程内记录（不支持断点续发）
+        """
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS send_jobs ("
+            "run_date TEXT NOT NULL, open_id TEXT NOT NULL, name TEXT, location TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (run_date, open_id));"
+            "CREATE INDEX IF NOT EXISTS idx_send_jobs_pending ON send_jobs (run_date, location, status);"
+            "CREATE TABLE IF NOT EXISTS send_payloads ("
+            "run_date TEXT NOT NULL, location TEXT NOT NULL, fields TEXT NOT NULL, url TEXT, "
+            "PRIMARY KEY (run_date, location));"
+        )
+        self._db.commit()
+
+    def enqueue(self, run_date: str, users: Iterable[UserRecord], default_location: str) -> int:
+        """
+        把用户加入当天的队列，已在队列中的用户保持原状态
+
+        users 可以是名单来源的惰性迭代器，按 1000 行一批写入，不会一次性读入整个名单。
+
+        Returns:
+            本次新加入的用户数
+        """
+        now = time.time()
+        added = 0
+        chunk: List[tuple] = []
+        with self._lock:
+            for user in users:
+                if not user.open_id:
+                    continue
+                chunk.append((run_date, user.open_id, user.name, user.location or default_location, STATUS_PENDING, now))
+                if len(chunk) >= _WRITE_CHUNK:
+                    added += self._insert_jobs(chunk)
+                    chunk = []
+            if chunk:
+                added += self._insert_jobs(chunk)
+            self._db.commit()
+        return added
+
+    def _insert_jobs(self, rows: List[tuple]) -> int:
+        """插入一批任务，忽略已存在的 (日期, open_id)（调用方需持有锁）"""
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO send_jobs (run_date, open_id, name, location, status, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        return self._db.total_changes - before
+
+    def total(self, run_date: str) -> int:
+        """当天队列中的用户总数"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM send_jobs WHERE run_date = ?", (run_date,)).fetchone()[0]
+
+    def pending_locations(self, run_date: str) -> List[str]:
+        """当天还有未成功发送用户的地点"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT location FROM send_jobs WHERE run_date = ? AND status NOT IN (?, ?)",
+                (run_date, STATUS_SENT, STATUS_SKIPPED)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_pending(self, run_date: str, location: str, batch_size: int = 500) -> Iterator[List[UserRecord]]:
+        """
+        按批次返回某地点尚未成功发送的用户
+
+        按 rowid 递增分页，同一次遍历中发送失败的用户不会被重复取出；
+        调用方每处理完一批就应调用 mark_results 提交进度。
+        """
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT rowid, open_id, name, location FROM send_jobs "
+                    "WHERE run_date = ? AND location = ? AND status NOT IN (?, ?) AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (run_date, location, STATUS_SENT, STATUS_SKIPPED, last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [UserRecord(open_id, name, loc) for _, open_id, name, loc in rows]
+
+    def skip_sent_elsewhere(self, run_date: str, day: str, run_glob: str) -> int:
+        """
+        把 run_date 中尚未发送、但当天其他运行已成功发送过的用户标记为跳过
+
+        "当天的其他运行" 指运行键为 day 或匹配 day + run_glob（sqlite GLOB）的运行，
+        如手动运行 "<日期>" 与时间槽运行 "<日期>#<时间槽>"，同一用户一天只收到一次推送。
+
+        Returns:
+            本次标记为跳过的用户数
+        """
+        with self._lock:
+            skipped = self._db.execute(
+                "UPDATE send_jobs SET status = ?, updated_at = ? "
+                "WHERE run_date = ? AND status NOT IN (?, ?) AND open_id IN ("
+                "SELECT open_id FROM send_jobs WHERE run_date != ? AND (run_date = ? OR run_date GLOB ?) AND status = ?)",
+                (STATUS_SKIPPED, time.time(), run_date, STATUS_SENT, STATUS_SKIPPED,
+                 run_date, day, day + run_glob, STATUS_SENT)
+            ).rowcount
+            self._db.commit()
+        return skipped
+
+    def mark_results(self, run_date: str, results: Dict[str, bool]) -> None:
+        """在一个事务中提交一批发送结果"""
+        if not results:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE send_jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE run_date = ? AND open_id = ?",
+                [(STATUS_SENT if ok else STATUS_FAILED, now, run_date, open_id) for open_id, ok in results.items()]
+            )
+            self._db.commit()
+
+    def save_payload(self, run_date: str, location: str, fields: Dict[str, Any], url: Optional[str]) -> None:
+        """保存某地点当天的消息字段与页面链接，续发时直接复用"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO send_payloads (run_date, location, fields, url) VALUES (?, ?, ?, ?)",
+                (run_date, location, json.dumps(fields, ensure_ascii=False), url)
+            )
+            self._db.commit()
+
+    def load_payloads(self, run_date: str) -> Dict[str, Dict[str, Any]]:
+        """读取当天已保存的各地点消息，返回 {地点: {"message_fields": ..., "url": ...}}"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT location, fields, url FROM send_payloads WHERE run_date = ?", (run_date,)
+            ).fetchall()
+        return {location: {"message_fields": json.loads(fields), "url": url} for location, fields, url in rows}
+
+    def load_urls(self, day: str, run_glob: str) -> Dict[str, str]:
+        """
+        当天各地点最近保存的页面链接
+
+        运行键为 day 或匹配 day + run_glob（sqlite GLOB）的运行都会参与查找，
+        同一地点在多个运行中都有链接时取最后保存的一个。
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT location, url FROM send_payloads WHERE (run_date = ? OR run_date GLOB ?) AND url IS NOT NULL "
+                "ORDER BY rowid", (day, day + run_glob)
+            ).fetchall()
+        return dict(rows)
+
+    def counts(self, run_date: str) -> Dict[str, int]:
+        """当天各状态的用户数"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM send_jobs WHERE run_date = ? GROUP BY status", (run_date,)
+            ).fetchall()
+        return dict(rows)
+
+    def purge_before(self, run_date: str) -> int:
+        """删除早于指定日期的记录，返回删除的任务数"""
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM send_jobs WHERE run_date < ?", (run_date,)).rowcount
+            self._db.execute("DELETE FROM send_payloads WHERE run_date < ?", (run_date,))
+            self._db.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_send_queue() -> SendQueue:
+    """
+    根据配置文件 [queue] 节创建发送队列
+
+    enabled = false 或打开数据库失败时退化为内存队列，仍按批次发送，但不能断点续发。
+    """
+    if not config.get_boolean("queue", "enabled", True):
+        return SendQueue(":memory:")
+    path = config.get("queue", "path", ".cache/send_queue.sqlite3")
+    try:
+        return SendQueue(path)
+    except sqlite3.Error as e:
+        logger.warning(f"发送队列 {path} 打开失败，使用内存队列（不支持断点续发）: {e}")
+        return SendQueue(":memory:")
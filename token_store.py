@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from config import config
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，文件存储退化为仅进程内加锁
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """
+    access_token 存储接口
+
+    load/save 负责读写 (token, 过期时间戳)；refresh_lock 提供跨进程的互斥锁，
+    保证同一时刻只有一个进程/线程去请求新的 token。
+    """
+
+    def load(self) -> Optional[Tuple[str, float]]:
+        """读取已保存的 token 及其过期时间戳，不存在时返回 None"""
+        raise NotImplementedError
+
+    def save(self, token: str, expire_at: float) -> None:
+        """保存 token 及其过期时间戳"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """删除已保存的 token"""
+        raise NotImplementedError
+
+    @contextmanager
+    def refresh_lock(self) -> Iterator[None]:
+        """刷新 token 期间持有的互斥锁"""
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    """仅在当前进程内保存 token，与改造前的行为一致"""
+
+    def __init__(self):
+        self._token: Optional[Tuple[str, float]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Tuple[str, float]]:
+        return self._token
+
+    def save(self, token: str, expire_at: float) -> None:
+        self._token = (token, expire_at)
+
+    def clear(self) -> None:
+        self._token = None
+
+    @contextmanager
+    def refresh_lock(self) -> Iterator[None]:
+        with self._lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """以 JSON 文件保存 token，刷新时用 fcntl 文件锁在多个进程之间互斥"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._thread_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            logger.warning("当前平台不支持 fcntl，token 文件存储仅在进程内加锁")
+
+    def load(self) -> Optional[Tuple[str, float]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["access_token"], float(data["expire_at"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"token 文件 {self.path} 内容无效，将重新获取: {e}")
+            return None
+
+    def save(self, token: str, expire_at: float) -> None:
+        # 先写临时文件再原子替换，其他进程不会读到写了一半的文件
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"access_token": token, "expire_at": expire_at}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def refresh_lock(self) -> Iterator[None]:
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class SqliteTokenStore(TokenStore):
+    """以 sqlite 保存 token，刷新时用 BEGIN IMMEDIATE 写事务在多个进程之间互斥"""
+
+    def __init__(self, path: str, key: str = "default"):
+        """
+        Args:
+            path: sqlite 数据库文件路径
+            key: 记录的键，多个公众号共用同一个库时以 app_id 区分
+        """
+        self.path = path
+        self.key = key
+        self._thread_lock = threading.Lock()
+        # 持有刷新锁的线程在同一个写事务连接上保存 token，避免被自己的写锁阻塞
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS access_token ("
+                    "key TEXT PRIMARY KEY, token TEXT NOT NULL, expire_at REAL NOT NULL)"
+                )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """执行写语句：持有刷新锁时复用锁事务，否则使用独立的短事务"""
+        locked_conn = getattr(self._local, "conn", None)
+        if locked_conn is not None:
+            locked_conn.execute(sql, params)
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    def load(self) -> Optional[Tuple[str, float]]:
+        locked_conn = getattr(self._local, "conn", None)
+        conn = locked_conn or self._connect()
+        try:
+            row = conn.execute("SELECT token, expire_at FROM access_token WHERE key = ?", (self.key,)).fetchone()
+        finally:
+            if conn is not locked_conn:
+                conn.close()
+        return (row[0], float(row[1])) if row else None
+
+    def save(self, token: str, expire_at: float) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO access_token (key, token, expire_at) VALUES (?, ?, ?)",
+            (self.key, token, expire_at)
+        )
+
+    def clear(self) -> None:
+        self._write("DELETE FROM access_token WHERE key = ?", (self.key,))
+
+    @contextmanager
+    def refresh_lock(self) -> Iterator[None]:
+        with self._thread_lock:
+            conn = self._connect()
+            conn.isolation_level = None
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                self._local.conn = conn
+                try:
+                    yield
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                else:
+                    conn.execute("COMMIT")
+                finally:
+                    self._local.conn = None
+            finally:
+                conn.close()
+
+
+def create_token_store(app_id: Optional[str] = None) -> TokenStore:
+    """
+    根据配置文件 [wechat] 节创建 token 存储
+
+    token_store 可选 memory / file / sqlite，默认 file；
+    token_store_path 为 file/sqlite 存储的文件路径。
+    """
+    backend = config.get("wechat", "token_store", "file")
+    if backend == "memory":
+        return MemoryTokenStore()
+    if backend == "sqlite":
+        path = config.get("wechat", "token_store_path", ".cache/wechat_token.sqlite3")
+        return SqliteTokenStore(path, key=app_id or "default")
+    if backend != "file":
+        logger.warning(f"未知的 token_store 类型: {backend}，使用文件存储")
+    path = config.get("wechat", "token_store_path", f".cache/wechat_token_{app_id or 'default'}.json")
+    return FileTokenStore(path)
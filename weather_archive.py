@@ -0,0 +1,287 @@
+import array
+import bisect
+import datetime
+import json
+import logging
+import math
+import mmap
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from config import config
+from weather_snapshot import WeatherSnapshot
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+
+# 列名与 array 类型码：day 为日期序数（date.toordinal），数值列缺失时为 NaN，
+# condition 为天气状况在 meta.json 字典中的编号
+_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("day", "i"),
+    ("fetched_at", "d"),
+    ("temp_now", "f"),
+    ("temp_min", "f"),
+    ("temp_max", "f"),
+    ("precip", "f"),
+    ("uv_index", "f"),
+    ("humidity", "f"),
+    ("condition", "H"),
+)
+_TYPECODES = dict(_COLUMNS)
+NUMERIC_FIELDS = ("temp_now", "temp_min", "temp_max", "precip", "uv_index", "humidity")
+QUERY_FIELDS = NUMERIC_FIELDS + ("condition", "fetched_at")
+
+_MISSING_CONDITION = 0xFFFF
+
+DateLike = Union[str, datetime.date, None]
+
+
+def _to_ordinal(value: DateLike) -> Optional[int]:
+    """把 YYYY-MM-DD 字符串或 date 转换为日期序数"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return datetime.date.fromisoformat(value).toordinal()
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return float("nan") if value is None else float(value)
+
+
+def _none_if_nan(values: List[float]) -> List[Optional[float]]:
+    return [None if math.isnan(value) else round(value, 2) for value in values]
+
+
+class WeatherArchive:
+    """
+    按地点追加写入的历史天气列式存档
+
+    每个地点一个目录，每个字段一个定长数组文件（<字段>.col），第 i 行即每个文件的第 i 个元素。
+    追加时只在各列文件末尾写入一个元素；读取时以 mmap 映射列文件，按日期列二分定位区间后
+    只切片需要的列，查询 30 天趋势只需读取几百字节，不需要解析全部历史。
+
+    行按获取时间顺序追加，因此日期列单调不减，(地点, 日期) 即可定位；同一天可以有多行
+    （例如早晚各获取一次），按天取值时使用当天最后一行。
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: 存档根目录，不存在时自动创建
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(root, "meta.json")
+        self._conditions: List[str] = []
+        self._condition_codes: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+        self._load_meta()
+
+    def _load_meta(self) -> None:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            self._save_meta()
+            return
+        if meta.get("version") != ARCHIVE_VERSION or meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"天气存档 {self.root} 的格式版本或字节序与当前环境不一致")
+        self._conditions = list(meta.get("conditions", []))
+        self._condition_codes = {name: code for code, name in enumerate(self._conditions)}
+
+    def _save_meta(self) -> None:
+        meta = {
+            "version": ARCHIVE_VERSION,
+            "byteorder": sys.byteorder,
+            "columns": dict(_COLUMNS),
+            "conditions": self._conditions,
+        }
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._meta_path)
+
+    def _condition_code(self, condition: Optional[str]) -> int:
+        """天气状况的字典编号，新的天气状况追加到 meta.json（调用方持有锁）"""
+        if not condition:
+            return _MISSING_CONDITION
+        code = self._condition_codes.get(condition)
+        if code is None:
+            code = len(self._conditions)
+            self._conditions.append(condition)
+            self._condition_codes[condition] = code
+            self._save_meta()
+        return code
+
+    def _location_dir(self, location: str) -> str:
+        from html_generator import safe_path_component
+        return os.path.join(self.root, safe_path_component(location))
+
+    @staticmethod
+    def _column_path(directory: str, name: str) -> str:
+        return os.path.join(directory, f"{name}.col")
+
+    def _row_count(self, directory: str) -> int:
+        """完整写入的行数：各列元素数的最小值（进程在追加途中退出时，部分列会多出一个元素）"""
+        counts = []
+        for name, typecode in _COLUMNS:
+            try:
+                size = os.path.getsize(self._column_path(directory, name))
+            except FileNotFoundError:
+                return 0
+            counts.append(size // array.array(typecode).itemsize)
+        return min(counts)
+
+    def append(self, location: str, snapshot: WeatherSnapshot, fetched_at: Optional[float] = None) -> bool:
+        """
+        追加一条快照
+
+        与该地点最后一行同一天且各字段都相同时（例如重跑时命中了天气缓存）不会重复写入；
+        日期早于最后一行时（系统时钟回拨）拒绝写入，以保持日期列有序。
+
+        Returns:
+            是否写入了新行
+        """
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        day = datetime.date.fromtimestamp(fetched_at).toordinal()
+        directory = self._location_dir(location)
+        with self._lock:
+            row = {"day": day, "fetched_at": fetched_at, "condition": self._condition_code(snapshot.condition)}
+            for name in NUMERIC_FIELDS:
+                row[name] = _nan_if_none(getattr(snapshot, name))
+            encoded = {name: array.array(typecode, [row[name]]).tobytes() for name, typecode in _COLUMNS}
+
+            os.makedirs(directory, exist_ok=True)
+            rows = self._row_count(directory)
+            last = self._read_row(directory, rows - 1) if rows else None
+            if last is not None:
+                last_day = array.array("i", last["day"])[0]
+                if day < last_day:
+                    logger.warning(f"{location} 的快照日期早于存档中的最后一条，跳过写入")
+                    return False
+                if day == last_day and all(last[name] == encoded[name] for name, _ in _COLUMNS
+                                           if name != "fetched_at"):
+                    return False
+
+            for name, _ in _COLUMNS:
+                with open(self._column_path(directory, name), "ab") as f:
+                    # 截掉上次中途退出时多写的元素，保证各列行号对齐
+                    f.truncate(rows * len(encoded[name]))
+                    f.write(encoded[name])
+        return True
+
+    def _read_row(self, directory: str, index: int) -> Dict[str, bytes]:
+        """读取第 index 行各列的原始字节"""
+        row = {}
+        for name, typecode in _COLUMNS:
+            itemsize = array.array(typecode).itemsize
+            with open(self._column_path(directory, name), "rb") as f:
+                f.seek(index * itemsize)
+                row[name] = f.read(itemsize)
+        return row
+
+    @contextmanager
+    def _open_columns(self, directory: str, names: Sequence[str]) -> Iterator[Tuple[int, Dict[str, memoryview]]]:
+        """以只读 mmap 映射若干列，产出 (行数, 列名 -> 类型化的 memoryview)"""
+        rows = self._row_count(directory)
+        views: Dict[str, memoryview] = {}
+        with ExitStack() as stack:
+            try:
+                if rows:
+                    for name in names:
+                        typecode = _TYPECODES[name]
+                        f = stack.enter_context(open(self._column_path(directory, name), "rb"))
+                        mapped = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                        itemsize = array.array(typecode).itemsize
+                        views[name] = memoryview(mapped)[:rows * itemsize].cast(typecode)
+                yield rows, views
+            finally:
+                # mmap 关闭前必须释放所有导出的 memoryview
+                for view in views.values():
+                    view.release()
+
+    def query(self, location: str, start: DateLike = None, end: DateLike = None,
+              fields: Sequence[str] = NUMERIC_FIELDS) -> Dict[str, List[Any]]:
+        """
+        查询某个地点在 [start, end] 日期区间（含两端）内的所有行
+
+        Args:
+            location: 地点
+            start: 起始日期（YYYY-MM-DD 或 date），None 表示不限
+            end: 结束日期，None 表示不限
+            fields: 需要返回的列，可选 NUMERIC_FIELDS 与 condition、fetched_at
+
+        Returns:
+            {"date": [YYYY-MM-DD, ...], 字段: [值, ...]}，缺失的数值为 None
+        """
+        unknown = set(fields) - set(QUERY_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的存档字段: {', '.join(sorted(unknown))}")
+        start_day = _to_ordinal(start)
+        end_day = _to_ordinal(end)
+        result: Dict[str, List[Any]] = {"date": []}
+        result.update((name, []) for name in fields)
+
+        with self._open_columns(self._location_dir(location), ["day", *fields]) as (rows, columns):
+            if not rows:
+                return result
+            days = columns["day"]
+            lo = bisect.bisect_left(days, start_day) if start_day is not None else 0
+            hi = bisect.bisect_right(days, end_day) if end_day is not None else rows
+            result["date"] = [datetime.date.fromordinal(day).isoformat() for day in days[lo:hi].tolist()]
+            for name in fields:
+                values = columns[name][lo:hi].tolist()
+                if name == "condition":
+                    conditions = self._conditions
+                    result[name] = [conditions[code] if code < len(conditions) else None for code in values]
+                elif name == "fetched_at":
+                    result[name] = values
+                else:
+                    result[name] = _none_if_nan(values)
+        return result
+
+    def daily_series(self, location: str, days: int = 30, end: DateLike = None,
+                     fields: Sequence[str] = ("temp_min", "temp_max")) -> Dict[str, List[Any]]:
+        """
+        最近 days 天（截至 end，默认今天）每天最后一次记录的取值，用于趋势图
+
+        没有记录的日期不会出现在结果中。
+
+        Returns:
+            {"date": [YYYY-MM-DD, ...], 字段: [值, ...]}
+        """
+        end_date = datetime.date.fromordinal(_to_ordinal(end)) if end is not None else datetime.date.today()
+        start_date = end_date - datetime.timedelta(days=days - 1)
+        rows = self.query(location, start_date, end_date, fields)
+        # 同一天有多行时保留最后一行：从后往前遍历，只取每个日期第一次出现的位置
+        keep: List[int] = []
+        seen = set()
+        for index in range(len(rows["date"]) - 1, -1, -1):
+            if rows["date"][index] not in seen:
+                seen.add(rows["date"][index])
+                keep.append(index)
+        keep.reverse()
+        return {name: [values[index] for index in keep] for name, values in rows.items()}
+
+
+def create_weather_archive() -> Optional[WeatherArchive]:
+    """
+    根据配置文件 [archive] 节创建天气存档
+
+    enabled = false 或存档目录无法使用时返回 None，即不记录历史、不生成趋势图。
+    """
+    if not config.get_boolean("archive", "enabled", True):
+        return None
+    path = config.get("archive", "path", ".cache/weather_archive")
+    try:
+        return WeatherArchive(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"天气存档 {path} 无法使用，本次不记录历史天气: {e}")
+        return None
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 各接口默认缓存时长（秒）：实时天气变化快，预报每小时更新一次即可
+DEFAULT_TTLS = {"now": 600.0, "3d": 3600.0}
+
+_shared_cache: Optional["WeatherCache"] = None
+_shared_cache_lock = threading.Lock()
+
+
+class WeatherCache:
+    """
+    天气数据缓存，按 (接口, 地点) 为键缓存接口返回的数据
+
+    内存层使用 LRU 淘汰；可选的 sqlite 磁盘层让 TTL 内的重复运行（手动重跑、多进程）
+    也能直接命中缓存，不再消耗和风天气的调用额度。
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 256,
+                 path: Optional[str] = None, retention: Optional[float] = None):
+        """
+        Args:
+            ttls: 各接口的缓存时长（秒），未列出的接口不缓存
+            max_entries: 内存层最多保存的条目数
+            path: (可选) sqlite 数据库文件路径，为空时只使用内存缓存
+            retention: (可选) 磁盘层记录的保留时长（秒），不小于最长TTL；超过TTL但仍在保留期内的记录
+                只能通过 get(max_age=...) 显式读取，例如晚间推送复用早上获取的预报
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.retention = max([retention or 0.0, *self.ttls.values()])
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open_db(path)
+
+    def _open_db(self, path: str) -> None:
+        """打开磁盘缓存并清理已经超过保留时长的记录"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache ("
+                "endpoint TEXT NOT NULL, location TEXT NOT NULL, stored_at REAL NOT NULL, payload TEXT NOT NULL, "
+                "PRIMARY KEY (endpoint, location))"
+            )
+            oldest = time.time() - self.retention
+            self._db.execute("DELETE FROM weather_cache WHERE stored_at < ?", (oldest,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"天气磁盘缓存 {path} 打开失败，仅使用内存缓存: {e}")
+            self._db = None
+
+    def get(self, endpoint: str, location: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """
+        读取缓存，过期或不存在时返回 None
+
+        Args:
+            endpoint: 接口名称，如 "now"、"3d"
+            location: 地点
+            max_age: (可选) 本次读取允许的最大缓存时长，默认使用该接口的TTL
+        """
+        ttl = self.ttls.get(endpoint) if max_age is None else max_age
+        if not ttl:
+            return None
+        key = (endpoint, location)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load_from_db(key)
+                if entry is not None:
+                    self._store_in_memory(key, entry)
+            if entry is not None and now - entry[0] <= ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, endpoint: str, location: str, value: Any) -> None:
+        """写入缓存，同时写入内存层和磁盘层"""
+        if not self.ttls.get(endpoint):
+            return
+        key = (endpoint, location)
+        entry = (time.time(), value)
+        with self._lock:
+            self._store_in_memory(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO weather_cache (endpoint, location, stored_at, payload) VALUES (?, ?, ?, ?)",
+                        (endpoint, location, entry[0], json.dumps(value, ensure_ascii=False))
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"写入天气磁盘缓存失败: {e}")
+
+    def _store_in_memory(self, key: Tuple[str, str], entry: Tuple[float, Any]) -> None:
+        """写入内存层并按 LRU 淘汰（调用方需持有锁）"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_from_db(self, key: Tuple[str, str]) -> Optional[Tuple[float, Any]]:
+        """从磁盘层读取一条记录（调用方需持有锁）"""
+        try:
+            row = self._db.execute(
+                "SELECT stored_at, payload FROM weather_cache WHERE endpoint = ? AND location = ?", key
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取天气磁盘缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存命中/未命中次数及当前内存条目数"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def get_shared_cache() -> Optional[WeatherCache]:
+    """
+    获取进程内共享的天气缓存，由配置文件 [cache] 节控制
+
+    [cache] enabled = false 时返回 None，即不使用缓存。
+    """
+    global _shared_cache
+    if not config.get_boolean("cache", "enabled", True):
+        return None
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                backend = config.get("cache", "backend", "sqlite")
+                path = config.get("cache", "path", ".cache/weather_cache.sqlite3") if backend == "sqlite" else None
+                _shared_cache = WeatherCache(
+                    ttls={
+                        "now": config.get_float("cache", "ttl_now", DEFAULT_TTLS["now"]),
+                        "3d": config.get_float("cache", "ttl_forecast", DEFAULT_TTLS["3d"]),
+                    },
+                    max_entries=config.get_int("cache", "max_entries", 256),
+                    path=path,
+                    retention=config.get_float("cache", "retention", 86400.0),
+                )
+    return _shared_cache
@@ -1,109 +1,372 @@
 import requests
 from config import config
+from metrics import bind_run, get_metrics
+from http_transport import get_shared_session, get_timeout
+from retry_policy import RetryPolicy
+from weather_cache import WeatherCache, get_shared_cache
+from weather_snapshot import DailyForecast, WeatherSnapshot
 import logging
-from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional, List, Dict, Any, Iterable
+
+if TYPE_CHECKING:  # asyncio 与异步HTTP客户端只在 --mode async 下导入
+    from async_http import AsyncHttpClient
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 可以重试的临时错误：HTTP 状态码与和风天气返回的 code（超过访问频率、服务器内部错误等）
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+RETRYABLE_CODES = frozenset({"429", "500"})
+
+# 各接口在运行指标中的阶段名称
+_FETCH_STAGES = {"now": "fetch_now", "3d": "fetch_forecast"}
+
+
+class WeatherFetchError(Exception):
+    """天气接口请求失败，leg 标明是哪一个接口出错"""
+
+    def __init__(self, leg: str, message: str, retryable: bool = False):
+        super().__init__(f"{leg}接口{message}")
+        self.leg = leg
+        self.retryable = retryable
+
 
 class WeatherClient:
     """和风天气API客户端，用于获取和解析天气数据"""
 
-    def __init__(self):
-        """初始化客户端，从配置文件加载API参数"""
+    def __init__(self, location: Optional[str] = None, session: Optional[requests.Session] = None,
+                 cache: Optional[WeatherCache] = None):
+        """
+        初始化客户端，从配置文件加载API参数
+
+        Args:
+            location: (可选) 城市ID或经纬度，默认使用配置文件 [weather_api] 中的 location
+            session: (可选) 自定义的HTTP会话，默认使用进程内共享的连接池
+            cache: (可选) 天气数据缓存，默认使用由 [cache] 配置的共享缓存
+        """
         self.api_key = config.get('weather_api', 'key')
-        self.location = config.get('weather_api', 'location')
+        self.location = location or config.get('weather_api', 'location')
         self.url_now = config.get('weather_api', 'url')
         self.url_forecast = config.get('weather_api', 'url_forecast')
+        self.session = session or get_shared_session()
+        self.timeout = get_timeout()
+        self.cache = cache if cache is not None else get_shared_cache()
+        self.retry_policy = RetryPolicy.from_config("weather_api", max_attempts=3, base_delay=0.5, max_delay=4.0)
 
         self.realtime_weather: Optional[Dict[str, Any]] = None
         self.forecast_weather: Optional[List[Dict[str, Any]]] = None
+        self.snapshot: Optional[WeatherSnapshot] = None
+        self.last_error: Optional[str] = None
+
+    def _fetch_endpoint(self, leg: str, endpoint: str, url: str, result_key: str,
+                        max_age: Optional[float] = None) -> Any:
+        """
+        请求单个和风天气接口，缓存未过期时直接返回缓存数据
+
+        Args:
+            leg: 接口名称，用于错误信息（如 "实时天气"）
+            endpoint: 缓存键中的接口标识（"now" 或 "3d"）
+            url: 接口地址
+            result_key: 响应中需要提取的字段名
+            max_age: (可选) 本次允许使用的最长缓存时长（秒），默认使用该接口的TTL
+
+        Raises:
+            WeatherFetchError: 网络请求失败、响应无法解析或API返回错误码时抛出
+        """
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, self.location, max_age=max_age)
+            if cached is not None:
+                get_metrics().inc("weather_cache_hits", endpoint=endpoint)
+                return cached
+
+        params = {'key': self.api_key, 'location': self.location}
+        attempt = 0
+        with get_metrics().span(_FETCH_STAGES.get(endpoint, f"fetch_{endpoint}")):
+            while True:
+                attempt += 1
+                try:
+                    result = self._request_endpoint(leg, url, params)
+                    break
+                except WeatherFetchError as e:
+                    if not e.retryable or not self.retry_policy.should_retry(attempt):
+                        raise
+                    delay = self.retry_policy.sleep(attempt)
+                    logger.warning(f"{self.location} {e}，已等待 {delay:.2f} 秒，进行第 {attempt} 次重试")
+
+        data = result.get(result_key)
+        if self.cache is not None and data:
+            self.cache.set(endpoint, self.location, data)
+        return data
+
+    def _request_endpoint(self, leg: str, url: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """
+        发起一次接口请求并校验返回码
 
-    def fetch_weather_data(self) -> bool:
+        Raises:
+            WeatherFetchError: 请求失败时抛出，retryable 标明是否为可以重试的临时错误
         """
-        从和风天气API获取最新的实时和预报数据
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            raise WeatherFetchError(leg, f"网络请求失败: {e}", retryable=status in RETRYABLE_STATUS) from e
+        except requests.exceptions.RequestException as e:
+            raise WeatherFetchError(leg, f"网络请求失败: {e}", retryable=True) from e
+        except ValueError as e:
+            raise WeatherFetchError(leg, f"响应不是合法的JSON: {e}") from e
+        return self._check_result(leg, result)
+
+    @staticmethod
+    def _check_result(leg: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """校验和风天气返回的 code，不是 200 时抛出 WeatherFetchError"""
+        code = result.get('code')
+        if code != '200':
+            raise WeatherFetchError(leg, f"API请求失败: {result.get('msg', '未知错误')}，错误代码: {code}",
+                                    retryable=code in RETRYABLE_CODES)
+        return result
+
+    async def _fetch_endpoint_async(self, http: "AsyncHttpClient", leg: str, endpoint: str, url: str,
+                                    result_key: str) -> Any:
+        """_fetch_endpoint 的异步版本，通过 http 发起请求，缓存与重试规则相同"""
+        import asyncio
+        from async_http import AsyncHttpError
+
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, self.location)
+            if cached is not None:
+                get_metrics().inc("weather_cache_hits", endpoint=endpoint)
+                return cached
+
+        params = {'key': self.api_key, 'location': self.location}
+        attempt = 0
+        with get_metrics().span(_FETCH_STAGES.get(endpoint, f"fetch_{endpoint}")):
+            while True:
+                attempt += 1
+                try:
+                    try:
+                        result = self._check_result(leg, await http.get_json(url, params=params))
+                    except AsyncHttpError as e:
+                        retryable = e.connect_failed or e.status in RETRYABLE_STATUS
+                        raise WeatherFetchError(leg, f"网络请求失败: {e}", retryable=retryable) from e
+                    break
+                except WeatherFetchError as e:
+                    if not e.retryable or not self.retry_policy.should_retry(attempt):
+                        raise
+                    delay = self.retry_policy.backoff(attempt)
+                    logger.warning(f"{self.location} {e}，等待 {delay:.2f} 秒后进行第 {attempt} 次重试")
+                    await asyncio.sleep(delay)
+
+        data = result.get(result_key)
+        if self.cache is not None and data:
+            self.cache.set(endpoint, self.location, data)
+        return data
+
+    def fetch_weather_data(self, now_max_age: Optional[float] = None) -> bool:
+        """
+        从和风天气API并发获取最新的实时和预报数据
+
+        两个接口互不依赖，同时发起请求；只有两者都成功时才会同时更新
+        realtime_weather、forecast_weather 以及由它们构建的 snapshot，
+        任一失败则全部置为 None，失败原因记录在 last_error 中。
+
+        Args:
+            now_max_age: (可选) 实时天气允许使用的最长缓存时长（秒），默认使用 [cache] ttl_now；
+                预报始终按 [cache] ttl_forecast 复用
 
         Returns:
             bool: 数据获取成功返回 True，否则返回 False
         """
-        try:
-            # 1. 获取实时天气
-            params_now = {'key': self.api_key, 'location': self.location}
-            response_now = requests.get(self.url_now, params=params_now, timeout=10)
-            response_now.raise_for_status()
-            result_now = response_now.json()
-
-            if result_now.get('code') != '200':
-                logger.error(f"实时天气API请求失败: {result_now.get('msg', '未知错误')}")
-                return False
-            self.realtime_weather = result_now.get('now', {})
-
-            # 2. 获取3天预报
-            params_forecast = {'key': self.api_key, 'location': self.location}
-            response_forecast = requests.get(self.url_forecast, params=params_forecast, timeout=10)
-            response_forecast.raise_for_status()
-            result_forecast = response_forecast.json()
-
-            if result_forecast.get('code') != '200':
-                logger.error(f"天气预报API请求失败: {result_forecast.get('msg', '未知错误')}")
-                return False
-            self.forecast_weather = result_forecast.get('daily', [])
-
-            logger.info("天气数据获取成功")
-            return True
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-fetch") as executor:
+            future_now = executor.submit(bind_run(self._fetch_endpoint), "实时天气", "now", self.url_now, 'now',
+                                       max_age=now_max_age)
+            future_forecast = executor.submit(bind_run(self._fetch_endpoint), "天气预报", "3d", self.url_forecast, 'daily')
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取天气数据时网络请求失败: {e}")
-            self.realtime_weather = None
-            self.forecast_weather = None
-            return False
+        outcomes = []
+        for future in (future_now, future_forecast):
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+        return self._apply_results(outcomes)
+
+    def fetch_forecast(self, max_age: Optional[float] = None) -> bool:
+        """
+        只获取逐日预报（不请求实时天气），用于晚间的明日天气推送
+
+        缓存中的预报在 max_age 秒内时直接复用（通常是早上推送时已经获取过的 3 天预报），
+        不会再次请求接口。成功后 realtime_weather 为空，snapshot 中只有预报相关的字段。
+
+        Args:
+            max_age: (可选) 允许复用的最长缓存时长（秒），默认使用 [cache] ttl_forecast
+        """
+        try:
+            daily = self._fetch_endpoint("天气预报", "3d", self.url_forecast, 'daily', max_age=max_age)
         except Exception as e:
-            logger.error(f"获取天气数据时发生未知错误: {e}")
+            daily = e
+        return self._apply_results([{}, daily])
+
+    async def fetch_weather_data_async(self, http: "AsyncHttpClient") -> bool:
+        """fetch_weather_data 的异步版本，两个接口在事件循环中并发请求"""
+        import asyncio
+
+        outcomes = await asyncio.gather(
+            self._fetch_endpoint_async(http, "实时天气", "now", self.url_now, 'now'),
+            self._fetch_endpoint_async(http, "天气预报", "3d", self.url_forecast, 'daily'),
+            return_exceptions=True,
+        )
+        return self._apply_results(list(outcomes))
+
+    def _apply_results(self, outcomes: List[Any]) -> bool:
+        """
+        根据实时天气、天气预报两个接口的结果（或异常）同时更新全部字段
+
+        Returns:
+            bool: 两个接口都成功时返回 True
+        """
+        errors = []
+        for outcome in outcomes:
+            if isinstance(outcome, WeatherFetchError):
+                errors.append(str(outcome))
+            elif isinstance(outcome, Exception):
+                errors.append(f"获取天气数据时发生未知错误: {outcome}")
+
+        if errors:
             self.realtime_weather = None
             self.forecast_weather = None
+            self.snapshot = None
+            self.last_error = "；".join(errors)
+            logger.error(f"获取天气数据失败: {self.last_error}")
             return False
 
+        self.realtime_weather, self.forecast_weather = outcomes[0] or {}, outcomes[1] or []
+        self.snapshot = WeatherSnapshot.from_qweather(self.location, self.realtime_weather, self.forecast_weather)
+        self.last_error = None
+        logger.info("天气数据获取成功")
+        return True
+
     def get_temperature_range(self) -> str:
         """获取今天的温度范围"""
-        if not self.forecast_weather:
+        if self.snapshot is None:
             return "未知"
-        today = self.forecast_weather[0]
-        return f"{today.get('tempMin', '?')}℃ ~ {today.get('tempMax', '?')}℃"
+        return self.snapshot.temperature_range
 
     def get_weather_condition(self) -> str:
         """获取天气状况"""
-        if not self.realtime_weather:
+        if self.snapshot is None:
             return "未知"
-        return self.realtime_weather.get('text', "未知")
+        return self.snapshot.condition or "未知"
 
     def get_wind_info(self) -> str:
         """获取风力风向"""
-        if not self.realtime_weather:
+        if self.snapshot is None:
             return "未知"
-        wind_dir = self.realtime_weather.get('windDir', "未知")
-        wind_scale = self.realtime_weather.get('windScale', "未知")
-        return f"{wind_dir} {wind_scale}级"
+        return self.snapshot.wind_info
 
     def get_uv_index(self) -> Optional[int]:
         """获取紫外线指数数值"""
-        if not self.forecast_weather:
+        if self.snapshot is None:
             return None
-        today = self.forecast_weather[0]
-        uv_index_str = today.get('uvIndex')
-        if uv_index_str:
-            try:
-                return int(uv_index_str)
-            except (ValueError, TypeError):
-                return None
-        return None
+        return self.snapshot.uv_index
 
     def get_precipitation(self) -> float:
         """获取实时降水量"""
-        if not self.realtime_weather:
+        if self.snapshot is None:
             return 0.0
-        precip_str = self.realtime_weather.get('precip', "0.0")
-        try:
-            return float(precip_str)
-        except (ValueError, TypeError):
-            return 0.0
\ No newline at end of file
+        return self.snapshot.precip
+
+    def get_daily_forecast(self, offset: int) -> Optional[DailyForecast]:
+        """获取第 offset 天（0 为今天，1 为明天）的预报"""
+        if self.snapshot is None:
+            return None
+        return self.snapshot.day(offset)
+
+
+def fetch_weather_batch(locations: Iterable[str], max_workers: Optional[int] = None,
+                        now_max_age: Optional[float] = None) -> Dict[str, WeatherClient]:
+    """
+    并发获取多个地点的天气数据，每个不同的地点只请求一次
+
+    Args:
+        locations: 地点列表，允许重复，内部会去重
+        max_workers: 同时请求的地点数，默认读取配置 [weather_api] max_workers
+        now_max_age: (可选) 实时天气允许使用的最长缓存时长（秒），见 WeatherClient.fetch_weather_data
+
+    Returns:
+        以地点为键、已成功获取数据的 WeatherClient 为值的字典，获取失败的地点不会出现在结果中
+    """
+    if now_max_age is None:
+        return _fetch_batch(locations, max_workers, WeatherClient.fetch_weather_data)
+    return _fetch_batch(locations, max_workers, lambda client: client.fetch_weather_data(now_max_age))
+
+
+def fetch_forecast_batch(locations: Iterable[str], max_age: Optional[float] = None,
+                         max_workers: Optional[int] = None) -> Dict[str, WeatherClient]:
+    """
+    fetch_weather_batch 的只取预报版本，缓存中 max_age 秒内的 3 天预报直接复用
+
+    Returns:
+        以地点为键、已成功获取预报的 WeatherClient 为值的字典
+    """
+    return _fetch_batch(locations, max_workers, lambda client: client.fetch_forecast(max_age))
+
+
+def _fetch_batch(locations: Iterable[str], max_workers: Optional[int],
+                 fetch: Callable[[WeatherClient], bool]) -> Dict[str, WeatherClient]:
+    """在线程池中对每个不同的地点执行一次 fetch"""
+    unique_locations = list(dict.fromkeys(loc for loc in locations if loc))
+    if not unique_locations:
+        return {}
+    max_workers = max_workers or config.get_int('weather_api', 'max_workers', 8)
+
+    clients = {location: WeatherClient(location) for location in unique_locations}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(clients)), thread_name_prefix="weather-batch") as executor:
+        fetch = bind_run(fetch)
+        futures = {location: executor.submit(fetch, client) for location, client in clients.items()}
+
+    fetched = {}
+    for location, future in futures.items():
+        if future.result():
+            fetched[location] = clients[location]
+        else:
+            logger.error(f"地点 {location} 的天气数据获取失败: {clients[location].last_error}")
+    logger.info(f"批量获取天气完成: 成功 {len(fetched)}/{len(unique_locations)} 个地点")
+    cache = get_shared_cache()
+    if cache is not None:
+        logger.info(f"天气缓存统计: {cache.stats()}")
+    return fetched
+
+
+async def fetch_weather_batch_async(locations: Iterable[str], http: "AsyncHttpClient",
+                                    max_concurrency: Optional[int] = None) -> Dict[str, WeatherClient]:
+    """
+    fetch_weather_batch 的异步版本：在事件循环中并发获取多个地点的天气
+
+    Args:
+        locations: 地点列表，允许重复，内部会去重
+        http: 异步HTTP客户端
+        max_concurrency: 同时请求的地点数，默认读取配置 [weather_api] max_workers
+    """
+    import asyncio
+
+    unique_locations = list(dict.fromkeys(loc for loc in locations if loc))
+    if not unique_locations:
+        return {}
+    semaphore = asyncio.Semaphore(max_concurrency or config.get_int('weather_api', 'max_workers', 8))
+    clients = {location: WeatherClient(location) for location in unique_locations}
+
+    async def _fetch(client: WeatherClient) -> bool:
+        async with semaphore:
+            return await client.fetch_weather_data_async(http)
+
+    results = await asyncio.gather(*(_fetch(client) for client in clients.values()))
+    fetched = {}
+    for (location, client), ok in zip(clients.items(), results):
+        if ok:
+            fetched[location] = client
+        else:
+            logger.error(f"地点 {location} 的天气数据获取失败: {client.last_error}")
+    logger.info(f"批量获取天气完成: 成功 {len(fetched)}/{len(unique_locations)} 个地点")
+    return fetched
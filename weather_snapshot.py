@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """把和风天气返回的字符串数值转换为 float，无法转换时返回 None"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """把和风天气返回的字符串数值转换为 int，无法转换时返回 None"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def format_number(value: Optional[float]) -> str:
+    """格式化数值用于展示：整数不带小数点，缺失时显示 ?"""
+    if value is None:
+        return "?"
+    return f"{value:g}"
+
+
+class DailyForecast:
+    """和风天气 /weather/3d 中某一天的数值化预报"""
+
+    __slots__ = (
+        "date", "condition_day", "condition_night", "temp_min", "temp_max",
+        "precip", "uv_index", "humidity", "wind_dir", "wind_scale",
+    )
+
+    def __init__(self, date: Optional[str] = None, condition_day: Optional[str] = None,
+                 condition_night: Optional[str] = None, temp_min: Optional[float] = None,
+                 temp_max: Optional[float] = None, precip: Optional[float] = None,
+                 uv_index: Optional[int] = None, humidity: Optional[float] = None,
+                 wind_dir: Optional[str] = None, wind_scale: Optional[str] = None):
+        self.date = date
+        self.condition_day = condition_day
+        self.condition_night = condition_night
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.precip = precip
+        self.uv_index = uv_index
+        self.humidity = humidity
+        self.wind_dir = wind_dir
+        self.wind_scale = wind_scale
+
+    @classmethod
+    def from_qweather(cls, item: Dict[str, Any]) -> "DailyForecast":
+        """由 daily 数组中的一项构建"""
+        return cls(
+            date=item.get("fxDate") or None,
+            condition_day=item.get("textDay") or None,
+            condition_night=item.get("textNight") or None,
+            temp_min=_to_float(item.get("tempMin")),
+            temp_max=_to_float(item.get("tempMax")),
+            precip=_to_float(item.get("precip")),
+            uv_index=_to_int(item.get("uvIndex")),
+            humidity=_to_float(item.get("humidity")),
+            wind_dir=item.get("windDirDay") or None,
+            wind_scale=item.get("windScaleDay") or None,
+        )
+
+    @property
+    def condition(self) -> str:
+        """白天与夜间天气，如 "小雨转多云"，两者相同时只显示一个"""
+        day, night = self.condition_day, self.condition_night
+        if day and night and day != night:
+            return f"{day}转{night}"
+        return day or night or "未知"
+
+    @property
+    def temperature_range(self) -> str:
+        if self.temp_min is None and self.temp_max is None:
+            return "未知"
+        return f"{format_number(self.temp_min)}℃ ~ {format_number(self.temp_max)}℃"
+
+    @property
+    def wind_info(self) -> str:
+        return f"{self.wind_dir or '未知'} {self.wind_scale or '未知'}级"
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"DailyForecast({fields})"
+
+
+class WeatherSnapshot:
+    """
+    某个地点一次天气查询结果的数值化快照
+
+    在获取数据后由和风天气的原始 JSON 构建一次，之后所有提示语、预警和HTML页面
+    都直接读取这里的数值字段，不再反复拼接、拆分字符串。
+    """
+
+    __slots__ = (
+        "location", "condition", "temp_now", "temp_min", "temp_max",
+        "precip", "uv_index", "wind_dir", "wind_scale", "humidity", "forecast",
+    )
+
+    def __init__(self, location: Optional[str] = None, condition: Optional[str] = None,
+                 temp_now: Optional[float] = None, temp_min: Optional[float] = None,
+                 temp_max: Optional[float] = None, precip: float = 0.0, uv_index: Optional[int] = None,
+                 wind_dir: Optional[str] = None, wind_scale: Optional[str] = None,
+                 humidity: Optional[float] = None, forecast: Tuple[DailyForecast, ...] = ()):
+        self.location = location
+        self.condition = condition
+        self.temp_now = temp_now
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.precip = precip
+        self.uv_index = uv_index
+        self.wind_dir = wind_dir
+        self.wind_scale = wind_scale
+        self.humidity = humidity
+        self.forecast = forecast
+
+    @classmethod
+    def from_qweather(cls, location: Optional[str], now: Optional[Dict[str, Any]],
+                      daily: Optional[List[Dict[str, Any]]]) -> "WeatherSnapshot":
+        """
+        由和风天气 /weather/now 的 now 字段与 /weather/3d 的 daily 字段构建快照
+
+        Args:
+            location: 地点
+            now: 实时天气数据
+            daily: 逐日预报数据，今天的温度与紫外线取自第一天，各天的预报保存在 forecast 中
+        """
+        now = now or {}
+        today = daily[0] if daily else {}
+        precip = _to_float(now.get("precip", "0.0"))
+        return cls(
+            location=location,
+            condition=now.get("text") or None,
+            temp_now=_to_float(now.get("temp")),
+            temp_min=_to_float(today.get("tempMin")),
+            temp_max=_to_float(today.get("tempMax")),
+            precip=precip if precip is not None else 0.0,
+            uv_index=_to_int(today.get("uvIndex")),
+            wind_dir=now.get("windDir") or None,
+            wind_scale=now.get("windScale") or None,
+            humidity=_to_float(now.get("humidity")),
+            forecast=tuple(DailyForecast.from_qweather(item) for item in daily or ()),
+        )
+
+    def day(self, offset: int) -> Optional[DailyForecast]:
+        """第 offset 天（0 为今天，1 为明天）的预报，超出预报范围时为 None"""
+        return self.forecast[offset] if 0 <= offset < len(self.forecast) else None
+
+    @property
+    def has_forecast(self) -> bool:
+        """是否包含今日预报的温度数据"""
+        return self.temp_min is not None or self.temp_max is not None
+
+    @property
+    def temperature_range(self) -> str:
+        """今日温度范围，如 "10℃ ~ 22℃"，没有预报数据时为 "未知" """
+        if not self.has_forecast:
+            return "未知"
+        return f"{format_number(self.temp_min)}℃ ~ {format_number(self.temp_max)}℃"
+
+    @property
+    def wind_info(self) -> str:
+        """风向风力，如 "东风 3级" """
+        return f"{self.wind_dir or '未知'} {self.wind_scale or '未知'}级"
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"WeatherSnapshot({fields})"
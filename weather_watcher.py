@@ -0,0 +1,224 @@
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from alert_rules import AlertResult
+from config import config
+from html_generator import write_file_atomic
+from message_builder import MessageBuilder
+from metrics import export_run, get_metrics, start_run
+from weather_client import WeatherClient, fetch_weather_batch
+from weather_snapshot import format_number
+
+if TYPE_CHECKING:
+    from scheduler import WeatherNotificationScheduler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 天气变化提醒在发送队列中的运行键形如 "<日期>#watch-<时分秒>"，每次触发单独记录进度
+WATCH_RUN_PREFIX = "#watch-"
+
+# uv_high、heat、cold 等规则读取的是逐日预报，只会随预报（[cache] ttl_forecast）更新，
+# 紫外线的逐日最大值不反映当前时刻，默认不监控；rain_now 读取实时天气，每轮都是最新数据
+DEFAULT_WATCH_RULES = "rain_now, heat, cold"
+
+
+class WeatherWatcher:
+    """
+    轮询各地点的天气，在预警规则由不满足变为满足时向该地点的用户推送提醒
+
+    每轮只请求名单中出现的地点（每个地点一次；实时天气最多复用半个轮询间隔内的缓存，预报仍按其 TTL 复用），
+    原始数据与上一轮相同的地点不会重新评估；只有规则的"上升沿"（如开始下雨、最高气温升到高温线）
+    会触发推送，同一地点的同一条规则在冷却时间内只推送一次。因此接口调用量只与地点数和轮询间隔有关，
+    微信消息量只与真实发生的天气变化有关，都不随用户数增长。
+
+    每个地点当前满足的规则与最近一次推送时间保存在 [watch] state_file 中，重启后不会把
+    已经在下雨的地点当作新的变化重复推送。
+    """
+
+    def __init__(self, scheduler: "WeatherNotificationScheduler"):
+        """
+        Args:
+            scheduler: 复用其名单、发送队列、预警规则引擎与消息发送
+        """
+        self.scheduler = scheduler
+        self.interval = config.get_float("watch", "interval", 600.0)
+        self.cooldown = config.get_float("watch", "cooldown", 3 * 3600.0)
+        self.roster_refresh = config.get_float("watch", "roster_refresh", 3600.0)
+        self.state_path = config.get("watch", "state_file", ".cache/watch_state.json")
+        # 轮询的指标单独导出，不覆盖定时推送的 last_run_metrics.json
+        self.metrics_path = config.get("watch", "metrics_path", ".cache/watch_metrics.json")
+        self.prometheus_path = config.get("watch", "prometheus_path", "")
+
+        known = {rule.name for rule in scheduler.alert_engine.rules}
+        names = [name.strip() for name in config.get("watch", "rules", DEFAULT_WATCH_RULES).split(",")]
+        self.rule_names = [name for name in names if name in known]
+        unknown = [name for name in names if name and name not in known]
+        if unknown:
+            logger.warning(f"[watch] rules 中的规则不存在，已忽略: {', '.join(unknown)}")
+
+        self._state = self._load_state()
+        self._raw: Dict[str, Tuple[Any, Any]] = {}
+        self._locations: List[str] = []
+        self._locations_loaded_at: Optional[float] = None
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """读取 {"active": {地点: [规则]}, "fired": {地点: {规则: 时间戳}}}，文件不存在或损坏时从空状态开始"""
+        state: Dict[str, Dict[str, Any]] = {"active": {}, "fired": {}}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if isinstance(saved, dict):
+                state["active"].update(saved.get("active") or {})
+                state["fired"].update(saved.get("fired") or {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取天气监控状态文件 {self.state_path} 失败，将重新建立基线: {e}")
+        return state
+
+    def _save_state(self) -> None:
+        try:
+            write_file_atomic(self.state_path, json.dumps(self._state, ensure_ascii=False, sort_keys=True))
+        except OSError as e:
+            logger.warning(f"保存天气监控状态失败: {e}")
+
+    def _watched_locations(self) -> List[str]:
+        """名单中出现的地点，每隔 [watch] roster_refresh 秒重新读取一次名单"""
+        now = time.monotonic()
+        if self._locations_loaded_at is None or now - self._locations_loaded_at >= self.roster_refresh:
+            default_location = self.scheduler.default_location
+            locations = dict.fromkeys(user.location or default_location for user in self.scheduler.roster.iter_users())
+            self._locations = list(locations) or [default_location]
+            self._locations_loaded_at = now
+        return self._locations
+
+    def _changed_clients(self, weather_clients: Dict[str, WeatherClient]) -> Dict[str, WeatherClient]:
+        """原始数据与上一轮不同的地点（命中缓存时数据相同，直接跳过）"""
+        changed = {}
+        for location, weather_client in weather_clients.items():
+            raw = (weather_client.realtime_weather, weather_client.forecast_weather)
+            if self._raw.get(location) != raw:
+                self._raw[location] = raw
+                changed[location] = weather_client
+        return changed
+
+    def _detect_events(self, result: AlertResult, now: float) -> Dict[str, List[str]]:
+        """
+        对比各地点今天满足的规则与上一轮的记录，返回 {地点: [新满足且不在冷却期内的规则]}
+
+        第一次观测到的地点只记录基线，不推送。
+        """
+        watched = set(self.rule_names)
+        active_state, fired_state = self._state["active"], self._state["fired"]
+        events: Dict[str, List[str]] = {}
+        for location in result.table.locations:
+            active: Set[str] = watched.intersection(result.rule_names(location, 0))
+            previous = active_state.get(location)
+            active_state[location] = sorted(active)
+            if previous is None:
+                continue
+            fired = fired_state.get(location, {})
+            rising = [name for name in self.rule_names
+                      if name in active and name not in previous and now - fired.get(name, 0) >= self.cooldown]
+            if rising:
+                fired_state[location] = dict(fired, **{name: now for name in rising})
+                events[location] = rising
+        return events
+
+    @staticmethod
+    def _alert_fields(weather_client: WeatherClient, alerts: List[str]) -> Dict[str, str]:
+        """天气变化提醒的模板消息字段，提醒内容放在 note 中"""
+        message_builder = MessageBuilder(weather_client)
+        snapshot = weather_client.snapshot
+        temp_now = snapshot.temp_now if snapshot is not None else None
+        return {
+            "greeting": "天气有变化啦",
+            "date": time.strftime("%Y年%m月%d日 %H:%M"),
+            "temperature": f"当前气温: {format_number(temp_now)}℃",
+            "weather_condition": weather_client.get_weather_condition(),
+            "wind": weather_client.get_wind_info(),
+            "precipitation": message_builder.get_precipitation_tips(),
+            "uv": message_builder.get_uv_tips(),
+            "note": "；".join(alerts),
+        }
+
+    def _send_alerts(self, result: AlertResult, events: Dict[str, List[str]],
+                     weather_clients: Dict[str, WeatherClient], summary: Dict[str, Any]) -> None:
+        """只把受影响地点的用户写入本次提醒的发送队列并发送"""
+        scheduler = self.scheduler
+        today = time.strftime("%Y-%m-%d")
+        run_key = f"{today}{WATCH_RUN_PREFIX}{time.strftime('%H%M%S')}"
+        default_location = scheduler.default_location
+        users = (user for user in scheduler.roster.iter_users() if (user.location or default_location) in events)
+        added = scheduler.send_queue.enqueue(run_key, users, default_location)
+        logger.info(f"天气变化涉及 {len(events)} 个地点、{added} 个用户（{run_key}）")
+
+        # 链接沿用当天早上（任一时间槽）生成的页面
+        morning_urls = scheduler.report_urls(today)
+        reports: Dict[str, Dict[str, Any]] = {}
+        for location, rule_names in events.items():
+            fields = self._alert_fields(weather_clients[location], result.messages(location, 0, rule_names))
+            url = morning_urls.get(location)
+            scheduler.send_queue.save_payload(run_key, location, fields, url)
+            reports[location] = {"message_fields": fields, "url": url}
+        scheduler.deliver_reports(run_key, scheduler.send_queue.pending_locations(run_key), reports, summary,
+                                  note="注意天气变化哦💖")
+        summary["queue"] = scheduler.send_queue.counts(run_key)
+
+    def poll_once(self) -> Dict[str, Any]:
+        """
+        轮询一次所有地点
+
+        Returns:
+            运行摘要：locations（轮询的地点数）、changed（数据有变化的地点数）、events（地点 -> 触发的规则）、
+            sent / failed（本次发送成功、失败的人数），出错时包含 error
+        """
+        summary: Dict[str, Any] = {"locations": 0, "changed": 0, "events": {}, "sent": 0, "failed": 0}
+        start_run()
+        try:
+            locations = self._watched_locations()
+            summary["locations"] = len(locations)
+            # 实时天气的缓存不能超过半个轮询间隔，否则按 ttl_now 命中上一轮写入的缓存会错过变化
+            weather_clients = fetch_weather_batch(locations, now_max_age=self.interval / 2)
+            changed = self._changed_clients(weather_clients)
+            summary["changed"] = len(changed)
+            if changed:
+                result = self.scheduler.evaluate_alerts(changed)
+                events = self._detect_events(result, time.time())
+                summary["events"] = events
+                if events:
+                    get_metrics().inc("watch_events", sum(len(names) for names in events.values()))
+                    self._send_alerts(result, events, weather_clients, summary)
+                self._save_state()
+            logger.info(f"天气监控: {summary['locations']} 个地点，{summary['changed']} 个有变化，"
+                        f"{len(summary['events'])} 个触发提醒")
+        except Exception as e:
+            logger.error(f"天气监控轮询时发生错误: {e}")
+            summary["error"] = str(e)
+        finally:
+            export_run(summary, json_path=self.metrics_path, prometheus_path=self.prometheus_path)
+        return summary
+
+    def run(self, max_polls: Optional[int] = None) -> None:
+        """
+        按 [watch] interval 秒的间隔持续轮询，直到 Ctrl+C 或达到 max_polls 次
+
+        间隔从每轮开始时计算，轮询本身的耗时不会让周期逐渐漂移。
+        """
+        self.scheduler.wechat_client.start_background_refresh()
+        logger.info(f"天气监控已启动，每 {self.interval:g} 秒检查一次，规则: {', '.join(self.rule_names)}")
+        polls = 0
+        next_poll = time.monotonic()
+        try:
+            while max_polls is None or polls < max_polls:
+                self.poll_once()
+                polls += 1
+                next_poll += self.interval
+                if max_polls is not None and polls >= max_polls:
+                    break
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            logger.info("天气监控已停止")
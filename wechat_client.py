@@ -1,49 +1,134 @@
 import requests
-import json
-from typing import Dict, List, Optional
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 from config import config
+from metrics import bind_run, get_metrics
+from http_transport import get_shared_session, get_timeout
+from retry_policy import RetryPolicy
+from payload_builder import TemplatePayloadBuilder, build_template_request, encode_template_request
+from token_store import TokenStore, create_token_store
 import logging
+import threading
 import time
 
+if TYPE_CHECKING:  # asyncio 与异步HTTP客户端只在 --mode async 下导入
+    from async_http import AsyncHttpClient
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_BASE = "https://api.weixin.qq.com"
+
+# token 剩余有效期少于该秒数时视为过期，需要重新获取
+TOKEN_EXPIRE_MARGIN = 200
+
+# access_token 无效或已过期，刷新 token 后可以重发
+TOKEN_INVALID_ERRCODES = frozenset({40001, 40014, 42001})
+# 系统繁忙、调用次数或频率超限，退避后可以重发
+THROTTLE_ERRCODES = frozenset({-1, 45009, 45011})
+
 
 class WeChatClient:
     """微信公众号客户端，负责调用微信API发送模板消息"""
 
-    def __init__(self):
-        """初始化微信客户端，从配置获取API信息"""
+    def __init__(self, session: Optional[requests.Session] = None, token_store: Optional[TokenStore] = None):
+        """
+        初始化微信客户端，从配置获取API信息
+
+        Args:
+            session: (可选) 自定义的HTTP会话，默认使用进程内共享的连接池
+            token_store: (可选) access_token 存储，默认按 [wechat] token_store 配置创建
+        """
         self.wechat_config = config.get_section("wechat")
         self.app_id = self.wechat_config.get("app_id")
         self.app_secret = self.wechat_config.get("app_secret")
         self.template_id = self.wechat_config.get("template_id")
         self.access_token = None
         self.token_expire_time = 0
+        self.session = session or get_shared_session()
+        self.timeout = get_timeout()
+        # 并发发送时多个线程共享同一个 token，刷新过程需要加锁
+        self._token_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+        self.retry_policy = RetryPolicy.from_config("wechat", max_attempts=3, base_delay=0.5, max_delay=8.0)
+        self._stats_lock = threading.Lock()
+        self._errcode_counts: Counter = Counter()
+        self._errcode_listeners: List[Callable[[Optional[int]], None]] = []
 
         if not all([self.app_id, self.app_secret, self.template_id]):
             raise ValueError("微信API配置不完整，请检查config.ini中的wechat部分")
+        self.token_store = token_store or create_token_store(self.app_id)
+
+        # 接口地址前缀可通过 [wechat] api_base 修改，便于接入代理或本地基准测试桩服务
+        api_base = self.wechat_config.get("api_base", DEFAULT_API_BASE).rstrip("/")
+        self.access_token_url = f"{api_base}/cgi-bin/token?grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}"
+        self.send_template_url = f"{api_base}/cgi-bin/message/template/send?access_token={{}}"
+
+    def _token_valid(self, min_ttl: float) -> bool:
+        """内存中的 token 是否还有至少 min_ttl 秒的有效期"""
+        return bool(self.access_token) and time.time() < self.token_expire_time - min_ttl
 
-        self.access_token_url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}"
-        self.send_template_url = "https://api.weixin.qq.com/cgi-bin/message/template/send?access_token={}"
+    def _adopt_stored_token(self, min_ttl: float) -> bool:
+        """尝试采用 token 存储中（可能由其他进程写入）仍然有效的 token"""
+        try:
+            stored = self.token_store.load()
+        except Exception as e:
+            logger.warning(f"读取已保存的access_token失败: {e}")
+            return False
+        if stored and time.time() < stored[1] - min_ttl:
+            self.access_token, self.token_expire_time = stored
+            return True
+        return False
+
+    def get_access_token(self, min_ttl: float = TOKEN_EXPIRE_MARGIN) -> Optional[str]:
+        """
+        获取微信API调用凭证access_token
+
+        依次检查内存、token 存储，只有两者都没有足够有效期的 token 时才请求微信服务器。
+        请求过程在进程内与进程间都加锁，并发调用时只会有一次真正的刷新。
 
-    def get_access_token(self) -> Optional[str]:
-        """获取微信API调用凭证access_token"""
-        current_time = time.time()
-        if self.access_token and current_time < self.token_expire_time - 200:
-            logger.info("使用缓存的access_token")
+        Args:
+            min_ttl: 要求 token 至少还剩余的有效秒数，不足时视为需要刷新
+        """
+        if self._token_valid(min_ttl):
             return self.access_token
 
+        with self._token_lock:
+            # 等锁期间可能已有其他线程完成刷新
+            if self._token_valid(min_ttl) or self._adopt_stored_token(min_ttl):
+                return self.access_token
+            with self.token_store.refresh_lock():
+                # 拿到跨进程锁后再检查一次，其他进程可能刚刚完成刷新
+                if self._adopt_stored_token(min_ttl):
+                    return self.access_token
+                return self._refresh_access_token()
+
+    def _refresh_access_token(self) -> Optional[str]:
+        """向微信服务器请求新的access_token并写入存储（调用方需持有刷新锁）"""
+        with get_metrics().span("token") as span:
+            token = self._request_access_token()
+            if not token:
+                span.fail()
+            return token
+
+    def _request_access_token(self) -> Optional[str]:
+        """请求 access_token 的网络调用部分"""
         try:
             logger.info("开始获取新的access_token")
-            response = requests.get(self.access_token_url, timeout=10)
+            current_time = time.time()
+            response = self.session.get(self.access_token_url, timeout=self.timeout)
             response.raise_for_status()
             result = response.json()
 
             if "access_token" in result and "expires_in" in result:
                 self.access_token = result["access_token"]
                 self.token_expire_time = current_time + result["expires_in"]
+                try:
+                    self.token_store.save(self.access_token, self.token_expire_time)
+                except Exception as e:
+                    logger.warning(f"保存access_token失败，仅在当前进程内使用: {e}")
                 logger.info(f"成功获取access_token，将在{result['expires_in']}秒后过期")
                 return self.access_token
             else:
@@ -53,6 +138,38 @@ class WeChatClient:
             logger.error(f"获取access_token网络请求失败: {str(e)}")
             return None
 
+    def start_background_refresh(self) -> None:
+        """
+        启动后台线程，在 token 过期前主动刷新，发送消息时不必再同步等待刷新
+
+        检查间隔与提前量分别由 [wechat] token_check_interval、token_refresh_margin 配置。
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        margin = config.get_float("wechat", "token_refresh_margin", 600.0)
+        interval = config.get_float("wechat", "token_check_interval", 60.0)
+        self._refresh_stop.clear()
+
+        def _refresh_loop():
+            while True:
+                try:
+                    self.get_access_token(min_ttl=margin)
+                except Exception as e:
+                    logger.error(f"后台刷新access_token时发生错误: {e}")
+                if self._refresh_stop.wait(interval):
+                    break
+
+        self._refresh_thread = threading.Thread(target=_refresh_loop, name="wechat-token-refresh", daemon=True)
+        self._refresh_thread.start()
+        logger.info(f"已启动access_token后台刷新，将在过期前 {margin:.0f} 秒主动刷新")
+
+    def stop_background_refresh(self) -> None:
+        """停止后台刷新线程"""
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
+
     def send_template_message(self, open_id: str, data: List[Dict[str, str]], url: Optional[str] = None) -> bool:
         """
         发送微信模板消息
@@ -69,69 +186,223 @@ class WeChatClient:
             logger.error("消息数据格式不正确")
             return False
 
-        access_token = self.get_access_token()
-        if not access_token:
-            logger.error("获取access_token失败，无法发送消息")
-            return False
+        request_data = build_template_request(self.template_id, open_id, data, url)
+        return self._send_with_retry(open_id, encode_template_request(request_data))
 
-        template_data = {}
-        for item in data:
-            name = item.get("name")
-            value = item.get("value", "")
-            color = item.get("color", "#173177")
-            if name:
-                template_data[name] = {"value": value, "color": color}
+    def prepare_template(self, data: List[Dict[str, str]], url: Optional[str] = None) -> TemplatePayloadBuilder:
+        """
+        预先序列化一条要发给多个用户的模板消息
 
-        request_data = {
-            "touser": open_id,
-            "template_id": self.template_id,
-            "data": template_data
-        }
+        Args:
+            data: 消息数据，值中可包含 payload_builder.USER_NAME 占位符
+            url: (可选) 用户点击模板消息后跳转的URL
+        """
+        return TemplatePayloadBuilder(self.template_id, data, url)
 
-        if url:
-            request_data["url"] = url
+    def send_template_payload(self, open_id: str, body: bytes) -> bool:
+        """
+        发送已经序列化好的模板消息请求体（由 TemplatePayloadBuilder.build 生成）
 
+        Args:
+            open_id: 接收消息的用户openid，仅用于日志
+            body: UTF-8 编码的 JSON 请求体
+        """
+        return self._send_with_retry(open_id, body)
+
+    def invalidate_access_token(self, stale_token: str) -> None:
+        """
+        作废被微信判定为无效的 token，下次调用 get_access_token 时会重新获取
+
+        只有内存或存储中的 token 仍是 stale_token 时才清除，其他线程或进程刚刚刷新得到的新 token 不受影响。
+        """
+        with self._token_lock:
+            if self.access_token == stale_token:
+                self.access_token = None
+                self.token_expire_time = 0
+            try:
+                with self.token_store.refresh_lock():
+                    stored = self.token_store.load()
+                    if stored and stored[0] == stale_token:
+                        self.token_store.clear()
+            except Exception as e:
+                logger.warning(f"清除已保存的access_token失败: {e}")
+
+    def add_errcode_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        """注册发送结果监听器，每次请求完成后以 errcode（网络错误时为 None）调用"""
+        with self._stats_lock:
+            self._errcode_listeners.append(listener)
+
+    def remove_errcode_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        """移除发送结果监听器"""
+        with self._stats_lock:
+            if listener in self._errcode_listeners:
+                self._errcode_listeners.remove(listener)
+
+    def errcode_stats(self) -> Dict[str, int]:
+        """按错误代码统计的请求次数，网络错误记为 "network" """
+        with self._stats_lock:
+            return {("network" if code is None else str(code)): count for code, count in self._errcode_counts.items()}
+
+    def _record_errcode(self, errcode: Optional[int]) -> None:
+        """累计错误代码并通知监听器（如投递引擎的自适应限速）"""
+        with self._stats_lock:
+            self._errcode_counts[errcode] += 1
+            listeners = list(self._errcode_listeners)
+        get_metrics().inc("wechat_errcode", errcode="network" if errcode is None else errcode)
+        for listener in listeners:
+            try:
+                listener(errcode)
+            except Exception as e:
+                logger.warning(f"错误代码监听器执行失败: {e}")
+
+    def _send_with_retry(self, open_id: str, body: bytes) -> bool:
+        """发送模板消息请求体并记录 send 阶段耗时，重发规则见 _send_with_retry_inner"""
+        with get_metrics().span("send") as span:
+            sent = self._send_with_retry_inner(open_id, body)
+            if not sent:
+                span.fail()
+            return sent
+
+    def _send_with_retry_inner(self, open_id: str, body: bytes) -> bool:
+        """
+        发送模板消息请求体，按错误类型决定是否重发
+
+        - token 失效（40001/40014/42001）：作废旧 token、重新获取后立即重发一次
+        - 系统繁忙或调用频率超限（-1/45009/45011）以及连接失败：按重试策略指数退避后重发
+        - 其他错误：直接视为失败
+        """
+        attempt = 0
+        token_refreshed = False
+        while True:
+            access_token = self.get_access_token()
+            if not access_token:
+                logger.error("获取access_token失败，无法发送消息")
+                return False
+
+            attempt += 1
+            errcode, retryable = self._post_template(open_id, access_token, body)
+            action = self._next_action(errcode, retryable, attempt, token_refreshed)
+            if action == "refresh_token":
+                self.invalidate_access_token(access_token)
+                token_refreshed = True
+                attempt -= 1
+            elif action == "retry":
+                delay = self.retry_policy.sleep(attempt)
+                logger.warning(f"向open_id: {open_id}发送模板消息失败，等待 {delay:.2f} 秒后进行第 {attempt} 次重试")
+            else:
+                return action == "sent"
+
+    async def send_template_payload_async(self, http: "AsyncHttpClient", open_id: str, body: bytes) -> bool:
+        """
+        send_template_payload 的异步版本，通过 http 发送，错误处理与重发规则相同
+
+        token 仍在有效期内时直接使用内存中的 token，只有需要刷新时才在线程池中执行同步的刷新逻辑。
+        """
+        with get_metrics().span("send") as span:
+            sent = await self._send_payload_async(http, open_id, body)
+            if not sent:
+                span.fail()
+            return sent
+
+    async def _send_payload_async(self, http: "AsyncHttpClient", open_id: str, body: bytes) -> bool:
+        """send_template_payload_async 的发送与重发逻辑"""
+        import asyncio
+        from async_http import AsyncHttpError
+
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        token_refreshed = False
+        while True:
+            if self._token_valid(TOKEN_EXPIRE_MARGIN):
+                access_token = self.access_token
+            else:
+                access_token = await loop.run_in_executor(None, bind_run(self.get_access_token))
+            if not access_token:
+                logger.error("获取access_token失败，无法发送消息")
+                return False
+
+            attempt += 1
+            try:
+                result = await http.post_json(self.send_template_url.format(access_token), body)
+                errcode, retryable = self._parse_send_result(open_id, result)
+            except AsyncHttpError as e:
+                logger.error(f"发送模板消息网络请求失败: {str(e)}")
+                errcode, retryable = None, e.connect_failed
+            action = self._next_action(errcode, retryable, attempt, token_refreshed)
+            if action == "refresh_token":
+                await loop.run_in_executor(None, bind_run(self.invalidate_access_token), access_token)
+                token_refreshed = True
+                attempt -= 1
+            elif action == "retry":
+                delay = self.retry_policy.backoff(attempt)
+                logger.warning(f"向open_id: {open_id}发送模板消息失败，等待 {delay:.2f} 秒后进行第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+            else:
+                return action == "sent"
+
+    def _next_action(self, errcode: Optional[int], retryable: bool, attempt: int, token_refreshed: bool) -> str:
+        """
+        记录一次发送结果并决定下一步
+
+        Returns:
+            "sent"（发送成功）、"refresh_token"（刷新 token 后重发）、"retry"（退避后重发）或 "fail"
+        """
+        self._record_errcode(errcode)
+        if errcode == 0:
+            return "sent"
+        if errcode in TOKEN_INVALID_ERRCODES and not token_refreshed:
+            logger.warning(f"access_token已失效(错误代码: {errcode})，刷新后重新发送")
+            return "refresh_token"
+        if retryable and self.retry_policy.should_retry(attempt):
+            return "retry"
+        return "fail"
+
+    def _post_template(self, open_id: str, access_token: str, body: bytes) -> Tuple[Optional[int], bool]:
+        """
+        POST 模板消息请求体
+
+        Returns:
+            (errcode, 是否可以安全重发)，网络错误时 errcode 为 None
+        """
         try:
             api_url = self.send_template_url.format(access_token)
-            response = requests.post(
+            response = self.session.post(
                 api_url,
-                data=json.dumps(request_data, ensure_ascii=False).encode("utf-8"),
+                data=body,
                 headers={"Content-Type": "application/json"},
-                timeout=10
+                timeout=self.timeout
             )
             response.raise_for_status()
             result = response.json()
-
-            if result.get("errcode") == 0:
-                logger.info(f"成功向open_id: {open_id}发送模板消息")
-                return True
-            else:
-                logger.error(f"发送模板消息失败: {result.get('errmsg', '未知错误')}，错误代码: {result.get('errcode')}")
-                return False
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
             logger.error(f"发送模板消息网络请求失败: {str(e)}")
-            return False
+            return None, True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # 读取超时等情况下请求可能已经送达，重发可能导致用户收到重复消息
+            logger.error(f"发送模板消息网络请求失败: {str(e)}")
+            return None, False
+        return self._parse_send_result(open_id, result)
+
+    @staticmethod
+    def _parse_send_result(open_id: str, result: Dict) -> Tuple[Optional[int], bool]:
+        """解析模板消息接口的响应，返回 (errcode, 是否可以安全重发)"""
+        errcode = result.get("errcode")
+        if errcode == 0:
+            logger.info(f"成功向open_id: {open_id}发送模板消息")
+            return 0, False
+        logger.error(f"发送模板消息失败: {result.get('errmsg', '未知错误')}，错误代码: {errcode}")
+        return errcode, errcode in THROTTLE_ERRCODES
 
-    # <--- 以下是关键修改 ---
     def send_to_users(self, user_list: List[Dict[str, str]], data: List[Dict[str, str]], url: Optional[str] = None) -> \
     Dict[str, bool]:
         """
-        向多个用户发送模板消息
+        向多个用户并发发送同一条模板消息
 
         Args:
             user_list: 用户列表
             data: 消息数据
             url: (可选) 统一的跳转链接
         """
-        results = {}
-        for user in user_list:
-            open_id = user.get("open_id")
-            if not open_id:
-                logger.warning("跳过没有open_id的用户")
-                continue
-
-            # 将 url 传递给 send_template_message
-            success = self.send_template_message(open_id, data, url=url)
-            results[open_id] = success
-            time.sleep(0.5)
-        return results
\ No newline at end of file
+        from delivery import DeliveryEngine
+
+        return DeliveryEngine(self).deliver(user_list, lambda user: data, url=url)